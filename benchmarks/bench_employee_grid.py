@@ -0,0 +1,32 @@
+# Benchmark for the paginated employee grid: the cost of one edit (slice a page, apply it,
+# recalculate the changed row) should stay roughly flat from 10 to 50,000 employees.
+# Usage: python benchmarks/bench_employee_grid.py [employees ...]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from taxcore.employee_grid import EmployeeGrid, page_count, page_of  # noqa: E402
+
+DEFAULT_SIZES = [10, 1_000, 10_000, 50_000]
+EDITS = 20
+
+
+def main(sizes=DEFAULT_SIZES):
+    print(f"{'employees':>10} {'ms per edit':>12} {'recalculated':>13}")
+    for employees in sizes:
+        grid = EmployeeGrid(employees)
+        last_page = page_count(employees)
+        start = time.perf_counter()
+        for edit in range(EDITS):
+            page = page_of(grid.table, last_page).copy()
+            page.iloc[0, page.columns.get_loc("Gross Salary")] = 10_000.0 + edit
+            grid.update(page)
+        seconds = (time.perf_counter() - start) / EDITS
+        print(f"{employees:>10,} {seconds * 1000:>12.2f} {grid.last_recalculated:>13}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES))
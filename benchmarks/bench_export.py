@@ -0,0 +1,53 @@
+# Benchmark for the export subsystem: pandas to_excel against the write-only XLSX, CSV and
+# Parquet writers on payroll results. Each export runs in its own process so peak memory is
+# measured per method; "extra MB" is the peak RSS growth caused by the export itself.
+# Usage: python benchmarks/bench_export.py [rows ...]
+import io
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_payroll import make_payroll  # noqa: E402
+from taxcore.export import available_export_formats, write_sheets  # noqa: E402
+from taxcore.payroll import calculate_payroll_batch  # noqa: E402
+
+DEFAULT_SIZES = [100_000, 250_000]
+
+
+# Function to export one result set in the current process: returns (seconds, bytes, extra peak RSS in MB)
+def run_export(method, rows):
+    result = calculate_payroll_batch(make_payroll(rows))
+    buffer = io.BytesIO()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if method == "to_excel":
+        result.to_excel(buffer, index=False, engine="openpyxl")
+    else:
+        write_sheets({"Payroll": result}, buffer, method)
+    seconds = time.perf_counter() - start
+    extra = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    return seconds, buffer.tell(), extra / 1024
+
+
+def main(sizes):
+    methods = ["to_excel", *available_export_formats()]
+    print(f"{'method':>9} {'rows':>10} {'seconds':>9} {'rows/s':>11} {'size MB':>8} {'extra MB':>9}")
+    for rows in sizes:
+        for method in methods:
+            output = subprocess.run([sys.executable, __file__, "--child", method, str(rows)],
+                                    check=True, capture_output=True, text=True).stdout
+            seconds, size, extra = (float(value) for value in output.split())
+            print(f"{method:>9} {rows:>10,} {seconds:>9.2f} {rows / seconds:>11,.0f} "
+                  f"{size / 1_048_576:>8.1f} {extra:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        print(*run_export(sys.argv[2], int(sys.argv[3])))
+        sys.exit(0)
+    sys.exit(main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES))
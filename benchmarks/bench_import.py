@@ -0,0 +1,45 @@
+# Checks that importing the calculation core stays cheap: no UI or dataframe libraries
+# are loaded and the median import time stays under budget.
+# Usage: python benchmarks/bench_import.py [runs]
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_MS = 50
+FORBIDDEN_MODULES = ["streamlit", "pandas", "numpy", "openpyxl"]
+
+CHILD = f"""
+import json, sys, time
+start = time.perf_counter()
+import taxcore
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {FORBIDDEN_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+# Function to import the package in a fresh interpreter and report the time taken
+def measure_once():
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout)
+
+
+def main(runs):
+    samples = [measure_once() for _ in range(runs)]
+    times = [sample["ms"] for sample in samples]
+    loaded = sorted({module for sample in samples for module in sample["loaded"]})
+    median = statistics.median(times)
+
+    print(f"import taxcore: median {median:.1f} ms, min {min(times):.1f} ms, max {max(times):.1f} ms "
+          f"over {runs} runs (budget {IMPORT_BUDGET_MS} ms)")
+    if loaded:
+        print(f"FAIL: importing taxcore loaded {', '.join(loaded)}")
+    if median > IMPORT_BUDGET_MS:
+        print("FAIL: import time over budget")
+    return 1 if loaded or median > IMPORT_BUDGET_MS else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
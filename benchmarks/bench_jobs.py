@@ -0,0 +1,68 @@
+# Benchmark for the background job queue: several payroll files run one after another in the
+# caller versus submitted together as jobs. Submitting should return at once, the first progress
+# report should arrive after one chunk, cancelling should take effect within a chunk, and the jobs'
+# results must match the runs made in the caller.
+# Usage: python benchmarks/bench_jobs.py [rows] [jobs]
+import io
+import os
+import sys
+import tempfile
+import time
+
+from bench_payroll_io import write_payroll_csv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from taxcore.jobs import JobQueue, payroll_job  # noqa: E402
+from taxcore.payroll_io import process_payroll_file  # noqa: E402
+
+CHUNK_SIZE = 20_000
+
+
+def main(rows, jobs):
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "payroll.csv")
+        write_payroll_csv(source, rows)
+        print(f"{jobs} payroll files of {rows:,} employees, {os.cpu_count()} CPUs")
+
+        start = time.perf_counter()
+        expected = [process_payroll_file(source, io.BytesIO(), CHUNK_SIZE, output_format="csv")[1]
+                    for _ in range(jobs)]
+        serial = time.perf_counter() - start
+
+        queue = JobQueue(workers=jobs)
+        try:
+            start = time.perf_counter()
+            submitted = [queue.submit(f"Payroll {i + 1}", payroll_job, source, CHUNK_SIZE, output_format="csv")
+                         for i in range(jobs)]
+            submit = time.perf_counter() - start
+            while submitted[0].done == 0 and not submitted[0].wait(0.001):
+                pass
+            first_progress = time.perf_counter() - start
+            results = [job.get_result() for job in submitted]
+            queued = time.perf_counter() - start
+            if any(not result["totals"].equals(totals) for result, totals in zip(results, expected)):
+                print("FAIL: job totals differ from the runs made in the caller")
+                return 1
+
+            job = queue.submit("Cancelled payroll", payroll_job, source, CHUNK_SIZE, output_format="csv")
+            while job.done == 0 and not job.wait(0.001):
+                pass
+            start = time.perf_counter()
+            job.cancel()
+            job.wait()
+            cancel = time.perf_counter() - start
+        finally:
+            queue.shutdown()
+
+    print(f"{'one after another':>22} {serial:>8.3f} s")
+    print(f"{'as background jobs':>22} {queued:>8.3f} s")
+    print(f"{'submit all':>22} {submit * 1000:>8.3f} ms")
+    print(f"{'first progress':>22} {first_progress:>8.3f} s")
+    print(f"{'cancel to stop':>22} {cancel:>8.3f} s ({job.status} after {job.done:,} employees)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 4))
@@ -0,0 +1,83 @@
+# Benchmark for the integer-cents money path against the float path, with a decimal.Decimal
+# reference. Payslips are rounded half-up per line and output VAT once per total; the totals
+# of the cents path must equal the Decimal totals exactly.
+# Usage: python benchmarks/bench_money.py [rows]
+import os
+import sys
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_payroll import make_payroll  # noqa: E402
+from bench_vat import make_ledger  # noqa: E402
+from taxcore.money import PER_TOTAL, divide_rounded, to_cents  # noqa: E402
+from taxcore.payroll import calculate_payroll_batch  # noqa: E402
+from taxcore.vat import summarise_ledger_chunk  # noqa: E402
+
+DEFAULT_ROWS = 1_000_000
+CENT = Decimal("0.01")
+
+
+# Function to time a callable, best of three runs
+def best_time(function):
+    best, result = None, None
+    for _ in range(3):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+# Function to calculate the total PAYE with Decimal, rounding every payslip half-up
+def decimal_paye_total(payroll):
+    total = Decimal(0)
+    columns = ["Gross Salary", "Allowances", "Fringe Benefits", "Retirement Deductions", "Tax Rate", "Rebates"]
+    for gross, allowances, fringe, retirement, rate, rebates in zip(*(payroll[name].map(repr) for name in columns)):
+        taxable = Decimal(gross) + Decimal(allowances) + Decimal(fringe) - Decimal(retirement)
+        total += ((taxable * Decimal(rate) / 100 - Decimal(rebates)) / 12).quantize(CENT, ROUND_HALF_UP)
+    return total
+
+
+# Function to calculate the output VAT with Decimal, rounding once on the ledger total
+def decimal_output_vat_total(ledger):
+    sales = ledger[(ledger["Type"] == "Sale") & (ledger["Category"] == "Standard")]
+    return (sum(Decimal(amount) for amount in sales["Amount"].map(repr)) * 15 / 100).quantize(CENT, ROUND_HALF_UP)
+
+
+def report(name, float_seconds, float_total, cents_seconds, cents_total, expected):
+    print(f"{name}")
+    print(f"  float:  {float_seconds:7.3f} s  total R{float_total:,.2f}  off by R{float_total - expected:,.2f}")
+    print(f"  cents:  {cents_seconds:7.3f} s  total R{cents_total:,.2f}  off by R{cents_total - expected:,.2f}")
+    return cents_total == expected
+
+
+def main(rows=DEFAULT_ROWS):
+    payroll = make_payroll(rows)
+    float_seconds, float_result = best_time(lambda: calculate_payroll_batch(payroll))
+    cents_seconds, cents_result = best_time(lambda: calculate_payroll_batch(payroll, exact=True))
+    # Totals are added up as Decimal so the float column sum adds no error of its own
+    paye_ok = report(f"PAYE over {rows:,} payslips", float_seconds,
+                     sum(Decimal(repr(value)) for value in float_result["PAYE"]), cents_seconds,
+                     Decimal(int(to_cents(cents_result["PAYE"].to_numpy()).sum())) / 100,
+                     decimal_paye_total(payroll))
+
+    ledger = make_ledger(rows)
+    float_seconds, (float_period, _) = best_time(lambda: summarise_ledger_chunk(ledger))
+    cents_seconds, (cents_period, _) = best_time(lambda: summarise_ledger_chunk(ledger, exact=True,
+                                                                                  rounding_stage=PER_TOTAL))
+    # Per total, the cents path carries amount x 15 and divides once at the end
+    vat_ok = report(f"Output VAT over {rows:,} ledger lines (rounded per total)", float_seconds,
+                    Decimal(repr(round(float(np.sum(float_period["Output VAT"])), 2))), cents_seconds,
+                    Decimal(int(divide_rounded(int(cents_period["Output VAT"].sum()), 100))) / 100,
+                    decimal_output_vat_total(ledger))
+
+    print("cents totals match Decimal" if paye_ok and vat_ok else "MISMATCH against Decimal")
+    return 0 if paye_ok and vat_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:2]]))
@@ -0,0 +1,48 @@
+# Benchmark for the multi-process group payroll runner: end-to-end wall time (sorting, copying into
+# shared memory and gathering included) against one in-process batch, by number of workers. Runs
+# with too few rows per worker for the pool to pay off fall back to the in-process batch.
+# Usage: python benchmarks/bench_parallel.py [rows] [entities]
+import os
+import sys
+import time
+
+import numpy as np
+
+from bench_payroll import make_payroll
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from taxcore.parallel import run_group_payroll, summarise_stages, summarise_worker_timings  # noqa: E402
+from taxcore.payroll import calculate_payroll_batch  # noqa: E402
+
+
+def main(rows, entities):
+    payroll = make_payroll(rows)
+    payroll["Entity"] = np.random.default_rng(1).integers(0, entities, rows).astype(str)
+    payroll["Entity"] = "Entity " + payroll["Entity"]
+
+    start = time.perf_counter()
+    expected = calculate_payroll_batch(payroll)
+    batch = time.perf_counter() - start
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, 16, 32, cpus} & set(range(1, cpus + 1))) or [1]
+
+    print(f"{rows:,} employees across {entities} entities, {cpus} CPUs")
+    print(f"{'batch':>8} {batch:>10.3f} {rows / batch:>14,.0f} {1:>8.2f}")
+    print(f"{'workers':>8} {'seconds':>10} {'rows/s':>14} {'speedup':>8}")
+    for workers in worker_counts:
+        start = time.perf_counter()
+        result_df, timing_df = run_group_payroll(payroll, workers=workers)
+        seconds = time.perf_counter() - start
+        if not result_df[expected.columns].equals(expected):
+            print(f"FAIL: results with {workers} workers differ from the single batch")
+            return 1
+        print(f"{workers:>8} {seconds:>10.3f} {rows / seconds:>14,.0f} {batch / seconds:>8.2f}")
+    print(summarise_worker_timings(timing_df).to_string())
+    print(summarise_stages(timing_df).to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 40))
@@ -0,0 +1,86 @@
+# Benchmark for the vectorized payroll engine.
+# Usage: python benchmarks/bench_payroll.py [rows ...]
+import inspect
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from taxcore import calculate_paye, calculate_sdl, calculate_uif  # noqa: E402
+from taxcore.payroll import calculate_payroll_batch  # noqa: E402
+
+# The reference loop times the plain calculator, not its instrumentation wrapper
+calculate_paye = inspect.unwrap(calculate_paye)
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+
+# Function to build a synthetic payroll with realistic value ranges
+def make_payroll(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Employee Name": [f"Employee {i + 1}" for i in range(rows)],
+        "Gross Salary": np.round(rng.uniform(5_000, 150_000, rows), 2),
+        "Allowances": np.round(rng.uniform(0, 5_000, rows), 2),
+        "Fringe Benefits": np.round(rng.uniform(0, 3_000, rows), 2),
+        "Retirement Deductions": np.round(rng.uniform(0, 7_500, rows), 2),
+        "Medical Credits": np.round(rng.uniform(0, 1_000, rows), 2),
+        "Tax Rate": rng.choice([18.0, 26.0, 31.0, 36.0, 39.0, 41.0, 45.0], rows),
+        "Rebates": rng.choice([0.0, 17_235.0, 26_679.0, 29_824.0], rows),
+    })
+
+
+# Function reproducing the original per-row loop, used as the reference implementation
+def process_row_by_row(payroll):
+    results = []
+    for employee in payroll.to_dict("records"):
+        paye = calculate_paye(employee["Gross Salary"], employee["Allowances"], employee["Fringe Benefits"],
+                              employee["Retirement Deductions"], employee["Medical Credits"],
+                              employee["Tax Rate"] / 100, employee["Rebates"])
+        total_uif, employee_uif, employer_uif = calculate_uif(employee["Gross Salary"])
+        results.append({
+            "Employee": employee["Employee Name"],
+            "Gross Salary": employee["Gross Salary"],
+            "PAYE": paye,
+            "Total UIF": total_uif,
+            "Employee UIF": employee_uif,
+            "Employer UIF": employer_uif,
+            "SDL": calculate_sdl(employee["Gross Salary"]),
+        })
+    return pd.DataFrame(results)
+
+
+# Function to time a callable and return (seconds, result)
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(sizes):
+    # Correctness check: the batch engine must reproduce the scalar functions exactly
+    sample = make_payroll(100_000, seed=7)
+    expected = process_row_by_row(sample)
+    actual = calculate_payroll_batch(sample)
+    mismatches = actual.ne(expected).any(axis=1).sum()
+    print(f"correctness: {mismatches} mismatches over {len(sample)} employees")
+
+    print(f"{'rows':>10} {'batch s':>10} {'batch rows/s':>14} {'loop s':>10} {'loop rows/s':>14}")
+    for rows in sizes:
+        payroll = make_payroll(rows)
+        batch_seconds, _ = timed(calculate_payroll_batch, payroll)
+        if rows <= 100_000:
+            loop_seconds, _ = timed(process_row_by_row, payroll)
+            loop_columns = f"{loop_seconds:>10.3f} {rows / loop_seconds:>14,.0f}"
+        else:
+            loop_columns = f"{'-':>10} {'-':>14}"
+        print(f"{rows:>10,} {batch_seconds:>10.3f} {rows / batch_seconds:>14,.0f} {loop_columns}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES))
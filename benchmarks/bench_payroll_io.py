@@ -0,0 +1,54 @@
+# Benchmark for chunked payroll file processing: peak memory should not grow with file size.
+# Usage: python benchmarks/bench_payroll_io.py [rows ...]
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_payroll import make_payroll
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = [200_000, 2_000_000]
+WRITE_CHUNK = 100_000
+
+
+# Function to write a synthetic payroll CSV without holding it all in memory
+def write_payroll_csv(path, rows):
+    written = 0
+    while written < rows:
+        count = min(WRITE_CHUNK, rows - written)
+        chunk = make_payroll(count, seed=written)
+        chunk["Employee Name"] = [f"Employee {written + i + 1}" for i in range(count)]
+        chunk.to_csv(path, mode="a" if written else "w", header=written == 0, index=False)
+        written += count
+
+
+# Function to run the CLI in a child process and return (seconds, peak RSS in MB)
+def run_cli(source, destination):
+    before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "taxcore", "payroll", source, destination],
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return seconds, max(peak, before) / 1024
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'seconds':>10} {'rows/s':>12} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            source = os.path.join(directory, f"payroll_{rows}.csv")
+            destination = os.path.join(directory, f"results_{rows}.csv")
+            write_payroll_csv(source, rows)
+            seconds, peak_mb = run_cli(source, destination)
+            print(f"{rows:>10,} {seconds:>10.2f} {rows / seconds:>12,.0f} {peak_mb:>12.1f}")
+            os.remove(source)
+            os.remove(destination)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES))
@@ -0,0 +1,329 @@
+# Regression suite for the tax and statement calculators.
+# First every golden value in golden_sars.json (worked examples from the published SARS tables,
+# plus a few pinned current results) is checked. Then each calculator is run over synthetic
+# payrolls, ledgers and entity tables at several scales, recording throughput, peak memory
+# (tracemalloc, in a separate run so it doesn't slow the timed one) and a digest of the results.
+# Against the stored baselines (baselines.json) a changed digest means the results changed and a
+# drop in throughput beyond the tolerance means it got slower; either makes the run fail. Throughput
+# is only compared for runs long enough to time reliably, and is scaled by a calibration kernel timed
+# just before each case, so a machine that is busier (or slower) than when the baselines were recorded
+# doesn't read as a regression. Runs under a second get a wider tolerance. After a deliberate change,
+# re-record with --update-baselines. Scalar calculators run as plain loops and are skipped above
+# --scalar-limit rows.
+# Usage: python benchmarks/bench_suite.py [--scales 1k,10k,100k,1M] [--only NAME,...] [--update-baselines]
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+from bench_payroll import make_payroll  # noqa: E402
+from bench_vat import make_ledger  # noqa: E402
+from taxcore import (calculate_fringe_benefits, calculate_paye, calculate_progressive_tax, calculate_sdl,  # noqa: E402
+                     calculate_uif, calculate_vat, process_multiple_employees)
+from taxcore.cache import clear_caches, make_key  # noqa: E402
+from taxcore.scenarios import scenario_grid, sweep_scenarios  # noqa: E402
+from taxcore.fringe import DEFAULT_FRINGE_RULES  # noqa: E402
+from taxcore.statements import INCOME_STATEMENT, INCOME_STATEMENT_INPUTS, calculate_income_statement  # noqa: E402
+from taxcore.tax_tables import get_tax_table  # noqa: E402
+from taxcore.vat import summarise_ledger_chunk  # noqa: E402
+from taxcore.ytd import YTDStore, run_ytd_period  # noqa: E402
+
+GOLDEN_PATH = os.path.join(BENCHMARKS, "golden_sars.json")
+BASELINE_PATH = os.path.join(BENCHMARKS, "baselines.json")
+DEFAULT_SCALES = "1k,10k,100k,1M"
+DEFAULT_SCALAR_LIMIT = 100_000
+DEFAULT_TOLERANCE = 0.25
+# Allowed drop for runs shorter than MIN_TIMING_SECONDS, whose timings are noisier
+SHORT_RUN_TOLERANCE = 0.40
+MIN_TIMING_SECONDS = 1.0
+# Runs quicker than this are too noisy to compare throughput on; only their results are checked
+MIN_COMPARE_SECONDS = 0.05
+MAX_RUNS = 50
+CALIBRATION_RUNS = 5
+TAX_YEAR = 2025
+BENEFIT_TYPES = ["Company Car", "Low-Interest Loan", "Other"]
+
+# Function to work out one employee's first-month PAYE both in a What-If sweep and in a YTD run,
+# so a golden value can pin the two to the same SARS figure
+def _sweep_and_ytd_paye(tax_year, gross_salary, age):
+    payroll = pd.DataFrame({"Employee ID": ["A"], "Gross Salary": [gross_salary], "Age": [age]})
+    sweep = sweep_scenarios(payroll, scenario_grid(), tax_year)
+    with tempfile.TemporaryDirectory() as directory:
+        ytd = run_ytd_period(YTDStore.create(directory, tax_year), 1, payroll)
+    return [float(sweep["PAYE"].iloc[0]), float(ytd["PAYE"].iloc[0])]
+
+
+# Functions the golden values can name, besides the public calculators
+GOLDEN_FUNCTIONS = {
+    "calculate_paye": calculate_paye,
+    "calculate_progressive_tax": calculate_progressive_tax,
+    "calculate_uif": calculate_uif,
+    "calculate_sdl": calculate_sdl,
+    "calculate_vat": calculate_vat,
+    "calculate_fringe_benefits": calculate_fringe_benefits,
+    "process_multiple_employees": lambda employees: process_multiple_employees(employees).to_dict("records"),
+    "sars_base_tax": lambda tax_year: list(get_tax_table(tax_year).base_tax),
+    "sars_liability": lambda tax_year, income, age=None: get_tax_table(tax_year).liability(income, age),
+    "sweep_and_ytd_paye": _sweep_and_ytd_paye,
+}
+
+
+# Function to read a scale such as 10k or 1M
+def parse_scale(text):
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+# Function to build a synthetic benefit register: an asset or loan value, a benefit type and loan rates per row
+def make_benefits(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Value": np.round(rng.uniform(10_000, 1_500_000, rows), 2),
+        "Benefit Type": pd.Categorical.from_codes(rng.integers(0, len(BENEFIT_TYPES), rows), BENEFIT_TYPES),
+        "Official Rate": 8.25,
+        "Interest Rate": np.round(rng.uniform(0, 8, rows), 2),
+    })
+
+
+# Function to build synthetic income statement line items, one row per entity
+def make_entities(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({item: np.round(rng.uniform(0, 1_000_000, rows), 2) for item in INCOME_STATEMENT_INPUTS})
+
+
+# Function to compare a calculated value with an expected one, to within a tolerance for numbers
+def matches(actual, expected, tolerance):
+    if isinstance(expected, dict):
+        return (isinstance(actual, dict) and actual.keys() == expected.keys()
+                and all(matches(actual[key], expected[key], tolerance) for key in expected))
+    if isinstance(expected, list):
+        return (isinstance(actual, (list, tuple)) and len(actual) == len(expected)
+                and all(matches(a, e, tolerance) for a, e in zip(actual, expected)))
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return abs(actual - expected) <= tolerance
+    return actual == expected
+
+
+def check_golden():
+    with open(GOLDEN_PATH, encoding="utf-8") as handle:
+        cases = json.load(handle)
+    failures = 0
+    for case in cases:
+        actual = GOLDEN_FUNCTIONS[case["function"]](*case["args"], **case.get("kwargs", {}))
+        if not matches(actual, case["expected"], case.get("tolerance", 0.005)):
+            failures += 1
+            print(f"  FAIL {case['name']}: expected {case['expected']}, got {actual} ({case['source']})")
+    print(f"golden values: {len(cases) - failures} of {len(cases)} match")
+    return failures
+
+
+# Each case: (name, dataset, scalar, function of the dataset). Scalar cases loop over the rows
+# calling the public calculator, so the instrumentation wrapper's cost is part of what is measured.
+def _paye_loop(payroll):
+    return [calculate_paye(gross, allowances, fringe, retirement, medical, rate / 100, rebates)
+            for gross, allowances, fringe, retirement, medical, rate, rebates in zip(
+                payroll["Gross Salary"].tolist(), payroll["Allowances"].tolist(), payroll["Fringe Benefits"].tolist(),
+                payroll["Retirement Deductions"].tolist(), payroll["Medical Credits"].tolist(),
+                payroll["Tax Rate"].tolist(), payroll["Rebates"].tolist())]
+
+
+def _annual_taxable(payroll):
+    return ((payroll["Gross Salary"] + payroll["Allowances"] + payroll["Fringe Benefits"]
+             - payroll["Retirement Deductions"]) * 12).to_numpy()
+
+
+def _progressive_tax_loop(payroll):
+    table = get_tax_table(TAX_YEAR)
+    rebate = table.rebate()
+    return [calculate_progressive_tax(income, table.brackets, table.rates, rebate)
+            for income in _annual_taxable(payroll).tolist()]
+
+
+def _vat_loop(ledger):
+    sales = ledger["Type"] == "Sale"
+    output_sales = ledger["Amount"].where(sales, 0.0).tolist()
+    input_purchases = ledger["Amount"].where(~sales, 0.0).tolist()
+    return [calculate_vat(output, purchases) for output, purchases in zip(output_sales, input_purchases)]
+
+
+def _income_statement_loop(entities):
+    return [list(calculate_income_statement(inputs).values()) for inputs in entities.to_dict("records")]
+
+
+CASES = [
+    ("calculate_paye", "payroll", True, _paye_loop),
+    ("calculate_progressive_tax", "payroll", True, _progressive_tax_loop),
+    ("calculate_uif", "payroll", True, lambda payroll: [calculate_uif(gross) for gross in payroll["Gross Salary"].tolist()]),
+    ("calculate_sdl", "payroll", True, lambda payroll: [calculate_sdl(gross) for gross in payroll["Gross Salary"].tolist()]),
+    ("calculate_vat", "ledger", True, _vat_loop),
+    ("calculate_fringe_benefits", "benefits", True,
+     lambda benefits: [calculate_fringe_benefits(value, benefit_type) for value, benefit_type in
+                       zip(benefits["Value"].tolist(), benefits["Benefit Type"].tolist())]),
+    ("calculate_income_statement", "entities", True, _income_statement_loop),
+    ("process_multiple_employees", "payroll", False, process_multiple_employees),
+    ("FringeRules.value_register", "benefits", False, DEFAULT_FRINGE_RULES.value_register),
+    ("TaxTable.liability_array", "payroll", False,
+     lambda payroll: get_tax_table(TAX_YEAR).liability_array(_annual_taxable(payroll))),
+    ("summarise_ledger_chunk", "ledger", False, lambda ledger: summarise_ledger_chunk(ledger)),
+    ("StatementGraph.evaluate_frame", "entities", False, INCOME_STATEMENT.evaluate_frame),
+]
+
+GENERATORS = {"payroll": make_payroll, "ledger": make_ledger, "benefits": make_benefits, "entities": make_entities}
+
+
+# Function to digest a result by content (lists of scalars are turned into one array first)
+def result_digest(result):
+    if isinstance(result, list):
+        result = np.asarray(result, dtype=np.float64)
+    return make_key((result,), {})
+
+
+# Fixed workload timed alongside the cases: a vectorised pass and a Python loop, like the batch
+# and scalar cases
+def calibration_kernel():
+    values = np.arange(200_000, dtype=np.float64)
+    total = float(np.round(np.maximum(values * 0.18 - 1_000, 0) / 12, 2).sum())
+    for value in range(100_000):
+        total += round(value * 0.01, 2)
+    return total
+
+
+# Function to time the calibration kernel: the best of a few runs, in seconds
+def calibrate():
+    timings = []
+    for _ in range(CALIBRATION_RUNS):
+        start = time.perf_counter()
+        calibration_kernel()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# Function to run a case once with caches cleared: returns (seconds, result)
+def run_case(function, data):
+    clear_caches()
+    start = time.perf_counter()
+    result = function(data)
+    return time.perf_counter() - start, result
+
+
+# Function to measure a case's peak traced memory in a separate run
+def peak_memory(function, data):
+    clear_caches()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        function(data)
+        return tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding="utf-8") as handle:
+        return json.load(handle)["results"]
+
+
+def save_baselines(results):
+    baselines = {
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "numpy": np.__version__, "pandas": pd.__version__, "cpus": os.cpu_count()},
+        "results": results,
+    }
+    with open(BASELINE_PATH, "w", encoding="utf-8") as handle:
+        json.dump(baselines, handle, indent=1, sort_keys=True)
+        handle.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Golden-value and throughput regression suite")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated row counts, e.g. 1k,1M,10M")
+    parser.add_argument("--only", help="comma-separated case names to run")
+    parser.add_argument("--scalar-limit", type=parse_scale, default=DEFAULT_SCALAR_LIMIT,
+                        help="largest scale the scalar loops are run at")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed drop in throughput against the baseline (0.25 = 25%%)")
+    parser.add_argument("--short-tolerance", type=float, default=SHORT_RUN_TOLERANCE,
+                        help="allowed drop for runs under a second")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory runs")
+    parser.add_argument("--update-baselines", action="store_true", help="record this run as the new baselines")
+    args = parser.parse_args(argv)
+
+    failures = check_golden()
+    scales = [parse_scale(scale) for scale in args.scales.split(",")]
+    only = set(args.only.split(",")) if args.only else None
+    baselines = load_baselines()
+    results = dict(baselines)
+
+    print(f"{'case':<30} {'rows':>11} {'seconds':>9} {'rows/s':>13} {'peak MB':>9} {'baseline/s':>13} "
+          f"{'change':>8}  result")
+    for rows in scales:
+        datasets = {}
+        for name, dataset, scalar, function in CASES:
+            if (only and name not in only) or (scalar and rows > args.scalar_limit):
+                continue
+            if dataset not in datasets:
+                datasets[dataset] = GENERATORS[dataset](rows)
+            data = datasets[dataset]
+            calibration = calibrate()
+            first, result = run_case(function, data)
+            # Quick cases are repeated for about a second and the best run is kept: noise from the
+            # rest of the machine only ever makes a run slower
+            timings = [first]
+            while sum(timings) < MIN_TIMING_SECONDS and len(timings) < MAX_RUNS:
+                timings.append(run_case(function, data)[0])
+            seconds = min(timings)
+            digest = result_digest(result)
+            del result
+            peak = None if args.no_memory else peak_memory(function, data)
+
+            key = f"{name}@{rows}"
+            measured = {"rows_per_second": round(rows / seconds), "peak_bytes": peak, "digest": digest,
+                        "calibration_seconds": round(calibration, 6)}
+            baseline = baselines.get(key)
+            status, change = "new", ""
+            if baseline is not None:
+                # The baseline's throughput as this machine would manage it right now. Calibration only
+                # ever lowers it: a quick calibration run is as likely to be luck as a faster machine.
+                expected = baseline["rows_per_second"]
+                if baseline.get("calibration_seconds"):
+                    expected *= min(baseline["calibration_seconds"] / calibration, 1.0)
+                tolerance = args.tolerance if seconds >= MIN_TIMING_SECONDS else args.short_tolerance
+                change = f"{measured['rows_per_second'] / expected - 1:+.0%}"
+                if digest != baseline["digest"]:
+                    status = "CHANGED"
+                elif seconds < MIN_COMPARE_SECONDS:
+                    status = "ok (too quick to time)"
+                elif measured["rows_per_second"] < expected * (1 - tolerance):
+                    status = "SLOWER"
+                else:
+                    status = "ok"
+                failures += status in ("CHANGED", "SLOWER")
+            results[key] = measured
+            print(f"{name:<30} {rows:>11,} {seconds:>9.3f} {measured['rows_per_second']:>13,} "
+                  f"{'-' if peak is None else f'{peak / 1_048_576:.1f}':>9} "
+                  f"{'-' if baseline is None else format(baseline['rows_per_second'], ','):>13} {change:>8}  {status}")
+        del datasets
+
+    if args.update_baselines:
+        save_baselines(results)
+        print(f"baselines written to {BASELINE_PATH}")
+        return 0
+    print("all checks passed" if not failures else f"{failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
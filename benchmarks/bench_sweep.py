@@ -0,0 +1,76 @@
+# Benchmark for the What-If scenario sweep: a 10k-employee x 1k-scenario grid by default,
+# with a nested-loop reference on a slice of the grid for speed and parity.
+# Usage: python benchmarks/bench_sweep.py [employees] [scenarios]
+import inspect
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_payroll import make_payroll  # noqa: E402
+from taxcore import calculate_paye  # noqa: E402
+from taxcore.scenarios import iter_sweep, scenario_grid, sweep_scenarios  # noqa: E402
+
+# The reference loop times the plain calculator, not its instrumentation wrapper
+calculate_paye = inspect.unwrap(calculate_paye)
+
+REFERENCE_SCENARIOS = 5
+
+
+# Function to build a grid of about the requested size from raises, rebate and tax rate changes
+def make_grid(scenarios):
+    increases = [i * 0.5 for i in range(max(scenarios // 20, 1))]
+    return scenario_grid(increase_pct=increases, fixed_increase=[0, 250, 500, 1_000, 2_000],
+                         tax_rate_change=[0, 1], rebate_change=[0, 500]).head(scenarios)
+
+
+# Function reproducing the sweep with nested Python loops, used as the reference
+def sweep_row_by_row(payroll, grid):
+    results = []
+    employees = payroll.to_dict("records")
+    for _, scenario in grid.iterrows():
+        scenario = {name: float(value) for name, value in scenario.items()}
+        results.append([calculate_paye(employee["Gross Salary"] * (1 + scenario["Increase %"] / 100)
+                                       + scenario["Fixed Increase"],
+                                       employee["Allowances"], employee["Fringe Benefits"],
+                                       employee["Retirement Deductions"], 0,
+                                       (employee["Tax Rate"] + scenario["Tax Rate Change"]) / 100,
+                                       employee["Rebates"] + scenario["Rebate Change"])
+                        for employee in employees])
+    return results
+
+
+def main(employees=10_000, scenarios=1_000):
+    payroll = make_payroll(employees)
+    grid = make_grid(scenarios)
+
+    reference_grid = grid.head(REFERENCE_SCENARIOS)
+    start = time.perf_counter()
+    expected = sweep_row_by_row(payroll, reference_grid)
+    loop_seconds = time.perf_counter() - start
+    _, results = next(iter_sweep(payroll, reference_grid))
+    mismatches = int((results["PAYE"] != expected).sum())
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    totals = sweep_scenarios(payroll, grid)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cells = employees * len(grid)
+
+    print(f"{employees:,} employees x {len(grid):,} scenarios = {cells:,} cells")
+    print(f"  sweep:      {seconds:8.2f} s  {cells / seconds:>14,.0f} cells/s  "
+          f"peak RSS {peak / 1024:.0f} MB (+{(peak - before) / 1024:.0f} MB)")
+    loop_cells = employees * len(reference_grid)
+    print(f"  loop:       {loop_seconds:8.2f} s  {loop_cells / loop_seconds:>14,.0f} cells/s "
+          f"(first {len(reference_grid)} scenarios)")
+    print(f"  PAYE mismatches against the loop: {mismatches}")
+    costliest = totals.nlargest(3, "Cost to Company Change")
+    print(costliest[["Increase %", "Fixed Increase", "Cost to Company Change"]].to_string(float_format="{:,.2f}".format))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:3]]))
@@ -0,0 +1,83 @@
+# Benchmark for the streaming VAT201 engine over a synthetic ledger (10M lines by default).
+# Usage: python benchmarks/bench_vat.py [lines]
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LINES = 10_000_000
+WRITE_CHUNK = 500_000
+
+
+# Function to build part of a synthetic ledger: a year of dates, 5,000 suppliers,
+# two thirds sales and a realistic mix of standard-rated, zero-rated and exempt lines
+def make_ledger(lines, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Date": (np.datetime64("2024-03-01") + rng.integers(0, 365, lines)).astype("datetime64[D]"),
+        "Supplier": pd.Categorical.from_codes(rng.integers(0, 5_000, lines),
+                                              [f"Supplier {i:04d}" for i in range(5_000)]),
+        "Type": pd.Categorical.from_codes((rng.random(lines) < 1 / 3).astype(np.int8), ["Sale", "Purchase"]),
+        "Category": pd.Categorical.from_codes(rng.choice(3, lines, p=[0.8, 0.15, 0.05]),
+                                              ["Standard", "Zero", "Exempt"]),
+        "Amount": np.round(rng.uniform(10, 50_000, lines), 2),
+    })
+
+
+# Function to write the ledger to disk in pieces so generating it needs little memory
+def write_ledger(path, lines, file_format):
+    writer = None
+    written = 0
+    while written < lines:
+        chunk = make_ledger(min(WRITE_CHUNK, lines - written), seed=written)
+        if file_format == "csv":
+            chunk.to_csv(path, mode="a" if written else "w", header=written == 0, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        written += len(chunk)
+    if writer is not None:
+        writer.close()
+
+
+# Function to run the VAT201 command in a child process and return (seconds, peak RSS in MB)
+def run_cli(ledger, output):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "taxcore", "vat201", ledger, output],
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    seconds = time.perf_counter() - start
+    return seconds, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+def main(lines):
+    formats = ["csv"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        print("pyarrow not installed, skipping the Parquet ledger")
+
+    print(f"{'format':>8} {'lines':>12} {'seconds':>10} {'lines/s':>12} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in formats:
+            ledger = os.path.join(directory, f"ledger.{file_format}")
+            output = os.path.join(directory, "vat201.csv")
+            write_ledger(ledger, lines, file_format)
+            seconds, peak_mb = run_cli(ledger, output)
+            print(f"{file_format:>8} {lines:>12,} {seconds:>10.2f} {lines / seconds:>12,.0f} {peak_mb:>12.1f}")
+            os.remove(ledger)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES))
@@ -0,0 +1,69 @@
+# Benchmark for the year-to-date PAYE engine: a full tax year of monthly runs over 100k employees
+# with joiners, leavers and a December bonus. Month 12 should cost about the same as month 1, and
+# every employee paid the same salary all year must have withheld exactly the annual liability.
+# Usage: python benchmarks/bench_ytd.py [employees]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from taxcore.money import to_cents  # noqa: E402
+from taxcore.tax_tables import get_tax_table  # noqa: E402
+from taxcore.ytd import PERIODS_PER_YEAR, YTDStore, run_ytd_period  # noqa: E402
+
+DEFAULT_EMPLOYEES = 100_000
+TAX_YEAR = 2025
+TURNOVER = 0.01  # share of staff leaving (and replaced) each month
+BONUS_PERIOD = 10  # December
+
+
+def main(employees=DEFAULT_EMPLOYEES):
+    rng = np.random.default_rng(42)
+    salaries = np.round(rng.uniform(8_000, 120_000, employees), 2)
+    ages = rng.integers(20, 80, employees)
+    active = np.arange(employees)
+    next_id = employees
+    steady = np.ones(employees, dtype=bool)  # employed all year on one salary, no bonus
+
+    print(f"{'period':>6} {'employees':>10} {'seconds':>9} {'rows/s':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        store = YTDStore.create(os.path.join(directory, "ytd"), TAX_YEAR)
+        for period in range(1, PERIODS_PER_YEAR + 1):
+            leaving = (rng.random(len(active)) < TURNOVER) & (period < PERIODS_PER_YEAR)
+            bonus = np.zeros(len(active))
+            if period == BONUS_PERIOD:
+                bonus = np.where(rng.random(len(active)) < 0.5, salaries[active % employees], 0.0)
+            payroll = pd.DataFrame({
+                "Employee ID": [f"E{number:07d}" for number in active],
+                "Gross Salary": salaries[active % employees],
+                "Bonus": bonus,
+                "Age": ages[active % employees],
+                "Terminated": leaving,
+            })
+            start = time.perf_counter()
+            run_ytd_period(store, period, payroll)
+            seconds = time.perf_counter() - start
+            print(f"{period:>6} {len(active):>10,} {seconds:>9.3f} {len(active) / seconds:>12,.0f}")
+
+            original = active[active < employees]
+            steady[original[leaving[active < employees] | (bonus[active < employees] > 0)]] = False
+            joiners = np.arange(next_id, next_id + int(leaving.sum()))
+            next_id += len(joiners)
+            active = np.concatenate([active[~leaving], joiners])
+
+        table = get_tax_table(TAX_YEAR)
+        rows = store.lookup([f"E{number:07d}" for number in np.flatnonzero(steady)])
+        withheld = store.read(rows)["ytd_paye"].to_numpy()
+        expected = to_cents(table.liability_array(salaries[steady] * PERIODS_PER_YEAR, ages[steady]))
+        mismatches = int((withheld != expected).sum())
+    print(f"{int(steady.sum()):,} full-year employees, YTD PAYE mismatches against the annual liability: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:2]]))
@@ -0,0 +1,23 @@
+# Calculation core for the tax, payroll and financial statement calculators.
+# Importing the package loads no UI code and neither numpy nor pandas; the batch
+# payroll entry points pull those in on first use.
+from .calculators import (calculate_fringe_benefits, calculate_paye, calculate_progressive_tax, calculate_sdl,
+                          calculate_uif, calculate_vat, process_multiple_employees, what_if_analysis)
+from .statements import calculate_balance_sheet, calculate_cash_flow, calculate_income_statement
+from .tax_tables import TaxTable, available_tax_years, get_tax_table
+
+# Heavier entry points, imported from their module the first time they are accessed
+_LAZY_EXPORTS = {
+    "calculate_payroll_batch": "payroll",
+    "process_payroll_file": "payroll_io",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        from importlib import import_module
+
+        value = getattr(import_module(f".{_LAZY_EXPORTS[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,228 @@
+import argparse
+import csv
+import sys
+
+from .calculators import calculate_vat
+from .statements import STATEMENTS
+
+VAT_INPUT_COLUMNS = ["Output Sales", "Input Purchases"]
+
+
+# Function to read a number from a CSV cell, treating blanks as zero
+def _number(value):
+    value = (value or "").strip()
+    return float(value) if value else 0.0
+
+
+# Function to read a CSV file and write one output row per input row.
+# Columns that aren't calculator inputs (a period name, say) are carried through.
+def _map_csv_rows(input_path, output_path, input_columns, output_columns, calculate):
+    rows = 0
+    with open(input_path, newline="", encoding="utf-8-sig") as source, \
+            open(output_path, "w", newline="", encoding="utf-8") as destination:
+        reader = csv.DictReader(source)
+        fieldnames = reader.fieldnames or []
+        missing = [name for name in input_columns if name not in fieldnames]
+        if len(missing) == len(input_columns):
+            raise SystemExit(f"{input_path}: none of the expected columns found ({', '.join(input_columns)})")
+        carried = [name for name in fieldnames if name not in input_columns]
+
+        writer = csv.DictWriter(destination, fieldnames=carried + output_columns)
+        writer.writeheader()
+        for row in reader:
+            result = calculate({name: _number(row.get(name)) for name in input_columns})
+            writer.writerow({**{name: row[name] for name in carried}, **result})
+            rows += 1
+    return rows
+
+
+def run_payroll(args):
+    from .payroll_io import DEFAULT_CHUNK_SIZE, process_payroll_file, read_fringe_register
+
+    fringe = None
+    if args.fringe_register:
+        register, fringe = read_fringe_register(args.fringe_register, args.fringe_months)
+        print(f"Valued {len(register)} fringe benefits for {len(fringe)} employees "
+              f"(R{fringe.sum():,.2f}) from {args.fringe_register}")
+    rows, totals = process_payroll_file(args.input, args.output, args.chunk_size or DEFAULT_CHUNK_SIZE,
+                                        exact=args.exact, fringe=fringe)
+    print(f"Processed {rows} employees -> {args.output}")
+    for name, value in totals.items():
+        print(f"  {name}: R{value:,.2f}")
+
+
+def run_group_payroll(args):
+    import pandas as pd
+
+    from .parallel import run_group_payroll, summarise_stages, summarise_worker_timings
+    from .payroll_io import iter_payroll_chunks
+
+    payroll = pd.concat(list(iter_payroll_chunks(args.input)), ignore_index=True)
+    result_df, timing_df = run_group_payroll(payroll, args.entity_column, args.workers)
+    result_df.to_csv(args.output, index=False)
+    print(f"Processed {len(result_df)} employees in {len(timing_df)} shards -> {args.output}")
+    print(summarise_worker_timings(timing_df).to_string())
+    print(summarise_stages(timing_df).to_string())
+
+
+def run_vat(args):
+    def calculate(values):
+        return {"VAT Payable": calculate_vat(values["Output Sales"], values["Input Purchases"])}
+
+    rows = _map_csv_rows(args.input, args.output, VAT_INPUT_COLUMNS, ["VAT Payable"], calculate)
+    print(f"Calculated VAT for {rows} rows -> {args.output}")
+
+
+def run_vat201(args):
+    from .vat import stream_vat201
+
+    by_period, by_supplier = stream_vat201(args.ledger, args.chunk_size, exact=args.exact or args.round_per is not None,
+                                           rounding_stage=args.round_per or "line")
+    by_period.to_csv(args.output)
+    if args.suppliers:
+        by_supplier.to_csv(args.suppliers)
+    print(f"VAT201 for {len(by_period)} periods and {len(by_supplier)} suppliers -> {args.output}")
+    print(by_period[["Output VAT", "Input VAT", "VAT Payable"]].to_string())
+
+
+def run_sweep(args):
+    import pandas as pd
+
+    from .export import write_sheets
+    from .payroll_io import iter_payroll_chunks
+    from .scenarios import sweep_scenarios
+
+    payroll = pd.concat(list(iter_payroll_chunks(args.payroll)), ignore_index=True)
+    scenarios = pd.read_csv(args.scenarios)
+    scenarios.columns = scenarios.columns.str.strip()
+    totals = sweep_scenarios(payroll, scenarios, args.tax_year)
+    write_sheets({"Scenarios": totals.reset_index()}, args.output)
+    print(f"Swept {len(payroll)} employees x {len(totals)} scenarios -> {args.output}")
+
+
+def run_ytd(args):
+    import pandas as pd
+
+    from .export import write_sheets
+    from .ytd import YTDStore, run_ytd_period
+
+    store = YTDStore.open(args.store, args.tax_year)
+    payroll = pd.read_csv(args.input)
+    payroll.columns = payroll.columns.str.strip()
+    results = run_ytd_period(store, args.period, payroll)
+    write_sheets({"PAYE": results}, args.output)
+    print(f"Period {args.period} of {store.tax_year}: PAYE for {len(results)} employees "
+          f"(R{results['PAYE'].sum():,.2f}); {len(store)} employees in {args.store} -> {args.output}")
+
+
+def run_statement(args):
+    import pandas as pd
+
+    graph = STATEMENTS[args.type]
+    entities = pd.read_csv(args.input)
+    entities.columns = entities.columns.str.strip()
+    if not any(item in entities for item in graph.inputs):
+        raise SystemExit(f"{args.input}: none of the {graph.name} line items found")
+
+    if args.consolidate or args.consolidate_by:
+        statements = graph.consolidate(entities, by=args.consolidate_by)
+        statements.to_csv(args.output, index_label=args.consolidate_by or "Group")
+    else:
+        carried = [name for name in entities.columns if name not in graph.inputs]
+        statements = entities[carried].join(graph.evaluate_frame(entities))
+        statements.to_csv(args.output, index=False)
+    print(f"Calculated {len(statements)} {graph.name} rows from {len(entities)} entities -> {args.output}")
+
+
+# Only the commands that need pandas import it, so the parser itself stays cheap
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m taxcore",
+                                     description="Run payroll, VAT and financial statement jobs from files.")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="record timings, row counts and memory high-water marks of the calculation paths and "
+                             "write them to FILE (Prometheus text for .prom/.txt, JSON otherwise)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="with --metrics, also record memory high-water marks (tracemalloc slows large runs down)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    payroll = commands.add_parser("payroll", help="calculate PAYE, UIF and SDL for a CSV/XLSX payroll file")
+    payroll.add_argument("input", help="payroll file (.csv or .xlsx)")
+    payroll.add_argument("output", help="CSV file to write the results to")
+    payroll.add_argument("--chunk-size", type=int, help="employees processed per chunk (default 50000)")
+    payroll.add_argument("--exact", action="store_true", help="calculate in integer cents, rounding each line half-up")
+    payroll.add_argument("--fringe-register", metavar="FILE",
+                         help="benefit register (.csv or .xlsx: Employee Name, Benefit Type, Value and any rule "
+                              "parameters) whose values are added to each employee's Fringe Benefits")
+    payroll.add_argument("--fringe-months", type=int, default=1,
+                         help="months the register is valued for (default 1, a monthly payroll)")
+    payroll.set_defaults(run=run_payroll)
+
+    group = commands.add_parser("group-payroll", help="calculate a multi-entity payroll across a process pool")
+    group.add_argument("input", help="payroll file (.csv or .xlsx) with an entity column")
+    group.add_argument("output", help="CSV file to write the results to")
+    group.add_argument("--entity-column", default="Entity", help="column that identifies the legal entity")
+    group.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    group.set_defaults(run=run_group_payroll)
+
+    vat = commands.add_parser("vat", help="calculate VAT payable for each row of a CSV file")
+    vat.add_argument("input", help=f"CSV file with the columns {' and '.join(VAT_INPUT_COLUMNS)}")
+    vat.add_argument("output", help="CSV file to write the results to")
+    vat.set_defaults(run=run_vat)
+
+    vat201 = commands.add_parser("vat201", help="stream a transaction ledger into VAT201 totals per period")
+    vat201.add_argument("ledger", help="ledger file (.csv or .parquet) with Date or Period, Supplier, Type, "
+                                       "Category and Amount columns")
+    vat201.add_argument("output", help="CSV file to write the totals per period to")
+    vat201.add_argument("--suppliers", help="CSV file to write the totals per supplier to")
+    vat201.add_argument("--chunk-size", type=int, default=1_000_000, help="ledger lines read per chunk")
+    vat201.add_argument("--exact", action="store_true", help="add up in integer cents, rounding VAT half-up")
+    vat201.add_argument("--round-per", choices=["line", "total"],
+                        help="with --exact, round VAT on each line (default) or once per period/supplier total")
+    vat201.set_defaults(run=run_vat201)
+
+    sweep = commands.add_parser("sweep", help="evaluate a grid of salary and tax scenarios over a payroll")
+    sweep.add_argument("payroll", help="payroll file (.csv or .xlsx)")
+    sweep.add_argument("scenarios", help="CSV file with one row per scenario (Scenario, Increase %%, Fixed Increase, "
+                                         "Tax Rate Change, Rebate Change, Bracket Adjustment %%)")
+    sweep.add_argument("output", help="file to write the per-scenario totals to (.csv, .xlsx or .parquet)")
+    sweep.add_argument("--tax-year", type=int, help="use the SARS progressive tables for this year instead of "
+                                                    "each employee's flat Tax Rate")
+    sweep.set_defaults(run=run_sweep)
+
+    ytd = commands.add_parser("ytd", help="run one month of cumulative (year-to-date) PAYE against a state store")
+    ytd.add_argument("store", help="directory holding the tax year's YTD state (created on first use)")
+    ytd.add_argument("period", type=int, help="month of the tax year, 1 (March) to 12 (February)")
+    ytd.add_argument("input", help="CSV file with Employee ID, Gross Salary and optionally Allowances, Fringe Benefits, "
+                                   "Retirement Deductions, Bonus, Age and Terminated (1 in the last month)")
+    ytd.add_argument("output", help="file to write the month's PAYE to (.csv, .xlsx or .parquet)")
+    ytd.add_argument("--tax-year", type=int, help="tax year of a new store (default: latest)")
+    ytd.set_defaults(run=run_ytd)
+
+    statement = commands.add_parser("statement", help="calculate a financial statement for each row of a CSV file")
+    statement.add_argument("type", choices=sorted(STATEMENTS), help="statement to calculate")
+    statement.add_argument("input", help="CSV file with one column per line item (missing items count as zero)")
+    statement.add_argument("output", help="CSV file to write the results to")
+    statement.add_argument("--consolidate", action="store_true", help="write one consolidated group statement")
+    statement.add_argument("--consolidate-by", metavar="COLUMN", help="consolidate per value of this column")
+    statement.set_defaults(run=run_statement)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.metrics:
+        from .instrumentation import enable_instrumentation, timed, write_instrumentation
+
+        enable_instrumentation(track_memory=args.trace_memory)
+        with timed(f"command {args.command}"):
+            args.run(args)
+        write_instrumentation(args.metrics)
+        print(f"Metrics -> {args.metrics}")
+        return 0
+    args.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import hashlib
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+# Every memoized calculator registers its cache here by name. The registry lives in this
+# module rather than in the Streamlit script, so it survives reruns and is shared by all sessions.
+_CACHES = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+# numpy and pandas are looked up in sys.modules instead of imported: if the caller
+# hasn't loaded them, no argument can be one of their objects, and importing this
+# module stays cheap for workers that never touch them.
+def _loaded(module_name):
+    return sys.modules.get(module_name)
+
+
+# Function to feed a value into a hash, handling DataFrames and arrays by content
+def _update_hash(hasher, value):
+    try:
+        _update_hash_by_content(hasher, value)
+    except TypeError:
+        # Objects pandas can't hash (e.g. lists inside a column) fall back to their pickled form
+        hasher.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _update_hash_by_content(hasher, value):
+    pd = _loaded("pandas")
+    np = _loaded("numpy")
+    if pd is not None and isinstance(value, pd.DataFrame):
+        hasher.update(b"DataFrame")
+        hasher.update(repr((list(value.columns), [str(dtype) for dtype in value.dtypes])).encode())
+        hasher.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif pd is not None and isinstance(value, pd.Series):
+        hasher.update(b"Series")
+        hasher.update(repr((value.name, str(value.dtype))).encode())
+        hasher.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif np is not None and isinstance(value, np.ndarray):
+        hasher.update(b"ndarray")
+        hasher.update(repr((value.dtype.str, value.shape)).encode())
+        hasher.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        hasher.update(f"{type(value).__name__}:{len(value)}".encode())
+        for item in value:
+            _update_hash(hasher, item)
+    elif isinstance(value, dict):
+        hasher.update(f"dict:{len(value)}".encode())
+        for key in sorted(value, key=repr):
+            _update_hash(hasher, key)
+            _update_hash(hasher, value[key])
+    else:
+        hasher.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+# Function to build a cache key from a call's arguments
+def make_key(args, kwargs):
+    hasher = hashlib.blake2b(digest_size=16)
+    _update_hash(hasher, args)
+    _update_hash(hasher, kwargs)
+    return hasher.hexdigest()
+
+
+# Function to estimate how many bytes a cached result holds
+def estimate_size(value):
+    pd = _loaded("pandas")
+    np = _loaded("numpy")
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if pd is not None and isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if np is not None and isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    return sys.getsizeof(value)
+
+
+# A least-recently-used cache bounded by entry count and (optionally) total result size
+class LRUCache:
+    def __init__(self, name, maxsize=128, max_bytes=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self.fingerprint = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Returns (True, value) on a hit and (False, None) on a miss
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key][0]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if self.max_bytes is not None and size > self.max_bytes:
+                return  # larger than the whole cache, keep it out rather than flushing everything
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while len(self._entries) > self.maxsize or (
+                    self.max_bytes is not None and self.current_bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "Cache": self.name,
+                "Entries": len(self._entries),
+                "Max Entries": self.maxsize,
+                "Size (MB)": round(self.current_bytes / 1_048_576, 3),
+                "Max Size (MB)": None if self.max_bytes is None else round(self.max_bytes / 1_048_576, 1),
+                "Hits": self.hits,
+                "Misses": self.misses,
+                "Hit Rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "Evictions": self.evictions,
+            }
+
+
+# Function to get the named cache, creating it on first use
+def get_cache(name, maxsize=128, max_bytes=None):
+    with _REGISTRY_LOCK:
+        cache = _CACHES.get(name)
+        if cache is None:
+            cache = _CACHES[name] = LRUCache(name, maxsize, max_bytes)
+        else:
+            cache.maxsize, cache.max_bytes = maxsize, max_bytes
+        return cache
+
+
+# Function to fingerprint a function's code so an edited function doesn't get stale results
+def _code_fingerprint(func):
+    code = func.__code__
+    return hashlib.blake2b(code.co_code + repr(code.co_consts).encode(), digest_size=8).hexdigest()
+
+
+# Function to give a caller its own copy of a cached DataFrame, Series or array, so changing a
+# result in place can't change what the cache hands the next caller (in any session)
+def _detached(value):
+    pd = _loaded("pandas")
+    np = _loaded("numpy")
+    if (pd is not None and isinstance(value, (pd.DataFrame, pd.Series))) or (
+            np is not None and isinstance(value, np.ndarray)):
+        return value.copy()
+    return value
+
+
+# Decorator that memoizes a pure calculator on a hash of its arguments. Building the key pickles
+# and hashes the arguments, which costs more than any of the taxcore calculators (the vectorised
+# payroll batch included), so only use it for calculations slower than that. DataFrame, Series and array results are copied for each caller; other mutable
+# results (lists, dicts) are shared between callers, so treat them as read-only.
+def memoize(name=None, maxsize=128, max_bytes=None):
+    def decorator(func):
+        cache = get_cache(name or func.__qualname__, maxsize, max_bytes)
+        fingerprint = _code_fingerprint(func)
+        if cache.fingerprint != fingerprint:
+            cache.clear()
+            cache.fingerprint = fingerprint
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            found, value = cache.get(key)
+            if found:
+                return _detached(value)
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+            return _detached(value)
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+# Function to collect the statistics of every registered cache
+def cache_stats():
+    with _REGISTRY_LOCK:
+        caches = list(_CACHES.values())
+    return [cache.stats() for cache in caches]
+
+
+# Function to empty every registered cache
+def clear_caches():
+    with _REGISTRY_LOCK:
+        caches = list(_CACHES.values())
+    for cache in caches:
+        cache.clear()
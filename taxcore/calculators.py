@@ -0,0 +1,61 @@
+from .fringe import DEFAULT_FRINGE_RULES
+from .instrumentation import instrument
+from .tax_tables import compile_tax_table
+
+# Function to calculate PAYE
+@instrument()
+def calculate_paye(gross_salary, allowances, fringe_benefits, retirement_deductions, medical_credits, tax_rate, rebates):
+    taxable_income = gross_salary + allowances + fringe_benefits - retirement_deductions
+    annual_paye = (taxable_income * tax_rate) - rebates
+    monthly_paye = annual_paye / 12
+    return round(monthly_paye, 2)
+
+# Function to calculate UIF
+@instrument()
+def calculate_uif(gross_salary):
+    employee_uif = gross_salary * 0.01
+    employer_uif = gross_salary * 0.01
+    total_uif = employee_uif + employer_uif
+    return round(total_uif, 2), round(employee_uif, 2), round(employer_uif, 2)
+
+# Function to calculate SDL
+@instrument()
+def calculate_sdl(gross_salary):
+    sdl = gross_salary * 0.01
+    return round(sdl, 2)
+
+# Function to calculate VAT
+@instrument()
+def calculate_vat(output_sales, input_purchases):
+    output_vat = output_sales * 0.15
+    input_vat = input_purchases * (15/115)
+    vat_payable = output_vat - input_vat
+    return round(vat_payable, 2)
+
+# Function for progressive tax rates (based on SARS brackets)
+@instrument()
+def calculate_progressive_tax(taxable_income, brackets, rates, rebates):
+    tax_liability = compile_tax_table(tuple(brackets), tuple(rates)).tax(taxable_income)
+    return round(tax_liability - rebates, 2)
+
+# Function to value a fringe benefit with the rule for its type (see taxcore.fringe);
+# parameters such as official_rate or employee_contribution override the rule's defaults
+@instrument()
+def calculate_fringe_benefits(value, benefit_type, **parameters):
+    return DEFAULT_FRINGE_RULES.value(benefit_type, value, **parameters)
+
+# Function for What-If Analysis
+@instrument()
+def what_if_analysis(gross_salary, proposed_increase, tax_rate):
+    new_salary = gross_salary + proposed_increase
+    new_paye = calculate_paye(new_salary, 0, 0, 0, 0, tax_rate/100, 0)
+    return round(new_salary, 2), round(new_paye, 2)
+
+# Function to handle multiple employees
+@instrument()
+def process_multiple_employees(employee_data):
+    import pandas as pd
+
+    from .payroll import PAYROLL_INPUT_COLUMNS, calculate_payroll_batch
+
+    return calculate_payroll_batch(pd.DataFrame(employee_data, columns=PAYROLL_INPUT_COLUMNS))
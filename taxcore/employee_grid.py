@@ -0,0 +1,83 @@
+import pandas as pd
+
+from .calculators import process_multiple_employees
+from .payroll import PAYROLL_DEFAULTS, PAYROLL_INPUT_COLUMNS
+
+DEFAULT_PAGE_SIZE = 50
+
+_NUMERIC_DEFAULTS = {"Gross Salary": 0.0, **PAYROLL_DEFAULTS}
+
+
+# Function to build the input rows for new employees, numbered from start (0-based)
+def blank_employees(start, count):
+    index = pd.RangeIndex(start, start + count)
+    rows = pd.DataFrame({"Employee Name": [f"Employee {i + 1}" for i in index], **_NUMERIC_DEFAULTS}, index=index)
+    return rows[PAYROLL_INPUT_COLUMNS]
+
+
+# Function to count the pages needed for a number of rows (at least one, so an empty table still has a page)
+def page_count(rows, page_size=DEFAULT_PAGE_SIZE):
+    return max((rows + page_size - 1) // page_size, 1)
+
+
+# Function to slice one page (1-based) out of a DataFrame
+def page_of(frame, page, page_size=DEFAULT_PAGE_SIZE):
+    start = (page - 1) * page_size
+    return frame.iloc[start:start + page_size]
+
+
+# Function to apply a data editor's edited_rows deltas ({row position: {column: value}}) to the
+# page it was given; returns just the edited rows, with the page's index
+def apply_edited_rows(page, edited_rows):
+    positions = sorted(int(position) for position in edited_rows)
+    rows = page.iloc[positions].copy()
+    for label, position in zip(rows.index, positions):
+        for column, value in edited_rows.get(position, edited_rows.get(str(position), {})).items():
+            rows.at[label, column] = value
+    return rows
+
+
+# Editable payroll held as one input DataFrame and one result DataFrame with the same index.
+# Edits arrive a page at a time; only the rows whose inputs actually changed are recalculated,
+# so the cost of an edit depends on the size of the edit, not on the number of employees.
+# version goes up on every change, so callers can cache anything derived from the results.
+class EmployeeGrid:
+    def __init__(self, employees=1):
+        self.table = blank_employees(0, employees)
+        self.results = process_multiple_employees(self.table)
+        self.version = 0
+        self.last_recalculated = employees
+
+    def __len__(self):
+        return len(self.table)
+
+    # Function to add blank employees at the end or drop them from the end
+    def resize(self, employees):
+        current = len(self.table)
+        if employees > current:
+            added = blank_employees(current, employees - current)
+            self.table = pd.concat([self.table, added])
+            self.results = pd.concat([self.results, process_multiple_employees(added)])
+        elif employees < current:
+            self.table = self.table.iloc[:employees].copy()
+            self.results = self.results.iloc[:employees].copy()
+        else:
+            return
+        self.last_recalculated = max(employees - current, 0)
+        self.version += 1
+
+    # Function to apply an edited page (same index as the rows it came from) and recalculate the
+    # rows that changed; returns how many were recalculated
+    def update(self, edited):
+        # A cleared cell counts as the column's default, not as a missing amount
+        edited = edited[PAYROLL_INPUT_COLUMNS].fillna(_NUMERIC_DEFAULTS)
+        current = self.table.loc[edited.index]
+        same = (current == edited) | (current.isna() & edited.isna())
+        changed = edited.index[~same.all(axis=1)]
+        self.last_recalculated = len(changed)
+        if len(changed):
+            rows = edited.loc[changed]
+            self.table.loc[changed] = rows
+            self.results.loc[changed] = process_multiple_employees(rows)
+            self.version += 1
+        return len(changed)
@@ -0,0 +1,179 @@
+import io
+import os
+import re
+import zipfile
+from importlib.util import find_spec
+
+import pandas as pd
+
+from .instrumentation import count_rows, instrument
+
+# File extension and download MIME type of each export format
+EXPORT_FORMATS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+# CSV and Parquet hold one table per file, so several sheets are exported as a zip of files
+ZIP_MIME = "application/zip"
+
+# Excel limits sheet names to 31 characters and forbids a few punctuation marks
+_SHEET_NAME_LIMIT = 31
+_INVALID_SHEET_CHARACTERS = re.compile(r"[\[\]:*?/\\]")
+
+
+# Function to work out the export format from a file name, defaulting to CSV
+def detect_export_format(name):
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+
+# Function to list the formats that can be written here (Parquet needs pyarrow)
+def available_export_formats():
+    return [name for name in EXPORT_FORMATS if name != "parquet" or find_spec("pyarrow") is not None]
+
+
+# Function to lay out a statement dict (label -> amount) as a two-column table
+def statement_frame(data):
+    return pd.DataFrame({"Line Item": list(data.keys()), "Amount": list(data.values())})
+
+
+# Function to build an empty DataFrame from column types (column name -> dtype)
+def empty_frame(column_types):
+    return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in column_types.items()})
+
+
+# Function to treat a sheet as a sequence of chunks: a DataFrame is one chunk, anything else is
+# iterated (a generator of results, for example, so only one chunk is in memory at a time). A sheet
+# with no chunks gives one empty chunk of its column types, when they are known, so it keeps its header.
+def _iter_chunks(data, column_types=None):
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    empty = True
+    for chunk in chunks:
+        empty = False
+        count_rows(len(chunk))
+        yield chunk
+    if empty and column_types:
+        yield empty_frame(column_types)
+
+
+# Function to make a sheet name Excel accepts, unique within the workbook (case-insensitively)
+def _sheet_title(name, used):
+    title = _INVALID_SHEET_CHARACTERS.sub("_", str(name))[:_SHEET_NAME_LIMIT] or "Sheet"
+    base, counter = title, 2
+    while title.lower() in used:
+        suffix = f" ({counter})"
+        title = base[:_SHEET_NAME_LIMIT - len(suffix)] + suffix
+        counter += 1
+    used.add(title.lower())
+    return title
+
+
+# Function to write sheets into a write-only openpyxl workbook. Rows go straight to the
+# worksheet's temporary file, so memory stays flat however many rows are written.
+def _write_xlsx(sheets, handle, column_types):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    used = set()
+    for name, data in sheets.items():
+        worksheet = workbook.create_sheet(_sheet_title(name, used))
+        header = None
+        for chunk in _iter_chunks(data, column_types.get(name)):
+            if header is None:
+                header = [str(column) for column in chunk.columns]
+                worksheet.append(header)
+            missing = chunk.columns[chunk.isna().any()]
+            if len(missing):
+                # Excel has no NaN; blank cells are what to_excel writes for missing values
+                chunk = chunk.astype({column: object for column in missing})
+                chunk[missing] = chunk[missing].where(chunk[missing].notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                worksheet.append(row)
+    if not workbook.worksheets:
+        workbook.create_sheet("Sheet")
+    workbook.save(handle)
+
+
+# Function to write one sheet as CSV, appending each chunk without repeating the header
+def _write_csv(data, handle, column_types=None):
+    header = True
+    for chunk in _iter_chunks(data, column_types):
+        chunk.to_csv(handle, header=header, index=False, encoding="utf-8")
+        header = False
+
+
+# Function to write one sheet as Parquet, one row group per chunk. With column types the schema is
+# fixed up front, so every chunk is converted to it and a sheet without rows is still a valid file;
+# without them the first chunk's schema is used.
+def _write_parquet(data, handle, column_types=None):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Writing Parquet exports requires pyarrow (pip install pyarrow)") from None
+
+    schema = None
+    if column_types:
+        schema = pa.Schema.from_pandas(empty_frame(column_types), preserve_index=False)
+    writer = None if schema is None else pq.ParquetWriter(handle, schema)
+    try:
+        for chunk in _iter_chunks(data, column_types):
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(handle, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is None:
+            writer = pq.ParquetWriter(handle, pa.schema([]))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+# Function to export sheets (name -> DataFrame or iterable of DataFrame chunks) to a path or a
+# binary file object. XLSX keeps every sheet in one workbook; CSV and Parquet write a single
+# sheet directly and several sheets as a zip archive of one file per sheet. column_types
+# (sheet name -> {column: dtype}) fixes a sheet's Parquet schema and the header of an empty sheet.
+@instrument()
+def write_sheets(sheets, destination, file_format=None, column_types=None):
+    if file_format is None:
+        file_format = detect_export_format(getattr(destination, "name", destination))
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{file_format}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, "wb") as handle:
+            return _write_sheets(sheets, handle, file_format, column_types or {})
+    _write_sheets(sheets, destination, file_format, column_types or {})
+
+
+def _write_sheets(sheets, destination, file_format, column_types):
+    if file_format == "xlsx":
+        _write_xlsx(sheets, destination, column_types)
+        return
+    write_table = _write_csv if file_format == "csv" else _write_parquet
+    if len(sheets) == 1:
+        name, data = next(iter(sheets.items()))
+        write_table(data, destination, column_types.get(name))
+        return
+    extension = EXPORT_FORMATS[file_format][0]
+    used = set()
+    with zipfile.ZipFile(destination, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in sheets.items():
+            with archive.open(f"{_sheet_title(name, used)}.{extension}", "w") as member:
+                write_table(data, member, column_types.get(name))
+
+
+# Function to export sheets to memory for a download: returns (bytes, file name, MIME type)
+@instrument()
+def export_download(sheets, file_stem, file_format):
+    buffer = io.BytesIO()
+    write_sheets(sheets, buffer, file_format)
+    extension, mime = EXPORT_FORMATS[file_format]
+    if file_format != "xlsx" and len(sheets) > 1:
+        extension, mime = "zip", ZIP_MIME
+    return buffer.getvalue(), f"{file_stem}.{extension}", mime
@@ -0,0 +1,165 @@
+# Rules-driven fringe benefit valuation.
+# Each benefit type maps to a formula over the columns of a benefit register (one row per asset,
+# loan or arrangement) plus the defaults for the columns a register may leave out. Formulas are
+# compiled once; a register is valued one rule at a time over all of that rule's rows, so there is
+# no per-row dispatch on the benefit type. Formula names are the register's column names in
+# snake_case ("Official Rate" -> official_rate). numpy and pandas are only imported for registers,
+# so valuing a single benefit stays light.
+#
+# The defaults reproduce the calculator's original flat rates (3% of a car's value, a 5% interest
+# differential on a loan, other benefits at their value) until a register supplies the real figures.
+
+# Benefit type -> formula and column defaults. "value" is the asset's value, the loan balance or the
+# rental value; months is the number of months the valuation covers. An employee contribution can
+# reduce a benefit to nothing but not below it.
+FRINGE_RULES = {
+    "Company Car": {
+        "formula": ("value * (rate / 100) * months"
+                    " - minimum(employee_contribution, maximum(value * (rate / 100) * months, 0))"),
+        "defaults": {"rate": 3.0, "months": 1, "employee_contribution": 0.0},
+    },
+    "Low-Interest Loan": {
+        "formula": "value * (maximum(official_rate - interest_rate, 0) / 100) * (months / 12)",
+        "defaults": {"official_rate": 5.0, "interest_rate": 0.0, "months": 12},
+    },
+    "Accommodation": {
+        "formula": "value * months - minimum(employee_contribution, maximum(value * months, 0))",
+        "defaults": {"months": 1, "employee_contribution": 0.0},
+    },
+    "Other": {
+        "formula": "value * months",
+        "defaults": {"months": 1},
+    },
+}
+
+# Rule used for benefit types the table doesn't list
+DEFAULT_BENEFIT_TYPE = "Other"
+
+# Register columns (values and formula parameters are looked up by their Title Case names)
+BENEFIT_TYPE_COLUMN = "Benefit Type"
+EMPLOYEE_COLUMN = "Employee Name"
+FRINGE_RESULT_COLUMN = "Taxable Value"
+
+# Functions a formula may call, for arrays and for single values
+_ARRAY_FUNCTIONS = ("maximum", "minimum", "where")
+_SCALAR_FUNCTIONS = {
+    "maximum": max,
+    "minimum": min,
+    "where": lambda condition, if_true, if_false: if_true if condition else if_false,
+}
+
+
+# Function to give the register column a formula name is read from
+def column_name(name):
+    return name.replace("_", " ").title()
+
+
+# A benefit type's compiled formula: code evaluated over register columns, and the same formula
+# compiled as a plain function of one benefit (its defaults as keyword-only arguments) for single values
+class FringeRule:
+    def __init__(self, benefit_type, formula, defaults=None):
+        self.benefit_type = benefit_type
+        self.formula = formula
+        self.defaults = dict(defaults or {})
+        self.code = compile(formula, f"<fringe rule {benefit_type}>", "eval")
+        self.names = [name for name in self.code.co_names if name not in _ARRAY_FUNCTIONS]
+        missing = [name for name in self.names if name != "value" and name not in self.defaults]
+        if missing:
+            raise ValueError(f"Fringe rule '{benefit_type}' has no default for: {', '.join(missing)}")
+        arguments = ", ".join(f"{name}={value!r}" for name, value in self.defaults.items())
+        self.scalar = eval(compile(f"lambda value, *, {arguments}: {formula}" if arguments
+                                   else f"lambda value: {formula}", f"<fringe rule {benefit_type}>", "eval"),
+                           {"__builtins__": {}, **_SCALAR_FUNCTIONS})
+
+    # Function to reject parameters the rule doesn't have (a misspelt name would otherwise be ignored)
+    def check_parameters(self, parameters):
+        unknown = sorted(set(parameters) - set(self.defaults))
+        if unknown:
+            raise TypeError(f"Fringe rule '{self.benefit_type}' has no parameter {', '.join(unknown)} "
+                            f"(expected one of: {', '.join(self.defaults) or 'none'})")
+
+    def __repr__(self):
+        return f"FringeRule({self.benefit_type!r}, {self.formula!r})"
+
+    def evaluate(self, variables, functions):
+        return eval(self.code, {"__builtins__": {}, **functions}, variables)
+
+
+# A compiled rule table. value() values one benefit; value_register() values a whole register.
+class FringeRules:
+    def __init__(self, rules=FRINGE_RULES, default_type=DEFAULT_BENEFIT_TYPE):
+        if default_type not in rules:
+            raise ValueError(f"The default benefit type '{default_type}' has no rule")
+        self.rules = {benefit_type: FringeRule(benefit_type, rule["formula"], rule.get("defaults"))
+                      for benefit_type, rule in rules.items()}
+        self.types = list(self.rules)
+        self.default_type = default_type
+        self.parameters = {name for rule in self.rules.values() for name in rule.defaults}
+
+    def rule(self, benefit_type):
+        return self.rules.get(benefit_type) or self.rules[self.default_type]
+
+    # Function to value one benefit as a float; parameters override the rule's defaults
+    def value(self, benefit_type, value, **parameters):
+        rule = self.rule(benefit_type)
+        if parameters:
+            rule.check_parameters(parameters)
+        return float(rule.scalar(value, **parameters))
+
+    # Function to value every row of a register (a DataFrame with Benefit Type and Value columns, plus
+    # any parameter columns). Missing or blank parameters take the rule's defaults, or the values in
+    # parameters (e.g. months=1 for a monthly payroll) when given. Returns the values as a Series.
+    def value_register(self, register, **parameters):
+        import numpy as np
+        import pandas as pd
+
+        unknown = sorted(set(parameters) - self.parameters)
+        if unknown:
+            raise TypeError(f"No fringe rule has a parameter {', '.join(unknown)}")
+        if not isinstance(register, pd.DataFrame):
+            register = pd.DataFrame(register)
+        for name in (BENEFIT_TYPE_COLUMN, "Value"):
+            if name not in register:
+                raise KeyError(f"Fringe benefit register is missing required column '{name}'")
+
+        # One categorical pass turns the types into rule numbers; unknown types use the default rule
+        codes = pd.Categorical(register[BENEFIT_TYPE_COLUMN].astype(str).str.strip(), categories=self.types).codes
+        codes = np.where(codes < 0, self.types.index(self.default_type), codes)
+        functions = {name: getattr(np, name) for name in _ARRAY_FUNCTIONS}
+        values = np.zeros(len(register))
+        for code, rule in enumerate(self.rules.values()):
+            rows = np.flatnonzero(codes == code)
+            if not len(rows):
+                continue
+            variables = {}
+            for name in rule.names:
+                default = parameters.get(name, rule.defaults.get(name, 0.0))
+                column = column_name(name)
+                if column in register:
+                    variables[name] = register[column].to_numpy(dtype=np.float64)[rows]
+                    if name != "value":
+                        variables[name] = np.where(np.isnan(variables[name]), default, variables[name])
+                else:
+                    variables[name] = np.full(len(rows), default, dtype=np.float64)
+            values[rows] = rule.evaluate(variables, functions)
+        return pd.Series(values, index=register.index, name=FRINGE_RESULT_COLUMN)
+
+    # Function to total a register per employee (in order of first appearance)
+    def value_by_employee(self, register, employee_column=EMPLOYEE_COLUMN, **parameters):
+        if employee_column not in register:
+            raise KeyError(f"Fringe benefit register is missing the employee column '{employee_column}'")
+        values = self.value_register(register, **parameters)
+        return values.groupby(register[employee_column].to_numpy(), sort=False).sum().rename_axis(employee_column)
+
+
+DEFAULT_FRINGE_RULES = FringeRules()
+
+
+# Function to add per-employee fringe benefit totals (a Series indexed by employee) to a payroll's
+# Fringe Benefits column; employees without benefits keep what the payroll already had
+def add_fringe_benefits(payroll, by_employee, employee_column=EMPLOYEE_COLUMN):
+    if employee_column not in payroll:
+        raise KeyError(f"Payroll is missing the employee column '{employee_column}'")
+    extra = payroll[employee_column].map(by_employee).fillna(0.0).to_numpy(dtype="float64")
+    current = payroll["Fringe Benefits"].fillna(0.0).to_numpy(dtype="float64") if "Fringe Benefits" in payroll else 0.0
+    return payroll.assign(**{"Fringe Benefits": current + extra})
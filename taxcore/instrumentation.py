@@ -0,0 +1,238 @@
+# Opt-in timing instrumentation for the calculation and export paths.
+# Instrumented functions record calls, wall time, rows handled and the memory high-water mark of
+# each call in a registry kept in this module, like the cache registry, so it survives Streamlit
+# reruns and is shared by all sessions; the switch is process-wide too. While instrumentation is off
+# (the default) a wrapped call costs one flag check. Memory is measured with tracemalloc (numpy and
+# pandas report their buffers to it); it slows allocation-heavy code such as the XLSX writer down
+# several times over, so it is only switched on when asked for. tracemalloc keeps a single peak for
+# the whole process, so the high-water marks are only meaningful while one instrumented run happens
+# at a time (the CLI's --trace-memory). The process's peak resident memory is always reported.
+# json and tracemalloc are only imported once they are needed, to keep importing taxcore cheap.
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_STATS = {}
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_enabled = False
+_track_memory = False
+# Whether tracemalloc was started here, and so may be stopped here
+_started_tracemalloc = False
+
+# Prometheus metric name, type and help text for each recorded field
+_PROMETHEUS_METRICS = [
+    ("calls", "taxcore_calls_total", "counter", "Calls of an instrumented calculation path"),
+    ("seconds", "taxcore_seconds_total", "counter", "Wall time spent in an instrumented calculation path"),
+    ("max_seconds", "taxcore_seconds_max", "gauge", "Slowest single call of an instrumented calculation path"),
+    ("rows", "taxcore_rows_total", "counter", "Rows handled by an instrumented calculation path"),
+    ("peak_bytes", "taxcore_peak_memory_bytes", "gauge", "Largest memory high-water mark of a single call"),
+]
+
+
+def instrumentation_enabled():
+    return _enabled
+
+
+# Function to switch instrumentation on; track_memory adds the tracemalloc high-water marks
+def enable_instrumentation(track_memory=False):
+    import tracemalloc
+
+    global _enabled, _track_memory, _started_tracemalloc
+    _track_memory = track_memory
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    elif not track_memory:
+        _stop_tracemalloc()
+    _enabled = True
+
+
+def disable_instrumentation():
+    global _enabled, _track_memory
+    _enabled = _track_memory = False
+    _stop_tracemalloc()
+
+
+# Function to stop tracemalloc if it was started here; tracing someone else started is left running
+def _stop_tracemalloc():
+    global _started_tracemalloc
+    tracemalloc = sys.modules.get("tracemalloc")
+    if _started_tracemalloc and tracemalloc is not None and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _started_tracemalloc = False
+
+
+def reset_instrumentation():
+    with _LOCK:
+        _STATS.clear()
+
+
+# Function to add a measurement to the registry (also used for timings taken outside a wrapped call)
+def record(name, seconds, rows=None, peak_bytes=None):
+    with _LOCK:
+        stats = _STATS.get(name)
+        if stats is None:
+            stats = _STATS[name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0,
+                                    "rows": 0, "peak_bytes": None}
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        stats["last_seconds"] = seconds
+        if rows is not None:
+            stats["rows"] += int(rows)
+        if peak_bytes is not None:
+            stats["peak_bytes"] = max(stats["peak_bytes"] or 0, int(peak_bytes))
+
+
+def _frames():
+    if not hasattr(_LOCAL, "frames"):
+        _LOCAL.frames = []
+    return _LOCAL.frames
+
+
+# Function to add rows to the innermost instrumented call, for paths that stream their input
+def count_rows(rows):
+    if _enabled and _frames():
+        frame = _frames()[-1]
+        frame["rows"] = (frame["rows"] or 0) + rows
+
+
+# Context manager timing a block under a name. Nested blocks each get their own high-water mark:
+# tracemalloc keeps a single peak, so it is reset on entry to every block and the peaks seen by the
+# inner blocks are handed back to the block around them.
+@contextmanager
+def timed(name, rows=None):
+    if not _enabled:
+        yield None
+        return
+    import tracemalloc
+
+    frames = _frames()
+    tracking = _track_memory and tracemalloc.is_tracing()
+    frame = {"rows": rows, "start_bytes": 0, "peak": 0}
+    if tracking:
+        current, peak = tracemalloc.get_traced_memory()
+        if frames:
+            frames[-1]["peak"] = max(frames[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame["start_bytes"] = frame["peak"] = current
+    frames.append(frame)
+    start = time.perf_counter()
+    try:
+        yield frame
+    finally:
+        seconds = time.perf_counter() - start
+        frames.pop()
+        peak_bytes = None
+        if tracking and tracemalloc.is_tracing():
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            peak_bytes = peak - frame["start_bytes"]
+            if frames:
+                frames[-1]["peak"] = max(frames[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+        record(name, seconds, frame["rows"], peak_bytes)
+
+
+# Function to count the rows in a result: DataFrames, Series and arrays by length
+def _result_rows(result):
+    if hasattr(result, "shape") and len(result.shape):
+        return result.shape[0]
+    return None
+
+
+# Decorator that times a calculation path while instrumentation is on. rows is a function of the
+# result returning the row count (by default the length of a DataFrame, Series or array result).
+def instrument(name=None, rows=_result_rows):
+    def decorator(func):
+        path = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with timed(path) as frame:
+                result = func(*args, **kwargs)
+                if frame["rows"] is None:
+                    frame["rows"] = rows(result)
+                return result
+
+        return wrapper
+    return decorator
+
+
+# Function to collect the statistics of every instrumented path, slowest first
+def instrumentation_stats():
+    with _LOCK:
+        items = [(name, dict(stats)) for name, stats in _STATS.items()]
+    rows = []
+    for name, stats in sorted(items, key=lambda item: -item[1]["seconds"]):
+        rows.append({
+            "Path": name,
+            "Calls": stats["calls"],
+            "Total (s)": round(stats["seconds"], 4),
+            "Mean (ms)": round(stats["seconds"] / stats["calls"] * 1000, 3),
+            "Max (ms)": round(stats["max_seconds"] * 1000, 3),
+            "Last (ms)": round(stats["last_seconds"] * 1000, 3),
+            "Rows": stats["rows"],
+            "Rows/s": round(stats["rows"] / stats["seconds"]) if stats["rows"] and stats["seconds"] else 0,
+            "Peak Memory (MB)": None if stats["peak_bytes"] is None else round(stats["peak_bytes"] / 1_048_576, 3),
+        })
+    return rows
+
+
+# Function to get the process's peak resident memory in bytes (None where it can't be read)
+def process_peak_memory():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports kilobytes
+
+
+# Function to export the statistics as JSON
+def instrumentation_json():
+    import json
+
+    with _LOCK:
+        paths = {name: dict(stats) for name, stats in _STATS.items()}
+    return json.dumps({"enabled": _enabled, "memory_tracked": _track_memory,
+                       "process_peak_memory_bytes": process_peak_memory(), "paths": paths}, indent=2)
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Function to export the statistics in the Prometheus text exposition format
+def instrumentation_prometheus():
+    with _LOCK:
+        paths = {name: dict(stats) for name, stats in _STATS.items()}
+    lines = []
+    for field, metric, kind, help_text in _PROMETHEUS_METRICS:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        # Paths without a value (memory high-water marks while memory isn't tracked) are left out
+        for name, stats in paths.items():
+            if stats[field] is None:
+                continue
+            lines.append(f'{metric}{{path="{_label(name)}"}} {stats[field]}')
+    peak = process_peak_memory()
+    if peak is not None:
+        lines.append("# HELP taxcore_process_peak_memory_bytes Peak resident memory of the process")
+        lines.append("# TYPE taxcore_process_peak_memory_bytes gauge")
+        lines.append(f"taxcore_process_peak_memory_bytes {peak}")
+    return "\n".join(lines) + "\n"
+
+
+# Function to write the statistics to a file, as Prometheus text for .prom/.txt files and JSON otherwise
+def write_instrumentation(path):
+    text = instrumentation_prometheus() if str(path).lower().endswith((".prom", ".txt")) else instrumentation_json()
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(text)
@@ -0,0 +1,396 @@
+# Background jobs for long calculations: payroll files, VAT201 ledgers and exports.
+# A JobQueue runs an asyncio event loop on its own thread. Submitted jobs wait in an asyncio.Queue
+# and a fixed number of worker coroutines take them off it, so that many jobs run at once and the
+# rest wait their turn. Each job runs in an executor:
+# - a thread pool for jobs that report progress. They are handed a Job to report through, and a
+#   cancelled job stops at its next report;
+# - a process pool for self-contained CPU-bound work such as XLSX exports, which would otherwise
+#   hold the GIL. These can only be cancelled before they start; a cancelled running job's result
+#   is discarded. Their timings aren't recorded by the instrumentation, which is per process. A pool
+#   broken by a worker that died (killed, out of memory, failed to start) is replaced on next use.
+# Jobs are kept by ID, so any session can look up a job's status, partial result and final result.
+# Finished jobs are dropped once they are older than a TTL or when too many, or too many bytes of
+# results, are kept; the newest finished job is always kept. A job can hold files on disk (a payroll
+# job's results file), which its cleanups remove when it is dropped or the queue shuts down.
+# Like the cache registry, the default queue lives in this module and is shared by every Streamlit
+# session, so concurrent month-end runs queue up here instead of blocking each user's script.
+import asyncio
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from .cache import estimate_size
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Executors a job can run in
+THREAD = "thread"
+PROCESS = "process"
+
+# Jobs run at the same time; the others wait in the queue
+DEFAULT_JOB_WORKERS = 4
+
+# Finished jobs (and their results) kept for lookup by ID before the oldest are dropped
+MAX_FINISHED_JOBS = 50
+# Total size of the finished jobs' results kept, in bytes; a payroll job's result holds its whole file
+MAX_FINISHED_RESULT_BYTES = 512 * 1_048_576
+# Seconds a finished job is kept for lookup after it finished
+FINISHED_JOB_TTL = 3600
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# One submitted calculation. Its attributes are written by the worker running it and read by
+# anyone holding the job, so updates go through a lock.
+class Job:
+    def __init__(self, name, executor=THREAD):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.executor = executor
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.message = ""
+        self.partial = None
+        self.result = None
+        self.result_bytes = 0
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._cleanups = []
+        self._lock = threading.Lock()
+        self._cancel_requested = threading.Event()
+        self._finished = threading.Event()
+
+    def __repr__(self):
+        return f"Job({self.id!r}, {self.name!r}, {self.status!r})"
+
+    # Fraction done, or None while the total isn't known
+    @property
+    def progress(self):
+        if not self.total:
+            return None
+        return min(self.done / self.total, 1.0)
+
+    # Function for a running job to report the units done so far (of total, when known), an optional
+    # partial result and a status message. Raises JobCancelled once the job has been cancelled.
+    def report(self, done, total=None, partial=None, message=None):
+        if self._cancel_requested.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+        with self._lock:
+            self.done = done
+            if total is not None:
+                self.total = total
+            if partial is not None:
+                self.partial = partial
+            if message is not None:
+                self.message = message
+
+    # Function to cancel the job; returns False if it had already finished
+    def cancel(self):
+        with self._lock:
+            if self.status in FINISHED:
+                return False
+            self._cancel_requested.set()
+            if self.status == QUEUED:
+                self._finish(CANCELLED)
+        return True
+
+    # Function to wait for the job to finish; returns False if it is still going after timeout seconds
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    # Function to get the job's result, waiting up to timeout seconds. Raises the job's own error if it
+    # failed, JobCancelled if it was cancelled and TimeoutError if it hasn't finished in time.
+    def get_result(self, timeout=None):
+        if not self.wait(timeout):
+            raise TimeoutError(f"Job {self.id} is still {self.status}")
+        if self.status == CANCELLED:
+            raise JobCancelled(f"Job {self.id} was cancelled")
+        if self.status == FAILED:
+            raise self.error
+        return self.result
+
+    # Function to register a call that releases something the job's result refers to (a temporary file,
+    # say); cleanups run once the job is dropped from its queue
+    def add_cleanup(self, func, *args):
+        with self._lock:
+            self._cleanups.append(partial(func, *args))
+
+    def _clean_up(self):
+        with self._lock:
+            cleanups, self._cleanups = self._cleanups, []
+        for cleanup in cleanups:
+            try:
+                cleanup()
+            except OSError:
+                pass
+
+    # Function to describe the job as one row of a jobs table
+    def summary(self):
+        with self._lock:
+            end = self.finished or time.time()
+            return {
+                "Job ID": self.id,
+                "Name": self.name,
+                "Status": self.status,
+                "Done": self.done,
+                "Total": self.total,
+                "Seconds": round(end - self.started, 2) if self.started else 0.0,
+                "Message": str(self.error) if self.error is not None else self.message,
+            }
+
+    def _start(self):
+        with self._lock:
+            if self.status != QUEUED:
+                return False
+            self.status = RUNNING
+            self.started = time.time()
+            return True
+
+    # Function to record the outcome of a run; a job cancelled while running ends up cancelled
+    # whatever the run returned
+    def _complete(self, status, result=None, error=None):
+        with self._lock:
+            if self._cancel_requested.is_set():
+                status, result, error = CANCELLED, None, None
+            self._finish(status, result, error)
+
+    def _finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.result_bytes = estimate_size(result) if result is not None else 0
+        self.error = error
+        self.finished = time.time()
+        self._finished.set()
+
+
+# Local job queue: an asyncio loop on a daemon thread feeding a thread pool and a process pool
+class JobQueue:
+    def __init__(self, workers=DEFAULT_JOB_WORKERS, process_workers=None, max_finished=MAX_FINISHED_JOBS,
+                 max_result_bytes=MAX_FINISHED_RESULT_BYTES, job_ttl=FINISHED_JOB_TTL):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.process_workers = process_workers or os.cpu_count() or 1
+        self.max_finished = max_finished
+        self.max_result_bytes = max_result_bytes
+        self.job_ttl = job_ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="taxcore-job")
+        self._processes = None
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(started,), name="taxcore-jobs", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def _run_loop(self, started):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._workers = [self._loop.create_task(self._work()) for _ in range(self.workers)]
+        started.set()
+        self._loop.run_forever()
+
+    async def _work(self):
+        while True:
+            job, call = await self._queue.get()
+            try:
+                if job._start():
+                    await self._run(job, call)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job, call):
+        executor = None
+        try:
+            executor = self._executor(job.executor)
+            result = await self._loop.run_in_executor(executor, call)
+        except JobCancelled:
+            job._complete(CANCELLED)
+        except BrokenProcessPool as error:
+            self._discard_processes(executor)
+            job._complete(FAILED, error=error)
+        except Exception as error:
+            job._complete(FAILED, error=error)
+        else:
+            job._complete(DONE, result)
+        self._forget_finished_jobs()
+
+    # The process pool is started on first use. Workers are spawned rather than forked: this process
+    # is running threads (the event loop, the job threads, a web server) whose locks a fork would copy.
+    def _executor(self, executor):
+        if executor == THREAD:
+            return self._threads
+        with self._lock:
+            if self._processes is None:
+                import multiprocessing
+
+                self._processes = ProcessPoolExecutor(max_workers=self.process_workers,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+            return self._processes
+
+    # A broken process pool can't run anything again, so it is dropped and the next process job starts
+    # a new one. Jobs already sent to the broken pool fail with BrokenProcessPool.
+    def _discard_processes(self, pool):
+        with self._lock:
+            if pool is None or self._processes is not pool:
+                return
+            self._processes = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Function to drop finished jobs past their TTL, then the oldest finished jobs while too many, or
+    # too many bytes of results, are kept
+    def _forget_finished_jobs(self):
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values() if job.status in FINISHED),
+                              key=lambda job: job.finished)
+            expired = time.time() - self.job_ttl if self.job_ttl is not None else None
+            kept_bytes = sum(job.result_bytes for job in finished)
+            forgotten = []
+            while len(finished) > 1 and (
+                    len(finished) > self.max_finished
+                    or (self.max_result_bytes is not None and kept_bytes > self.max_result_bytes)
+                    or (expired is not None and finished[0].finished < expired)):
+                job = finished.pop(0)
+                kept_bytes -= job.result_bytes
+                del self._jobs[job.id]
+                forgotten.append(job)
+        for job in forgotten:
+            job._clean_up()
+
+    # Function to queue a job and return its Job straight away. Thread jobs are called as
+    # func(job, *args, **kwargs) so they can report progress; process jobs as func(*args, **kwargs),
+    # so func and its arguments must be picklable.
+    def submit(self, name, func, *args, executor=THREAD, **kwargs):
+        if executor not in (THREAD, PROCESS):
+            raise ValueError(f"Unknown executor '{executor}', expected '{THREAD}' or '{PROCESS}'")
+        if self._closed:
+            raise RuntimeError("The job queue has been shut down")
+        self._forget_finished_jobs()
+        job = Job(name, executor)
+        call = partial(func, job, *args, **kwargs) if executor == THREAD else partial(func, *args, **kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (job, call))
+        return job
+
+    # Function to look a job up by ID; raises KeyError for unknown (or long finished) jobs
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"No job with ID '{job_id}'")
+        return job
+
+    # Function to list jobs in the order they were submitted, optionally only the given IDs
+    def jobs(self, job_ids=None):
+        with self._lock:
+            if job_ids is None:
+                return list(self._jobs.values())
+            return [self._jobs[job_id] for job_id in job_ids if job_id in self._jobs]
+
+    def cancel(self, job_id):
+        return self.get(job_id).cancel()
+
+    def result(self, job_id, timeout=None):
+        return self.get(job_id).get_result(timeout)
+
+    # Function to stop the queue: jobs still queued are cancelled and, with wait=True, running jobs
+    # are waited for
+    def shutdown(self, wait=True):
+        if self._closed:
+            return
+        self._closed = True
+        for job in self.jobs():
+            if job.status == QUEUED:
+                job.cancel()
+            elif wait:
+                job.wait()
+        asyncio.run_coroutine_threadsafe(self._stop_workers(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._threads.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
+        for job in self.jobs():
+            if job.status in FINISHED:
+                job._clean_up()
+
+    async def _stop_workers(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+
+_default_queue = None
+_DEFAULT_QUEUE_LOCK = threading.Lock()
+
+
+# Function to get the queue shared by the whole process, starting it on first use
+def job_queue():
+    global _default_queue
+    with _DEFAULT_QUEUE_LOCK:
+        if _default_queue is None:
+            _default_queue = JobQueue()
+        return _default_queue
+
+
+# Function to run a payroll file as a thread job. The partial result holds the running totals and
+# the first results; the result also holds the path of the results file, written to a temporary file
+# rather than memory so a large payroll isn't held in RAM. The file is removed when the job is dropped.
+def payroll_job(job, source, chunk_size=None, file_format=None, output_format=None, exact=False, fringe=None):
+    import tempfile
+
+    from .export import EXPORT_FORMATS
+    from .payroll_io import DEFAULT_CHUNK_SIZE, TOTAL_COLUMNS, process_payroll_file
+
+    running = {}
+
+    def report(result, rows):
+        if not running:
+            running["preview"] = result.head(100)
+            running["totals"] = result[TOTAL_COLUMNS].sum()
+        else:
+            running["totals"] = running["totals"] + result[TOTAL_COLUMNS].sum()
+        job.report(rows, partial={"rows": rows, "totals": running["totals"].round(2), "preview": running["preview"]},
+                   message=f"Processed {rows:,} employees")
+
+    output_format = output_format or "csv"
+    handle, path = tempfile.mkstemp(prefix="taxcore-payroll-", suffix=f".{EXPORT_FORMATS[output_format][0]}")
+    try:
+        with os.fdopen(handle, "wb") as output:
+            rows, totals = process_payroll_file(source, output, chunk_size or DEFAULT_CHUNK_SIZE, file_format, report,
+                                                output_format, exact, fringe)
+    except BaseException:
+        os.remove(path)
+        raise
+    job.add_cleanup(os.remove, path)
+    return {"rows": rows, "totals": totals, "preview": running.get("preview"), "file": path,
+            "output_format": output_format}
+
+
+# Function to run a VAT201 ledger as a thread job; the result is (totals by period, totals by supplier)
+def vat201_job(job, source, chunk_size=None, file_format=None, exact=False, rounding_stage=None):
+    from .money import PER_LINE
+    from .vat import DEFAULT_LEDGER_CHUNK_SIZE, stream_vat201
+
+    return stream_vat201(source, chunk_size or DEFAULT_LEDGER_CHUNK_SIZE, file_format,
+                         on_chunk=lambda lines: job.report(lines, message=f"Processed {lines:,} ledger lines"),
+                         exact=exact, rounding_stage=rounding_stage or PER_LINE)
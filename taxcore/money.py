@@ -0,0 +1,81 @@
+# Exact money arithmetic in integer cents.
+# Amounts are held as Python ints or int64 arrays of cents, so sums are exact however many lines
+# are added up. The only rounding happens where an amount is multiplied by a rate, and there it is
+# explicit: the rounding mode is a parameter, and callers choose whether to round every line
+# (PER_LINE, what payslips and invoices show) or only the final total (PER_TOTAL).
+# numpy is imported only when an array is passed, so scalar callers stay light.
+
+ROUND_HALF_UP = "half-up"  # halves away from zero, the usual commercial rule
+ROUND_HALF_EVEN = "half-even"  # halves to the even cent (banker's rounding)
+ROUNDING_MODES = (ROUND_HALF_UP, ROUND_HALF_EVEN)
+
+PER_LINE = "line"
+PER_TOTAL = "total"
+ROUNDING_STAGES = (PER_LINE, PER_TOTAL)
+
+# Rates are held as hundredths of a percent, so 26% is 2600 / RATE_SCALE
+RATE_SCALE = 10_000
+
+
+def _is_scalar(value):
+    return isinstance(value, (int, float))
+
+
+def _check_rounding(rounding):
+    if rounding not in ROUNDING_MODES:
+        raise ValueError(f"Unknown rounding mode '{rounding}', expected one of {', '.join(ROUNDING_MODES)}")
+
+
+# Function to convert rand amounts to integer cents (to the nearest cent; amounts are expected
+# to have at most two decimals, so this only removes float representation error)
+def to_cents(amounts):
+    if _is_scalar(amounts):
+        return round(amounts * 100)
+    import numpy as np
+
+    return np.rint(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+
+
+# Function to convert integer cents back to rands (the nearest float, for display and DataFrames)
+def from_cents(cents):
+    if _is_scalar(cents):
+        return cents / 100
+    import numpy as np
+
+    return np.asarray(cents, dtype=np.int64) / 100.0
+
+
+# Function to convert a percentage (26.0 for 26%) to hundredths of a percent
+def to_rate(percent):
+    return to_cents(percent)
+
+
+# Function to divide integers and round the quotient to a whole number with the given rounding mode.
+# Works on Python ints and on int64 arrays; the remainder is computed exactly, so ties are real ties.
+def divide_rounded(numerator, denominator, rounding=ROUND_HALF_UP):
+    _check_rounding(rounding)
+    if _is_scalar(numerator):
+        quotient, remainder = divmod(int(numerator), int(denominator))
+        twice = 2 * remainder
+        if twice > denominator or (twice == denominator and (numerator > 0 if rounding == ROUND_HALF_UP
+                                                             else quotient % 2 == 1)):
+            quotient += 1
+        return quotient
+    import numpy as np
+
+    numerator = np.asarray(numerator, dtype=np.int64)
+    quotient, remainder = np.divmod(numerator, denominator)
+    twice = 2 * remainder
+    tie_up = numerator > 0 if rounding == ROUND_HALF_UP else quotient % 2 == 1
+    return quotient + ((twice > denominator) | ((twice == denominator) & tie_up))
+
+
+# Function to apply a percentage rate to amounts in cents, rounding each amount to a whole cent
+def apply_rate(cents, percent, rounding=ROUND_HALF_UP):
+    return divide_rounded(cents * to_rate(percent), RATE_SCALE, rounding)
+
+
+# Function to format cents as a rand amount without going through a float
+def format_cents(cents):
+    rands, remainder = divmod(abs(int(cents)), 100)
+    return f"{'-' if cents < 0 else ''}R{rands:,}.{remainder:02d}"
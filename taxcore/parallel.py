@@ -0,0 +1,191 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrument
+from .payroll import PAYROLL_DEFAULTS, PAYROLL_RESULT_COLUMNS, compute_payroll_arrays
+
+# Numeric inputs copied into shared memory, in the order compute_payroll_arrays takes them
+SHARED_INPUT_COLUMNS = ["Gross Salary", "Allowances", "Fringe Benefits", "Retirement Deductions", "Tax Rate", "Rebates"]
+SHARED_OUTPUT_COLUMNS = PAYROLL_RESULT_COLUMNS[2:]
+
+# Shards are capped at this many rows so one very large entity still spreads over the pool
+DEFAULT_MAX_SHARD_ROWS = 250_000
+
+# Rows each worker needs before the pool is used instead of one in-process batch. Sorting by
+# entity, copying into shared memory and gathering the results cost about as much as calculating
+# the rows, so smaller runs are quicker in this process whatever the number of workers.
+MIN_ROWS_PER_WORKER = 1_000_000
+
+# Views onto the shared blocks, set up once per worker process by _attach_shared_blocks
+_worker_blocks = {}
+
+
+# Function to create a shared memory block holding a float64 matrix
+def _create_shared_matrix(rows, columns):
+    block = shared_memory.SharedMemory(create=True, size=max(rows * columns * 8, 1))
+    return block, np.ndarray((rows, columns), dtype=np.float64, buffer=block.buf)
+
+
+# Worker initializer: attach to the input and output blocks by name
+def _attach_shared_blocks(input_name, output_name, employees):
+    input_block = shared_memory.SharedMemory(name=input_name)
+    output_block = shared_memory.SharedMemory(name=output_name)
+    _worker_blocks["blocks"] = (input_block, output_block)
+    _worker_blocks["inputs"] = np.ndarray((len(SHARED_INPUT_COLUMNS), employees), dtype=np.float64,
+                                          buffer=input_block.buf)
+    _worker_blocks["outputs"] = np.ndarray((len(SHARED_OUTPUT_COLUMNS), employees), dtype=np.float64,
+                                           buffer=output_block.buf)
+
+
+# Worker task: calculate one shard in place. Only the shard bounds and the timing cross the process boundary.
+def _run_shard(shard_id, start, stop):
+    began = time.perf_counter()
+    inputs = _worker_blocks["inputs"]
+    outputs = _worker_blocks["outputs"]
+    results = compute_payroll_arrays(*(inputs[i, start:stop] for i in range(len(SHARED_INPUT_COLUMNS))))
+    for i, name in enumerate(SHARED_OUTPUT_COLUMNS):
+        outputs[i, start:stop] = results[name]
+    return shard_id, os.getpid(), stop - start, time.perf_counter() - began
+
+
+# Function to fetch a numeric input column as float64, or its default when the payroll lacks it
+def _input_column(payroll, name):
+    if name in payroll:
+        return payroll[name].to_numpy(dtype=np.float64)
+    return np.full(len(payroll), PAYROLL_DEFAULTS[name])
+
+
+# Function to name a shard's entity from its code (None for the in-process shard or no entities)
+def _entity_label(labels, code):
+    if labels is None or code is None:
+        return None
+    return labels[code]
+
+
+# Function to split sorted rows into shards: one per entity (large entities are cut into row ranges),
+# or plain row ranges when there is no entity column
+def plan_shards(entities, employees, max_shard_rows=DEFAULT_MAX_SHARD_ROWS):
+    if entities is None:
+        bounds = [(None, 0, employees)]
+    else:
+        change = np.flatnonzero(entities[1:] != entities[:-1]) + 1
+        starts = np.concatenate(([0], change)) if employees else np.array([], dtype=int)
+        stops = np.concatenate((change, [employees])) if employees else np.array([], dtype=int)
+        bounds = [(entities[start], start, stop) for start, stop in zip(starts, stops)]
+
+    shards = []
+    for entity, start, stop in bounds:
+        for shard_start in range(start, stop, max_shard_rows):
+            shards.append((entity, shard_start, min(shard_start + max_shard_rows, stop)))
+    return shards
+
+
+# Function to calculate a group payroll across a process pool.
+# Rows are grouped by entity, the numeric columns are placed in shared memory and each worker
+# writes its shard's results straight into a shared output block. Results come back in the
+# input row order whatever order the shards finish in, with a per-shard timing table. When the
+# pool can't beat a single batch (one worker, one shard or too few rows per worker) the payroll is
+# calculated in this process instead, as one shard. The timing table's attrs["stages"] holds the
+# wall time of each stage (see summarise_stages), so the serial work around the shards shows too.
+@instrument(rows=lambda result: len(result[0]))
+def run_group_payroll(payroll, entity_column="Entity", workers=None, max_shard_rows=DEFAULT_MAX_SHARD_ROWS):
+    if not isinstance(payroll, pd.DataFrame):
+        payroll = pd.DataFrame(payroll)
+    employees = len(payroll)
+    workers = min(workers or os.cpu_count() or 1, employees // MIN_ROWS_PER_WORKER)
+    stages = {}
+    began = time.perf_counter()
+
+    labels, order, entities = None, None, None
+    if workers > 1:
+        # Entities are sorted as integer codes, which is far quicker than sorting their names
+        if entity_column in payroll:
+            codes, labels = pd.factorize(payroll[entity_column], use_na_sentinel=False)
+            order = np.argsort(codes, kind="stable")
+            entities = codes[order]
+        shards = plan_shards(entities, employees, max_shard_rows)
+        workers = min(workers, len(shards))
+        stages["Plan Shards"] = time.perf_counter() - began
+
+    if workers <= 1:
+        shards = [(None, 0, employees)]
+        mark = time.perf_counter()
+        results = compute_payroll_arrays(*(_input_column(payroll, name) for name in SHARED_INPUT_COLUMNS))
+        calculate = time.perf_counter() - mark
+        stages["Calculate"] = calculate
+        timings = [(0, os.getpid(), employees, calculate)]
+        outputs = [results[name] for name in SHARED_OUTPUT_COLUMNS]
+    else:
+        mark = time.perf_counter()
+        input_block, inputs = _create_shared_matrix(len(SHARED_INPUT_COLUMNS), employees)
+        output_block, outputs = _create_shared_matrix(len(SHARED_OUTPUT_COLUMNS), employees)
+        try:
+            for i, name in enumerate(SHARED_INPUT_COLUMNS):
+                if order is None:
+                    inputs[i] = _input_column(payroll, name)
+                else:
+                    np.take(_input_column(payroll, name), order, out=inputs[i])
+            stages["Copy In"] = time.perf_counter() - mark
+
+            mark = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared_blocks,
+                                     initargs=(input_block.name, output_block.name, employees)) as pool:
+                futures = [pool.submit(_run_shard, shard_id, start, stop)
+                           for shard_id, (_, start, stop) in enumerate(shards)]
+                timings = [future.result() for future in futures]
+            stages["Calculate"] = time.perf_counter() - mark
+
+            # Undo the entity sort so row i of the result belongs to row i of the input
+            mark = time.perf_counter()
+            if order is None:
+                outputs = outputs.copy()
+            else:
+                unsorted = np.empty((len(SHARED_OUTPUT_COLUMNS), employees))
+                unsorted[:, order] = outputs
+                outputs = unsorted
+        finally:
+            del inputs
+            for block in (input_block, output_block):
+                block.close()
+                block.unlink()
+        stages["Gather"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    if "Employee Name" in payroll:
+        names = payroll["Employee Name"].to_numpy()
+    else:
+        names = payroll.index.to_numpy()
+    result_df = pd.DataFrame({"Employee": names,
+                              "Gross Salary": payroll["Gross Salary"].to_numpy(dtype=np.float64),
+                              **dict(zip(SHARED_OUTPUT_COLUMNS, outputs))},
+                             columns=PAYROLL_RESULT_COLUMNS, index=payroll.index)
+    if entity_column in payroll:
+        result_df.insert(0, entity_column, payroll[entity_column].to_numpy())
+    stages["Build Results"] = time.perf_counter() - mark
+    stages["Total"] = time.perf_counter() - began
+
+    timing_df = pd.DataFrame(
+        [(shard_id, _entity_label(labels, shards[shard_id][0]), pid, rows, seconds)
+         for shard_id, pid, rows, seconds in timings],
+        columns=["Shard", "Entity", "Worker PID", "Rows", "Seconds"])
+    timing_df.attrs["stages"] = stages
+    return result_df, timing_df
+
+
+# Function to summarise the wall time of each stage of a group payroll run, from its timing table
+def summarise_stages(timing_df):
+    stages = timing_df.attrs.get("stages", {})
+    return pd.DataFrame({"Seconds": list(stages.values())}, index=pd.Index(list(stages), name="Stage")).round(3)
+
+
+# Function to summarise shard timings per worker process
+def summarise_worker_timings(timing_df):
+    summary = timing_df.groupby("Worker PID").agg(Shards=("Shard", "count"), Rows=("Rows", "sum"),
+                                                  Seconds=("Seconds", "sum"))
+    summary["Rows/s"] = (summary["Rows"] / summary["Seconds"]).round(0)
+    return summary
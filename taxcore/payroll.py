@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrument
+from .money import RATE_SCALE, ROUND_HALF_UP, apply_rate, divide_rounded, from_cents, to_cents, to_rate
+
+# Columns expected by the batch payroll engine (same keys as the per-employee dicts built in the UI)
+PAYROLL_INPUT_COLUMNS = ["Employee Name", "Gross Salary", "Allowances", "Fringe Benefits",
+                         "Retirement Deductions", "Medical Credits", "Tax Rate", "Rebates"]
+
+# Columns returned by the batch payroll engine (same as process_multiple_employees)
+PAYROLL_RESULT_COLUMNS = ["Employee", "Gross Salary", "PAYE", "Total UIF", "Employee UIF", "Employer UIF", "SDL"]
+
+# Values used when an optional input column is missing from the payroll
+PAYROLL_DEFAULTS = {
+    "Allowances": 0.0,
+    "Fringe Benefits": 0.0,
+    "Retirement Deductions": 0.0,
+    "Medical Credits": 0.0,
+    "Tax Rate": 26.0,
+    "Rebates": 0.0,
+}
+
+UIF_RATE = 0.01
+SDL_RATE = 0.01
+
+_SPLITTER = 134217729.0  # 2**27 + 1, used to split a double into two non-overlapping halves
+
+
+# Function to round an array to 2 decimals exactly like Python's round(x, 2).
+# np.round scales by 100 first and that product can land on the wrong side of a
+# half-cent; we recover the exact error of x * 100 (Dekker's product) and use it
+# to settle values that look like ties, which keeps results identical to the scalar functions.
+def round_to_cents(values):
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 100.0
+    split = _SPLITTER * values
+    high = split - (split - values)
+    low = values - high
+    error = (high * 100.0 - scaled) + low * 100.0
+
+    rounded = np.rint(scaled)
+    offset = scaled - rounded
+    rounded = np.where((offset == 0.5) & (error > 0), rounded + 1, rounded)
+    rounded = np.where((offset == -0.5) & (error < 0), rounded - 1, rounded)
+    return rounded / 100.0
+
+
+# Function to compute PAYE, UIF and SDL for whole columns at once.
+# Mirrors calculate_paye/calculate_uif/calculate_sdl operation for operation so the
+# results match the scalar functions; tax_rate is a percentage like in the UI.
+def compute_payroll_arrays(gross_salary, allowances, fringe_benefits, retirement_deductions, tax_rate, rebates):
+    gross_salary = np.asarray(gross_salary, dtype=np.float64)
+    allowances = np.asarray(allowances, dtype=np.float64)
+    fringe_benefits = np.asarray(fringe_benefits, dtype=np.float64)
+    retirement_deductions = np.asarray(retirement_deductions, dtype=np.float64)
+    tax_rate = np.asarray(tax_rate, dtype=np.float64)
+    rebates = np.asarray(rebates, dtype=np.float64)
+
+    taxable_income = gross_salary + allowances + fringe_benefits - retirement_deductions
+    monthly_paye = ((taxable_income * (tax_rate / 100)) - rebates) / 12
+
+    employee_uif = gross_salary * UIF_RATE
+    employer_uif = gross_salary * UIF_RATE
+    total_uif = employee_uif + employer_uif
+    sdl = gross_salary * SDL_RATE
+
+    return {
+        "PAYE": round_to_cents(monthly_paye),
+        "Total UIF": round_to_cents(total_uif),
+        "Employee UIF": round_to_cents(employee_uif),
+        "Employer UIF": round_to_cents(employer_uif),
+        "SDL": round_to_cents(sdl),
+    }
+
+
+# Function to compute PAYE, UIF and SDL exactly in integer cents. Every amount on the payslip is
+# rounded once, per line, with the given rounding mode; Total UIF is the sum of the two rounded
+# halves, so payslip totals always add up. Inputs are int64 cents, tax_rate a percentage.
+def compute_payroll_cents(gross_salary, allowances, fringe_benefits, retirement_deductions, tax_rate, rebates,
+                          rounding=ROUND_HALF_UP):
+    taxable_income = gross_salary + allowances + fringe_benefits - retirement_deductions
+    # (taxable income x rate - rebates) / 12, with the whole expression over one exact denominator
+    paye = divide_rounded(taxable_income * to_rate(tax_rate) - rebates * RATE_SCALE, RATE_SCALE * 12, rounding)
+
+    employee_uif = apply_rate(gross_salary, UIF_RATE * 100, rounding)
+    employer_uif = apply_rate(gross_salary, UIF_RATE * 100, rounding)
+    return {
+        "PAYE": paye,
+        "Total UIF": employee_uif + employer_uif,
+        "Employee UIF": employee_uif,
+        "Employer UIF": employer_uif,
+        "SDL": apply_rate(gross_salary, SDL_RATE * 100, rounding),
+    }
+
+
+# Function to fetch an input column, falling back to its default when it is not supplied
+def _payroll_column(payroll, name):
+    if name in payroll:
+        return payroll[name].to_numpy(dtype=np.float64)
+    if name in PAYROLL_DEFAULTS:
+        return np.full(len(payroll), PAYROLL_DEFAULTS[name], dtype=np.float64)
+    raise KeyError(f"Payroll is missing required column '{name}'")
+
+
+# Function to calculate the payroll for a whole DataFrame (or dict of column arrays) in one pass.
+# With exact=True the amounts are calculated in integer cents (see compute_payroll_cents) and
+# converted back to rands for the result.
+@instrument()
+def calculate_payroll_batch(payroll, exact=False, rounding=ROUND_HALF_UP):
+    if not isinstance(payroll, pd.DataFrame):
+        payroll = pd.DataFrame(payroll)
+
+    gross_salary = _payroll_column(payroll, "Gross Salary")
+    if exact:
+        cents = compute_payroll_cents(
+            to_cents(gross_salary),
+            to_cents(_payroll_column(payroll, "Allowances")),
+            to_cents(_payroll_column(payroll, "Fringe Benefits")),
+            to_cents(_payroll_column(payroll, "Retirement Deductions")),
+            _payroll_column(payroll, "Tax Rate"),
+            to_cents(_payroll_column(payroll, "Rebates")),
+            rounding,
+        )
+        results = {name: from_cents(values) for name, values in cents.items()}
+    else:
+        results = compute_payroll_arrays(
+            gross_salary,
+            _payroll_column(payroll, "Allowances"),
+            _payroll_column(payroll, "Fringe Benefits"),
+            _payroll_column(payroll, "Retirement Deductions"),
+            _payroll_column(payroll, "Tax Rate"),
+            _payroll_column(payroll, "Rebates"),
+        )
+
+    if "Employee Name" in payroll:
+        employees = payroll["Employee Name"].to_numpy()
+    else:
+        employees = payroll.index.to_numpy()
+
+    result_df = pd.DataFrame({"Employee": employees, "Gross Salary": gross_salary, **results},
+                             columns=PAYROLL_RESULT_COLUMNS)
+    result_df.index = payroll.index
+    return result_df
@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .export import write_sheets
+from .fringe import DEFAULT_FRINGE_RULES, EMPLOYEE_COLUMN, FRINGE_RESULT_COLUMN, add_fringe_benefits
+from .instrumentation import instrument
+from .money import from_cents, to_cents
+from .payroll import PAYROLL_DEFAULTS, PAYROLL_RESULT_COLUMNS, calculate_payroll_batch
+
+# Number of employees read, calculated and written per step
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Result columns that are summed into the run totals
+TOTAL_COLUMNS = PAYROLL_RESULT_COLUMNS[1:]
+
+# Types of the result columns written to a results file; employees are names, whatever they look like
+RESULT_COLUMN_TYPES = {"Employee": "string", **{name: "float64" for name in TOTAL_COLUMNS}}
+
+
+# Function to work out whether a payroll file is CSV or Excel from its name
+def detect_payroll_format(name):
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".xlsx", ".xlsm"):
+        return "xlsx"
+    raise ValueError(f"Unsupported payroll file type '{extension}', expected .csv or .xlsx")
+
+
+# Function to read a CSV payroll in fixed-size chunks
+def _iter_csv_chunks(source, chunk_size):
+    with pd.read_csv(source, chunksize=chunk_size, dtype={EMPLOYEE_COLUMN: str}) as reader:
+        yield from reader
+
+
+# Function to read an Excel payroll in fixed-size chunks (read-only mode streams the sheet row by row)
+def _iter_xlsx_chunks(source, chunk_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = ["" if name is None else str(name) for name in header]
+
+        start = 0
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch)))
+                start += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch)))
+    finally:
+        workbook.close()
+
+
+# Function to yield a payroll file as DataFrames of at most chunk_size rows
+def iter_payroll_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, file_format=None):
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if file_format is None:
+        file_format = detect_payroll_format(getattr(source, "name", source))
+
+    if file_format == "csv":
+        chunks = _iter_csv_chunks(source, chunk_size)
+    elif file_format == "xlsx":
+        chunks = _iter_xlsx_chunks(source, chunk_size)
+    else:
+        raise ValueError(f"Unsupported payroll file format '{file_format}'")
+
+    for chunk in chunks:
+        chunk.columns = chunk.columns.str.strip()
+        if EMPLOYEE_COLUMN in chunk:
+            # Names such as 1000 are still names, so one chunk of them can't make the column numeric
+            names = chunk[EMPLOYEE_COLUMN]
+            chunk[EMPLOYEE_COLUMN] = names.where(names.isna(), names.astype(str))
+        # Blank optional cells behave like the UI defaults rather than turning results into NaN
+        yield chunk.fillna({name: value for name, value in PAYROLL_DEFAULTS.items() if name in chunk})
+
+
+# Function to read a fringe benefit register (.csv or .xlsx, one row per benefit) and value it with
+# the rule table; returns the register with its Taxable Value column and the totals per employee
+def read_fringe_register(source, months=1, file_format=None, rules=DEFAULT_FRINGE_RULES):
+    register = pd.concat(list(iter_payroll_chunks(source, file_format=file_format)), ignore_index=True)
+    if EMPLOYEE_COLUMN not in register:
+        raise KeyError(f"Fringe benefit register is missing the employee column '{EMPLOYEE_COLUMN}'")
+    register[FRINGE_RESULT_COLUMN] = rules.value_register(register, months=months)
+    return register, register.groupby(EMPLOYEE_COLUMN, sort=False)[FRINGE_RESULT_COLUMN].sum()
+
+
+# Function to calculate a payroll file chunk by chunk. fringe is an optional Series of per-employee
+# fringe benefit values (see FringeRules.value_by_employee) added to each employee's Fringe Benefits.
+def iter_payroll_results(source, chunk_size=DEFAULT_CHUNK_SIZE, file_format=None, exact=False, fringe=None):
+    for chunk in iter_payroll_chunks(source, chunk_size, file_format):
+        if fringe is not None:
+            chunk = add_fringe_benefits(chunk, fringe)
+        yield calculate_payroll_batch(chunk, exact=exact)
+
+
+# Function to stream payroll results to a CSV, XLSX or Parquet file as each chunk is finished.
+# Only one chunk is held in memory at a time; returns the row count and column totals.
+# With exact=True every payslip line is calculated in integer cents and the totals are exact sums of those lines.
+@instrument(rows=lambda result: result[0])
+def process_payroll_file(source, destination, chunk_size=DEFAULT_CHUNK_SIZE, file_format=None, on_chunk=None,
+                         output_format=None, exact=False, fringe=None):
+    rows = 0
+    totals = pd.Series(0, index=TOTAL_COLUMNS, dtype=np.int64 if exact else np.float64)
+
+    def results():
+        nonlocal rows, totals
+        for result in iter_payroll_results(source, chunk_size, file_format, exact, fringe):
+            rows += len(result)
+            if exact:
+                totals += to_cents(result[TOTAL_COLUMNS].to_numpy()).sum(axis=0)
+            else:
+                totals += result[TOTAL_COLUMNS].sum()
+            if on_chunk is not None:
+                on_chunk(result, rows)
+            yield result.astype(RESULT_COLUMN_TYPES)
+
+    write_sheets({"Payroll": results()}, destination, output_format, {"Payroll": RESULT_COLUMN_TYPES})
+    if exact:
+        return rows, pd.Series(from_cents(totals.to_numpy()), index=TOTAL_COLUMNS)
+    return rows, totals.round(2)
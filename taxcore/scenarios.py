@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrument
+from .payroll import SDL_RATE, UIF_RATE, _payroll_column, compute_payroll_arrays, round_to_cents
+from .tax_tables import get_tax_table
+
+# What a scenario can change. Increases apply to every employee's gross salary; the tax rate
+# change is in percentage points; the rebate change is added to each employee's annual rebates.
+# Bracket Adjustment % moves every bracket threshold (0 = brackets frozen, i.e. full bracket creep)
+# and needs progressive tax tables.
+SCENARIO_COLUMNS = ["Increase %", "Fixed Increase", "Tax Rate Change", "Rebate Change", "Bracket Adjustment %"]
+SCENARIO_DEFAULTS = {name: 0.0 for name in SCENARIO_COLUMNS}
+
+# Per-employee results of one scenario, summed per scenario by sweep_scenarios
+SWEEP_RESULT_COLUMNS = ["Gross Salary", "PAYE", "Employee UIF", "Employer UIF", "SDL", "Net Pay", "Cost to Company"]
+
+# Employee x scenario cells evaluated at once; the working arrays take roughly 100 MB
+DEFAULT_MAX_CELLS = 500_000
+
+
+# Function to build a scenario grid: every combination of the given values, one row per scenario
+def scenario_grid(increase_pct=(0.0,), fixed_increase=(0.0,), tax_rate_change=(0.0,), rebate_change=(0.0,),
+                  bracket_adjustment_pct=(0.0,)):
+    values = [increase_pct, fixed_increase, tax_rate_change, rebate_change, bracket_adjustment_pct]
+    grid = pd.MultiIndex.from_product([[float(value) for value in axis] for axis in values],
+                                      names=SCENARIO_COLUMNS).to_frame(index=False)
+    grid.index = pd.Index([f"Scenario {i + 1}" for i in range(len(grid))], name="Scenario")
+    return grid
+
+
+# Function to fetch a scenario column as an (n, 1) array so it broadcasts across employees
+def _scenario_column(scenarios, name):
+    if name in scenarios:
+        return scenarios[name].to_numpy(dtype=np.float64)[:, None]
+    return np.full((len(scenarios), 1), SCENARIO_DEFAULTS[name])
+
+
+# Function to calculate every employee under a block of scenarios at once.
+# Employee arrays have shape (employees,) and scenario arrays (scenarios, 1), so every result is a
+# (scenarios, employees) array. Without a tax table PAYE follows calculate_paye with each employee's
+# flat Tax Rate; with one it is the progressive liability on the brackets adjusted per scenario.
+def _evaluate_block(employees, scenarios, tax_table=None):
+    gross_salary = (employees["Gross Salary"] * (1 + _scenario_column(scenarios, "Increase %") / 100)
+                    + _scenario_column(scenarios, "Fixed Increase"))
+    rebates = employees["Rebates"] + _scenario_column(scenarios, "Rebate Change")
+
+    if tax_table is None:
+        results = compute_payroll_arrays(gross_salary, employees["Allowances"], employees["Fringe Benefits"],
+                                         employees["Retirement Deductions"],
+                                         employees["Tax Rate"] + _scenario_column(scenarios, "Tax Rate Change"),
+                                         rebates)
+    else:
+        # The tables are annual, so the monthly taxable income is annualised and the tax spread back
+        # over 12 months. Scaling every threshold by s scales the tax curve: T_s(income) = s * T(income / s)
+        scale = 1 + _scenario_column(scenarios, "Bracket Adjustment %") / 100
+        annual_taxable_income = (gross_salary + employees["Allowances"] + employees["Fringe Benefits"]
+                                 - employees["Retirement Deductions"]) * 12
+        annual_tax = scale * tax_table.tax_array(annual_taxable_income / scale)
+        employee_uif = gross_salary * UIF_RATE
+        results = {
+            "PAYE": round_to_cents(np.maximum(annual_tax - rebates, 0.0) / 12),
+            "Employee UIF": round_to_cents(employee_uif),
+            "Employer UIF": round_to_cents(gross_salary * UIF_RATE),
+            "SDL": round_to_cents(gross_salary * SDL_RATE),
+        }
+
+    return {
+        "Gross Salary": gross_salary,
+        "PAYE": results["PAYE"],
+        "Employee UIF": results["Employee UIF"],
+        "Employer UIF": results["Employer UIF"],
+        "SDL": results["SDL"],
+        "Net Pay": gross_salary - results["PAYE"] - results["Employee UIF"],
+        "Cost to Company": gross_salary + results["Employer UIF"] + results["SDL"],
+    }
+
+
+# Function to pull the employee inputs out of a payroll as flat arrays. With a tax table, the
+# employee's Rebates column (if any) is replaced by the table's rebate for their age.
+def _employee_arrays(payroll, tax_table=None):
+    if not isinstance(payroll, pd.DataFrame):
+        payroll = pd.DataFrame(payroll)
+    employees = {name: _payroll_column(payroll, name)
+                 for name in ["Gross Salary", "Allowances", "Fringe Benefits", "Retirement Deductions",
+                              "Tax Rate", "Rebates"]}
+    if tax_table is not None:
+        if "Age" in payroll:
+            employees["Rebates"] = tax_table.rebate_array(payroll["Age"].to_numpy(dtype=np.float64))
+        else:
+            employees["Rebates"] = np.full(len(payroll), tax_table.rebate())
+    return employees
+
+
+# Function to validate a scenario table and index it by scenario name
+def _check_scenarios(scenarios, tax_table):
+    if not isinstance(scenarios, pd.DataFrame):
+        scenarios = pd.DataFrame(scenarios)
+    unknown = [name for name in scenarios.columns if name not in SCENARIO_COLUMNS and name != "Scenario"]
+    if unknown:
+        raise ValueError(f"Unknown scenario columns: {', '.join(unknown)}; expected {', '.join(SCENARIO_COLUMNS)}")
+    if "Scenario" in scenarios:
+        scenarios = scenarios.set_index("Scenario")
+    if tax_table is None and "Bracket Adjustment %" in scenarios and scenarios["Bracket Adjustment %"].any():
+        raise ValueError("Bracket Adjustment % needs progressive tax tables; pass a tax_year")
+    return scenarios
+
+
+# Function to evaluate a scenario grid against a payroll lazily. Scenarios are taken in blocks of
+# at most max_cells / employees rows, so memory is bounded whatever the grid size; each step yields
+# (the block of scenario rows, a dict of (scenarios, employees) result arrays).
+def iter_sweep(payroll, scenarios, tax_year=None, max_cells=DEFAULT_MAX_CELLS):
+    tax_table = None if tax_year is None else get_tax_table(tax_year)
+    scenarios = _check_scenarios(scenarios, tax_table)
+    employees = _employee_arrays(payroll, tax_table)
+    block_size = max(1, max_cells // max(len(employees["Gross Salary"]), 1))
+    for start in range(0, len(scenarios), block_size):
+        block = scenarios.iloc[start:start + block_size]
+        yield block, _evaluate_block(employees, block, tax_table)
+
+
+# Function to run a scenario sweep and total it per scenario. Each total is also given as a change
+# against the current payroll (no increase, no tax changes), so the "Cost to Company Change" column
+# is the extra monthly cost of each scenario to the employer.
+@instrument()
+def sweep_scenarios(payroll, scenarios, tax_year=None, max_cells=DEFAULT_MAX_CELLS):
+    tax_table = None if tax_year is None else get_tax_table(tax_year)
+    employees = _employee_arrays(payroll, tax_table)
+    current = _evaluate_block(employees, pd.DataFrame(index=[0]), tax_table)
+    current_totals = {name: values.sum() for name, values in current.items()}
+    current_net_pay = current["Net Pay"]
+
+    blocks = []
+    for block, results in iter_sweep(payroll, scenarios, tax_year, max_cells):
+        totals = pd.DataFrame({name: values.sum(axis=1) for name, values in results.items()},
+                              columns=SWEEP_RESULT_COLUMNS, index=block.index)
+        for name in ["PAYE", "Net Pay", "Cost to Company"]:
+            totals[f"{name} Change"] = totals[name] - current_totals[name]
+        totals["Employees Worse Off"] = (results["Net Pay"] < current_net_pay).sum(axis=1)
+        blocks.append(block.join(totals))
+
+    if not blocks:
+        return pd.DataFrame(columns=SCENARIO_COLUMNS + SWEEP_RESULT_COLUMNS)
+    return pd.concat(blocks).round(2)
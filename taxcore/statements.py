@@ -0,0 +1,232 @@
+from .instrumentation import instrument
+from .money import from_cents, to_cents
+
+
+# A financial statement as a dependency graph of line items. Input items are the leaves;
+# every subtotal is a signed sum of other items, listed in the order they are added up.
+# The graph evaluates one statement from a dict, recomputes only what an edit affects
+# (see IncrementalStatement), or evaluates a whole DataFrame of entities column-wise.
+# Line items are added up in integer cents, so subtotals are exact; report() converts back to rands.
+class StatementGraph:
+    def __init__(self, name, subtotals, outputs):
+        self.name = name
+        self.subtotals = {item: list(terms.items()) for item, terms in subtotals.items()}
+        self.outputs = dict(outputs)
+
+        self.inputs = []
+        for terms in self.subtotals.values():
+            for item, _ in terms:
+                if item not in self.subtotals and item not in self.inputs:
+                    self.inputs.append(item)
+        for item in self.outputs.values():
+            if item not in self.subtotals and item not in self.inputs:
+                self.inputs.append(item)
+
+        self.dependents = {item: [] for item in [*self.inputs, *self.subtotals]}
+        for item, terms in self.subtotals.items():
+            for dependency, _ in terms:
+                self.dependents[dependency].append(item)
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        order, state = [], {}
+
+        def visit(item):
+            if state.get(item) == "done":
+                return
+            if state.get(item) == "visiting":
+                raise ValueError(f"{self.name}: line item '{item}' depends on itself")
+            state[item] = "visiting"
+            for dependency, _ in self.subtotals.get(item, []):
+                visit(dependency)
+            state[item] = "done"
+            if item in self.subtotals:
+                order.append(item)
+
+        for item in self.subtotals:
+            visit(item)
+        return order
+
+    # Compute one subtotal from the current values in cents (works for ints and int64 columns)
+    def compute(self, item, values):
+        total = 0
+        for dependency, sign in self.subtotals[item]:
+            total = total + values[dependency] if sign > 0 else total - values[dependency]
+        return total
+
+    # Subtotals reachable from the given items, in evaluation order
+    def affected_by(self, items):
+        affected, pending = set(), list(items)
+        while pending:
+            for dependent in self.dependents.get(pending.pop(), []):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    pending.append(dependent)
+        return [item for item in self.order if item in affected]
+
+    # Evaluate every line item in cents; missing inputs count as zero
+    def evaluate(self, inputs):
+        values = {item: to_cents(inputs.get(item, 0)) for item in self.inputs}
+        for item in self.order:
+            values[item] = self.compute(item, values)
+        return values
+
+    # The statement as reported: output label -> amount in rands
+    def report(self, values):
+        return {label: from_cents(values[item]) for label, item in self.outputs.items()}
+
+    # Evaluate many statements at once, one row per entity and one column per input item
+    @instrument()
+    def evaluate_frame(self, frame):
+        import numpy as np
+        import pandas as pd
+
+        values = {item: to_cents(frame[item].fillna(0.0)) if item in frame else np.zeros(len(frame), dtype=np.int64)
+                  for item in self.inputs}
+        for item in self.order:
+            values[item] = self.compute(item, values)
+        return pd.DataFrame(self.report(values), index=frame.index)
+
+    # Consolidate entity inputs (optionally per group column) and evaluate the group statements.
+    # Subtotals are linear and exact in cents, so summing the inputs first gives the same totals
+    # as summing the entity statements.
+    @instrument()
+    def consolidate(self, frame, by=None):
+        import pandas as pd
+
+        cents = pd.DataFrame({item: to_cents(frame[item].fillna(0.0)) for item in self.inputs if item in frame},
+                             index=frame.index)
+        if by is None:
+            totals = cents.sum().to_frame().T
+            totals.index = ["Consolidated"]
+        else:
+            totals = cents.groupby(frame[by], sort=True).sum()
+        return self.evaluate_frame(totals / 100)
+
+
+# Keeps a statement's evaluated line items between reruns. update() compares the new inputs
+# with the previous ones and recomputes only the subtotals that depend on the items that changed.
+class IncrementalStatement:
+    def __init__(self, graph):
+        self.graph = graph
+        self.values = graph.evaluate({})
+        self.last_recomputed = list(graph.order)
+
+    def update(self, inputs):
+        cents = {item: to_cents(inputs[item]) for item in self.graph.inputs if item in inputs}
+        changed = [item for item, value in cents.items() if value != self.values[item]]
+        for item in changed:
+            self.values[item] = cents[item]
+        self.last_recomputed = self.graph.affected_by(changed)
+        for item in self.last_recomputed:
+            self.values[item] = self.graph.compute(item, self.values)
+        return self.report()
+
+    def report(self):
+        return self.graph.report(self.values)
+
+
+INCOME_STATEMENT = StatementGraph(
+    "Income Statement",
+    {
+        "net_sales": {"sales_revenue": 1, "service_revenue": 1, "rental_income": 1, "interest_income": 1,
+                      "sales_returns_allowances": -1},
+        "cogs": {"beginning_inventory": 1, "purchases": 1, "freight_in": 1, "import_duties": 1,
+                 "ending_inventory": -1},
+        "gross_profit": {"net_sales": 1, "cogs": -1},
+        "total_selling_expenses": {"advertising": 1, "sales_salaries": 1, "store_supplies": 1,
+                                   "transport_costs": 1, "bad_debts_expense": 1},
+        "total_general_admin_expenses": {"office_salaries": 1, "rent": 1, "utilities": 1, "depreciation": 1,
+                                         "legal_accounting_fees": 1, "security_services": 1,
+                                         "repairs_maintenance": 1, "telephone_internet": 1, "insurance": 1,
+                                         "rates_taxes": 1, "employee_benefits": 1, "training_development": 1},
+        "total_operating_expenses": {"total_selling_expenses": 1, "total_general_admin_expenses": 1},
+        "operating_income": {"gross_profit": 1, "total_operating_expenses": -1},
+        "net_other_income": {"interest_income_other": 1, "interest_expense": -1},
+        "earnings_before_tax": {"operating_income": 1, "net_other_income": 1},
+        "net_income": {"earnings_before_tax": 1, "tax_expense": -1},
+    },
+    {
+        "Net Sales": "net_sales",
+        "COGS": "cogs",
+        "Gross Profit": "gross_profit",
+        "Total Selling Expenses": "total_selling_expenses",
+        "Total General and Administrative Expenses": "total_general_admin_expenses",
+        "Total Operating Expenses": "total_operating_expenses",
+        "Operating Income": "operating_income",
+        "Interest Income": "interest_income_other",
+        "Interest Expense": "interest_expense",
+        "Net Other Income": "net_other_income",
+        "Earnings Before Tax (EBT)": "earnings_before_tax",
+        "Income Tax Expense": "tax_expense",
+        "Net Income": "net_income",
+    },
+)
+
+BALANCE_SHEET = StatementGraph(
+    "Balance Sheet",
+    {
+        "total_current_assets": {"cash_equivalents": 1, "accounts_receivable": 1, "inventory": 1,
+                                 "prepaid_expenses": 1, "other_receivables": 1},
+        "total_non_current_assets": {"ppe": 1, "intangible_assets": 1, "investments": 1, "deferred_tax_assets": 1},
+        "total_assets": {"total_current_assets": 1, "total_non_current_assets": 1},
+        "total_current_liabilities": {"accounts_payable": 1, "short_term_borrowings": 1, "accrued_expenses": 1,
+                                      "current_portion_long_term_debt": 1, "income_taxes_payable": 1,
+                                      "vat_payable": 1, "other_payables": 1},
+        "total_non_current_liabilities": {"long_term_debt": 1, "deferred_tax_liabilities": 1, "provisions": 1,
+                                          "other_non_current_liabilities": 1},
+        "total_liabilities": {"total_current_liabilities": 1, "total_non_current_liabilities": 1},
+        "total_shareholders_equity": {"share_capital": 1, "retained_earnings": 1, "revaluation_surplus": 1,
+                                      "other_reserves": 1, "non_controlling_interest": 1},
+    },
+    {
+        "Total Current Assets": "total_current_assets",
+        "Total Non-Current Assets": "total_non_current_assets",
+        "Total Assets": "total_assets",
+        "Total Current Liabilities": "total_current_liabilities",
+        "Total Non-Current Liabilities": "total_non_current_liabilities",
+        "Total Liabilities": "total_liabilities",
+        "Total Shareholders' Equity": "total_shareholders_equity",
+    },
+)
+
+CASH_FLOW_STATEMENT = StatementGraph(
+    "Cash Flow Statement",
+    {
+        "net_cash_from_operating": {"net_income": 1, "non_cash_expenses": 1, "changes_in_working_capital": 1},
+        "net_cash_from_investing": {"cash_inflows_investing": 1, "cash_outflows_investing": -1},
+        "net_cash_from_financing": {"cash_inflows_financing": 1, "cash_outflows_financing": -1},
+        "net_increase_decrease_cash": {"net_cash_from_operating": 1, "net_cash_from_investing": 1,
+                                       "net_cash_from_financing": 1},
+    },
+    {
+        "Net Cash from Operating Activities": "net_cash_from_operating",
+        "Net Cash from Investing Activities": "net_cash_from_investing",
+        "Net Cash from Financing Activities": "net_cash_from_financing",
+        "Net Increase/Decrease in Cash": "net_increase_decrease_cash",
+    },
+)
+
+# Line items each statement is calculated from (the keys of its inputs dict)
+INCOME_STATEMENT_INPUTS = INCOME_STATEMENT.inputs
+BALANCE_SHEET_INPUTS = BALANCE_SHEET.inputs
+CASH_FLOW_INPUTS = CASH_FLOW_STATEMENT.inputs
+
+# Function to calculate the Income Statement subtotals from its line items
+def calculate_income_statement(inputs):
+    return INCOME_STATEMENT.report(INCOME_STATEMENT.evaluate(inputs))
+
+# Function to calculate the Balance Sheet totals from its line items
+def calculate_balance_sheet(inputs):
+    return BALANCE_SHEET.report(BALANCE_SHEET.evaluate(inputs))
+
+# Function to calculate the Cash Flow Statement totals from its line items
+def calculate_cash_flow(inputs):
+    return CASH_FLOW_STATEMENT.report(CASH_FLOW_STATEMENT.evaluate(inputs))
+
+# Statement graphs, by the name used on the command line
+STATEMENTS = {
+    "income": INCOME_STATEMENT,
+    "balance": BALANCE_SHEET,
+    "cash-flow": CASH_FLOW_STATEMENT,
+}
@@ -0,0 +1,175 @@
+import bisect
+from functools import lru_cache
+
+# SARS individual income tax tables, keyed by tax year (the year in which February ends).
+# "brackets" are the lower bound of each band; "rates" the marginal rate for that band.
+SARS_TAX_TABLES = {
+    2021: {
+        "brackets": [0, 205900, 321600, 445100, 584200, 744800, 1577300],
+        "rates": [0.18, 0.26, 0.31, 0.36, 0.39, 0.41, 0.45],
+        "rebates": {"primary": 14958, "secondary": 8199, "tertiary": 2736},
+        "thresholds": {"under_65": 83100, "65_to_74": 128650, "75_and_over": 143850},
+    },
+    2022: {
+        "brackets": [0, 216200, 337800, 467500, 613600, 782200, 1656600],
+        "rates": [0.18, 0.26, 0.31, 0.36, 0.39, 0.41, 0.45],
+        "rebates": {"primary": 15714, "secondary": 8613, "tertiary": 2871},
+        "thresholds": {"under_65": 87300, "65_to_74": 135150, "75_and_over": 151100},
+    },
+    2023: {
+        "brackets": [0, 226000, 353100, 488700, 641400, 817600, 1731600],
+        "rates": [0.18, 0.26, 0.31, 0.36, 0.39, 0.41, 0.45],
+        "rebates": {"primary": 16425, "secondary": 9000, "tertiary": 2997},
+        "thresholds": {"under_65": 91250, "65_to_74": 141250, "75_and_over": 157900},
+    },
+    2024: {
+        "brackets": [0, 237100, 370500, 512800, 673000, 857900, 1817000],
+        "rates": [0.18, 0.26, 0.31, 0.36, 0.39, 0.41, 0.45],
+        "rebates": {"primary": 17235, "secondary": 9444, "tertiary": 3145},
+        "thresholds": {"under_65": 95750, "65_to_74": 148217, "75_and_over": 165689},
+    },
+    # The 2025 and 2026 tables were not adjusted for inflation
+    2025: {
+        "brackets": [0, 237100, 370500, 512800, 673000, 857900, 1817000],
+        "rates": [0.18, 0.26, 0.31, 0.36, 0.39, 0.41, 0.45],
+        "rebates": {"primary": 17235, "secondary": 9444, "tertiary": 3145},
+        "thresholds": {"under_65": 95750, "65_to_74": 148217, "75_and_over": 165689},
+    },
+    2026: {
+        "brackets": [0, 237100, 370500, 512800, 673000, 857900, 1817000],
+        "rates": [0.18, 0.26, 0.31, 0.36, 0.39, 0.41, 0.45],
+        "rebates": {"primary": 17235, "secondary": 9444, "tertiary": 3145},
+        "thresholds": {"under_65": 95750, "65_to_74": 148217, "75_and_over": 165689},
+    },
+}
+
+LATEST_TAX_YEAR = max(SARS_TAX_TABLES)
+
+
+# A compiled tax table: the tax due at every bracket boundary is worked out once,
+# so the tax on any income is one bisect plus one multiply.
+class TaxTable:
+    def __init__(self, brackets, rates, rebates=None, thresholds=None, tax_year=None):
+        if len(brackets) != len(rates) or not brackets:
+            raise ValueError("brackets and rates must be non-empty and the same length")
+        if list(brackets) != sorted(brackets) or len(set(brackets)) != len(brackets):
+            raise ValueError("brackets must be strictly increasing")
+
+        self.tax_year = tax_year
+        self.brackets = tuple(float(bracket) for bracket in brackets)
+        self.rates = tuple(float(rate) for rate in rates)
+        self.rebates = dict(rebates or {})
+        self.thresholds = dict(thresholds or {})
+
+        base_tax = [0.0]
+        for i in range(1, len(self.brackets)):
+            base_tax.append(base_tax[-1] + (self.brackets[i] - self.brackets[i - 1]) * self.rates[i - 1])
+        self.base_tax = tuple(base_tax)
+        self._arrays = None
+
+    def __repr__(self):
+        return f"TaxTable(tax_year={self.tax_year}, brackets={list(self.brackets)})"
+
+    # Tax on an annual taxable income before rebates
+    def tax(self, taxable_income):
+        i = bisect.bisect_left(self.brackets, taxable_income) - 1
+        if i < 0:
+            return 0.0
+        return self.base_tax[i] + (taxable_income - self.brackets[i]) * self.rates[i]
+
+    # numpy copies of the table, built on first vectorized use so scalar lookups never import numpy
+    def _as_arrays(self):
+        if self._arrays is None:
+            import numpy as np
+            self._arrays = (np.array(self.brackets), np.array(self.rates), np.array(self.base_tax))
+        return self._arrays
+
+    # Vectorized form of tax() for a whole array of incomes
+    def tax_array(self, taxable_incomes):
+        import numpy as np
+
+        brackets, rates, base_tax = self._as_arrays()
+        incomes = np.asarray(taxable_incomes, dtype=np.float64)
+        i = np.searchsorted(brackets, incomes, side="left") - 1
+        below = i < 0
+        i = np.where(below, 0, i)
+        tax = base_tax[i] + (incomes - brackets[i]) * rates[i]
+        return np.where(below, 0.0, tax)
+
+    # Total rebate for a taxpayer's age (primary, plus secondary from 65 and tertiary from 75)
+    def rebate(self, age=None):
+        rebate = self.rebates.get("primary", 0)
+        if age is not None and age >= 65:
+            rebate += self.rebates.get("secondary", 0)
+        if age is not None and age >= 75:
+            rebate += self.rebates.get("tertiary", 0)
+        return float(rebate)
+
+    # Vectorized form of rebate() for an array of ages
+    def rebate_array(self, ages):
+        import numpy as np
+
+        ages = np.asarray(ages, dtype=np.float64)
+        return (self.rebates.get("primary", 0)
+                + np.where(ages >= 65, self.rebates.get("secondary", 0), 0)
+                + np.where(ages >= 75, self.rebates.get("tertiary", 0), 0)).astype(np.float64)
+
+    # Income below which no tax is payable for a taxpayer's age
+    def threshold(self, age=None):
+        if age is not None and age >= 75:
+            return float(self.thresholds["75_and_over"])
+        if age is not None and age >= 65:
+            return float(self.thresholds["65_to_74"])
+        return float(self.thresholds["under_65"])
+
+    # Annual tax payable after rebates, never below zero
+    def liability(self, taxable_income, age=None):
+        return max(self.tax(taxable_income) - self.rebate(age), 0.0)
+
+    # Vectorized form of liability()
+    def liability_array(self, taxable_incomes, ages=None):
+        import numpy as np
+
+        rebates = self.rebate() if ages is None else self.rebate_array(ages)
+        return np.maximum(self.tax_array(taxable_incomes) - rebates, 0.0)
+
+
+# Function to compile a bracket/rate pair (cached, so repeated calls reuse the same table)
+@lru_cache(maxsize=64)
+def compile_tax_table(brackets, rates):
+    return TaxTable(brackets, rates)
+
+
+# Function to get the compiled SARS table for a tax year
+@lru_cache(maxsize=None)
+def get_tax_table(tax_year=LATEST_TAX_YEAR):
+    try:
+        table = SARS_TAX_TABLES[int(tax_year)]
+    except KeyError:
+        raise ValueError(f"No SARS tax table for tax year {tax_year}; "
+                         f"available years: {', '.join(map(str, available_tax_years()))}") from None
+    return TaxTable(table["brackets"], table["rates"], table["rebates"], table["thresholds"], int(tax_year))
+
+
+# Function to list the tax years that have tables
+def available_tax_years():
+    return sorted(SARS_TAX_TABLES)
+
+
+# Function to find the tax year a date falls in (tax years run from 1 March to the end of February)
+def tax_year_for_date(date):
+    return date.year + 1 if date.month >= 3 else date.year
+
+
+# Function to calculate tax for incomes that belong to different tax years, one lookup per year
+def tax_array_for_years(taxable_incomes, tax_years, ages=None):
+    import numpy as np
+
+    incomes = np.asarray(taxable_incomes, dtype=np.float64)
+    years = np.asarray(tax_years)
+    ages = None if ages is None else np.asarray(ages, dtype=np.float64)
+    liability = np.empty_like(incomes)
+    for year in np.unique(years):
+        rows = years == year
+        liability[rows] = get_tax_table(year).liability_array(incomes[rows], None if ages is None else ages[rows])
+    return liability
@@ -0,0 +1,191 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import count_rows, instrument
+from .money import PER_LINE, PER_TOTAL, ROUND_HALF_UP, ROUNDING_STAGES, divide_rounded, from_cents, to_cents
+
+# Same fractions as calculate_vat: 15% on VAT-exclusive sales, 15/115 of VAT-inclusive purchases
+OUTPUT_VAT_RATE = 0.15
+INPUT_VAT_FRACTION = 15 / 115
+# The same fractions as whole numbers, for the exact integer-cents path
+OUTPUT_VAT_RATIO = (15, 100)
+INPUT_VAT_RATIO = (15, 115)
+
+# Ledger lines read per step
+DEFAULT_LEDGER_CHUNK_SIZE = 1_000_000
+
+LEDGER_COLUMNS = ["Period", "Date", "Supplier", "Type", "Category", "Amount"]
+
+SALE, PURCHASE = 0, 1
+STANDARD, ZERO, EXEMPT = 0, 1, 2
+
+# Accepted spellings of the Type and Category columns (compared lower-cased)
+TYPE_ALIASES = {
+    "sale": SALE, "sales": SALE, "output": SALE, "supply": SALE,
+    "purchase": PURCHASE, "purchases": PURCHASE, "input": PURCHASE, "expense": PURCHASE,
+}
+CATEGORY_ALIASES = {
+    "standard": STANDARD, "standard-rated": STANDARD, "standard rated": STANDARD, "15%": STANDARD,
+    "zero": ZERO, "zero-rated": ZERO, "zero rated": ZERO, "0%": ZERO,
+    "exempt": EXEMPT,
+}
+
+# Totals kept for every VAT period and every supplier
+VAT201_COLUMNS = ["Standard-Rated Sales", "Zero-Rated Sales", "Exempt Sales", "Output VAT",
+                  "Standard-Rated Purchases", "Zero-Rated Purchases", "Exempt Purchases", "Input VAT"]
+
+
+# Function to work out whether a ledger is CSV or Parquet from its name
+def detect_ledger_format(name):
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"Unsupported ledger file type '{extension}', expected .csv or .parquet")
+
+
+# Function to read a ledger in chunks, keeping only the columns the VAT201 needs
+def iter_ledger_chunks(source, chunk_size=DEFAULT_LEDGER_CHUNK_SIZE, file_format=None):
+    if file_format is None:
+        file_format = detect_ledger_format(getattr(source, "name", source))
+
+    if file_format == "csv":
+        with pd.read_csv(source, chunksize=chunk_size, usecols=lambda name: name.strip() in LEDGER_COLUMNS,
+                         dtype={"Supplier": "category", "Type": "category", "Category": "category",
+                                "Period": "category"}) as reader:
+            for chunk in reader:
+                chunk.columns = chunk.columns.str.strip()
+                yield chunk
+    elif file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet ledgers requires pyarrow (pip install pyarrow)") from None
+        parquet_file = pq.ParquetFile(source)
+        columns = [name for name in parquet_file.schema_arrow.names if name in LEDGER_COLUMNS]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported ledger file format '{file_format}'")
+
+
+# Function to map a text column onto codes through an alias table, vectorized over its categories
+def _classify(column, aliases, name):
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype("category")
+    codes = column.cat.categories.str.strip().str.lower().map(aliases)
+    unknown = column.cat.categories[codes.isna()]
+    if len(unknown):
+        raise ValueError(f"Unknown {name} values in ledger: {', '.join(map(str, unknown[:10]))}")
+    if (column.cat.codes < 0).any():
+        raise ValueError(f"Ledger has lines without a {name}")
+    return codes.to_numpy(dtype=np.int8)[column.cat.codes.to_numpy()]
+
+
+# Function to work out the VAT period of each line: the Period column, or the month of Date
+def _periods(chunk):
+    if "Period" in chunk:
+        return chunk["Period"].astype(str)
+    if "Date" in chunk:
+        return pd.to_datetime(chunk["Date"]).dt.to_period("M").astype(str)
+    raise ValueError("Ledger needs a Period or a Date column")
+
+
+# Function to work out the output and input VAT of every line. On the exact path amounts are int64
+# cents; rounded per line, each line's VAT is rounded to a cent, while per total the unrounded
+# numerators (amount x 15) are kept and only the period/supplier totals are divided and rounded.
+def _line_vat(amount, sale, purchase, standard, exact, rounding, rounding_stage):
+    output_vat = np.where(sale & standard, amount * OUTPUT_VAT_RATIO[0] if exact else amount * OUTPUT_VAT_RATE, 0)
+    input_vat = np.where(purchase & standard, amount * INPUT_VAT_RATIO[0] if exact else amount * INPUT_VAT_FRACTION, 0)
+    if exact and rounding_stage == PER_LINE:
+        output_vat = divide_rounded(output_vat, OUTPUT_VAT_RATIO[1], rounding)
+        input_vat = divide_rounded(input_vat, INPUT_VAT_RATIO[1], rounding)
+    return output_vat, input_vat
+
+
+# Function to classify one chunk and total it per period and per supplier
+def summarise_ledger_chunk(chunk, exact=False, rounding=ROUND_HALF_UP, rounding_stage=PER_LINE):
+    kind = _classify(chunk["Type"], TYPE_ALIASES, "Type")
+    category = _classify(chunk["Category"], CATEGORY_ALIASES, "Category")
+    amount = chunk["Amount"].to_numpy(dtype=np.float64)
+    if exact:
+        amount = to_cents(amount)
+
+    sale = kind == SALE
+    purchase = ~sale
+    standard = category == STANDARD
+    zero = category == ZERO
+    exempt = category == EXEMPT
+    output_vat, input_vat = _line_vat(amount, sale, purchase, standard, exact, rounding, rounding_stage)
+
+    lines = pd.DataFrame({
+        "Standard-Rated Sales": np.where(sale & standard, amount, 0),
+        "Zero-Rated Sales": np.where(sale & zero, amount, 0),
+        "Exempt Sales": np.where(sale & exempt, amount, 0),
+        "Output VAT": output_vat,
+        "Standard-Rated Purchases": np.where(purchase & standard, amount, 0),
+        "Zero-Rated Purchases": np.where(purchase & zero, amount, 0),
+        "Exempt Purchases": np.where(purchase & exempt, amount, 0),
+        "Input VAT": input_vat,
+    }, columns=VAT201_COLUMNS)
+
+    by_period = lines.groupby(_periods(chunk).to_numpy(), sort=False).sum()
+    if "Supplier" in chunk:
+        suppliers = chunk["Supplier"].astype(str).to_numpy()
+    else:
+        suppliers = np.full(len(chunk), "", dtype=object)
+    by_supplier = lines.groupby(suppliers, sort=False).sum()
+    return by_period, by_supplier
+
+
+# Function to add one chunk's totals to the running totals (kept as int64 on the exact path)
+def _add_totals(totals, chunk_totals):
+    if totals is None:
+        return chunk_totals
+    return pd.concat([totals, chunk_totals]).groupby(level=0, sort=False).sum()
+
+
+# Function to add the VAT payable column and round the running totals for reporting.
+# Exact totals are in cents (VAT still as numerators when rounding per total) and are converted to rands.
+def _finish_totals(totals, index_name, exact=False, rounding=ROUND_HALF_UP, rounding_stage=PER_LINE):
+    if totals is None:
+        totals = pd.DataFrame(columns=VAT201_COLUMNS, dtype=np.int64 if exact else np.float64)
+    totals = totals.sort_index()
+    if exact:
+        if rounding_stage == PER_TOTAL:
+            totals["Output VAT"] = divide_rounded(totals["Output VAT"].to_numpy(), OUTPUT_VAT_RATIO[1], rounding)
+            totals["Input VAT"] = divide_rounded(totals["Input VAT"].to_numpy(), INPUT_VAT_RATIO[1], rounding)
+        totals["VAT Payable"] = totals["Output VAT"] - totals["Input VAT"]
+        totals = totals.apply(lambda column: from_cents(column.to_numpy()))
+    else:
+        totals["VAT Payable"] = totals["Output VAT"] - totals["Input VAT"]
+        totals = totals.round(2)
+    totals.index.name = index_name
+    return totals
+
+
+# Function to compute VAT201 totals over a transaction ledger one chunk at a time.
+# Only the current chunk and the running per-period/per-supplier totals are held in memory.
+# With exact=True amounts are added up in integer cents and VAT is rounded per line or per
+# total (rounding_stage) with the given rounding mode. Returns (totals by period, totals by supplier).
+@instrument()
+def stream_vat201(source, chunk_size=DEFAULT_LEDGER_CHUNK_SIZE, file_format=None, on_chunk=None, exact=False,
+                  rounding=ROUND_HALF_UP, rounding_stage=PER_LINE):
+    if rounding_stage not in ROUNDING_STAGES:
+        raise ValueError(f"Unknown rounding stage '{rounding_stage}', expected one of {', '.join(ROUNDING_STAGES)}")
+    by_period = None
+    by_supplier = None
+    lines = 0
+    for chunk in iter_ledger_chunks(source, chunk_size, file_format):
+        chunk_by_period, chunk_by_supplier = summarise_ledger_chunk(chunk, exact, rounding, rounding_stage)
+        by_period = _add_totals(by_period, chunk_by_period)
+        by_supplier = _add_totals(by_supplier, chunk_by_supplier)
+        lines += len(chunk)
+        count_rows(len(chunk))
+        if on_chunk is not None:
+            on_chunk(lines)
+    return (_finish_totals(by_period, "Period", exact, rounding, rounding_stage),
+            _finish_totals(by_supplier, "Supplier", exact, rounding, rounding_stage))
@@ -0,0 +1,221 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrument
+from .money import from_cents, to_cents
+from .tax_tables import LATEST_TAX_YEAR, get_tax_table
+
+# Monthly periods in a tax year (period 1 is March)
+PERIODS_PER_YEAR = 12
+
+# Per-employee year-to-date state, one memory-mapped .npy file per column. Amounts are in cents.
+# end_period is 0 while the employee is still employed.
+STATE_COLUMNS = {
+    "start_period": np.int16,
+    "last_period": np.int16,
+    "end_period": np.int16,
+    "age": np.int16,
+    "ytd_regular": np.int64,
+    "ytd_irregular": np.int64,
+    "ytd_paye": np.int64,
+}
+EMPLOYEE_ID_DTYPE = "<U32"
+
+# Columns of a monthly YTD run (only Employee ID and Gross Salary are required)
+YTD_INPUT_COLUMNS = ["Employee ID", "Gross Salary", "Allowances", "Fringe Benefits", "Retirement Deductions",
+                     "Bonus", "Age", "Terminated"]
+YTD_RESULT_COLUMNS = ["Employee ID", "Period", "Periods Worked", "Regular Income", "Bonus", "YTD Regular Income",
+                      "YTD Bonus", "Annual Equivalent", "PAYE", "YTD PAYE"]
+
+_INITIAL_CAPACITY = 1_024
+
+
+# Year-to-date PAYE state for one tax year, kept on disk as memory-mapped column files so a
+# monthly run only touches the pages of the employees it pays. Rows are appended for new
+# employees; the files grow by doubling, so appends stay cheap.
+class YTDStore:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as handle:
+            meta = json.load(handle)
+        self.tax_year = meta["tax_year"]
+        self.rows = meta["rows"]
+        self._open_columns()
+
+    # Function to create an empty store for a tax year
+    @classmethod
+    def create(cls, path, tax_year=LATEST_TAX_YEAR):
+        get_tax_table(tax_year)
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, "meta.json")):
+            raise FileExistsError(f"{path} already holds a YTD store")
+        for name, dtype in [("employee_id", EMPLOYEE_ID_DTYPE), *STATE_COLUMNS.items()]:
+            np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode="w+", dtype=dtype,
+                                      shape=(_INITIAL_CAPACITY,)).flush()
+        cls._write_meta(path, int(tax_year), 0)
+        return cls(path)
+
+    # Function to open a store, creating it for tax_year (default: the latest) when it doesn't exist yet
+    @classmethod
+    def open(cls, path, tax_year=None):
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return cls.create(path, LATEST_TAX_YEAR if tax_year is None else tax_year)
+        store = cls(path)
+        if tax_year is not None and int(tax_year) != store.tax_year:
+            raise ValueError(f"{path} holds tax year {store.tax_year}, not {tax_year}")
+        return store
+
+    @staticmethod
+    def _write_meta(path, tax_year, rows):
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as handle:
+            json.dump({"tax_year": tax_year, "rows": rows}, handle)
+
+    def _open_columns(self):
+        self.employee_ids = np.load(os.path.join(self.path, "employee_id.npy"), mmap_mode="r+")
+        self.columns = {name: np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r+") for name in STATE_COLUMNS}
+        self._index = None
+
+    def __len__(self):
+        return self.rows
+
+    # Row of each employee ID, -1 for employees the store hasn't seen
+    def lookup(self, employee_ids):
+        if self._index is None:
+            self._index = pd.Index(self.employee_ids[:self.rows])
+        return self._index.get_indexer(pd.Index(employee_ids, dtype=object).astype(str))
+
+    # Function to copy every column file into a larger one
+    def _grow(self, capacity):
+        columns = {"employee_id": self.employee_ids, **self.columns}
+        for name, column in columns.items():
+            grown = np.lib.format.open_memmap(os.path.join(self.path, f"{name}.npy.tmp"), mode="w+",
+                                              dtype=column.dtype, shape=(capacity,))
+            grown[:self.rows] = column[:self.rows]
+            grown.flush()
+            del grown
+        self.employee_ids = self.columns = None
+        del columns, column
+        for name in ["employee_id", *STATE_COLUMNS]:
+            target = os.path.join(self.path, f"{name}.npy")
+            os.replace(f"{target}.tmp", target)
+        self._open_columns()
+
+    # Function to append new employees; returns their rows
+    def add(self, employee_ids, start_period, ages):
+        too_long = [employee_id for employee_id in employee_ids if len(employee_id) > int(EMPLOYEE_ID_DTYPE[2:])]
+        if too_long:
+            raise ValueError(f"Employee IDs are limited to {EMPLOYEE_ID_DTYPE[2:]} characters: {', '.join(too_long[:10])}")
+        count = len(employee_ids)
+        capacity = len(self.employee_ids)
+        if self.rows + count > capacity:
+            while capacity < self.rows + count:
+                capacity *= 2
+            self._grow(capacity)
+        rows = np.arange(self.rows, self.rows + count)
+        self.employee_ids[rows] = np.asarray(employee_ids, dtype=str)
+        for name in STATE_COLUMNS:
+            self.columns[name][rows] = 0
+        self.columns["start_period"][rows] = start_period
+        self.columns["age"][rows] = ages
+        self.rows += count
+        self._index = None
+        return rows
+
+    # Function to read the state of some rows as a DataFrame (amounts in cents)
+    def read(self, rows):
+        return pd.DataFrame({name: column[rows] for name, column in self.columns.items()},
+                            index=pd.Index(self.employee_ids[rows], name="Employee ID"))
+
+    # Function to write the state of some rows back
+    def write(self, rows, state):
+        for name, column in self.columns.items():
+            if name in state:
+                column[rows] = state[name]
+
+    def flush(self):
+        self.employee_ids.flush()
+        for column in self.columns.values():
+            column.flush()
+        self._write_meta(self.path, self.tax_year, self.rows)
+
+
+# Function to fetch an optional input column as floats, zero when it is missing or blank
+def _ytd_column(payroll, name, default=0.0):
+    if name in payroll:
+        return payroll[name].fillna(default).to_numpy(dtype=np.float64)
+    return np.full(len(payroll), default)
+
+
+# Function to run one monthly period with the cumulative (averaging) PAYE method.
+# Regular income is annualised from the year to date over the periods actually worked, so joiners
+# and leavers are taxed on what they earn while employed; bonuses are taxed as the difference the
+# year-to-date bonuses make on top of that annual equivalent. This month's PAYE is the tax due to
+# date less the PAYE already withheld (never negative). Only the employees in this payroll are
+# read from and written to the store; everyone else's state is left untouched on disk.
+@instrument()
+def run_ytd_period(store, period, payroll):
+    if not 1 <= period <= PERIODS_PER_YEAR:
+        raise ValueError(f"period must be between 1 and {PERIODS_PER_YEAR}")
+    if not isinstance(payroll, pd.DataFrame):
+        payroll = pd.DataFrame(payroll)
+    if "Employee ID" not in payroll or "Gross Salary" not in payroll:
+        raise KeyError("YTD payroll needs 'Employee ID' and 'Gross Salary' columns")
+    employee_ids = payroll["Employee ID"].astype(str).to_numpy()
+    if len(set(employee_ids)) != len(employee_ids):
+        raise ValueError("YTD payroll lists an employee more than once")
+    tax_table = get_tax_table(store.tax_year)
+
+    rows = store.lookup(employee_ids)
+    known = store.read(rows[rows >= 0])
+    repeated = known["last_period"].to_numpy() >= period
+    if repeated.any():
+        raise ValueError(f"Period {period} was already run for: {', '.join(known.index[repeated][:10])}")
+    left = known["end_period"].to_numpy() > 0
+    if left.any():
+        raise ValueError(f"Employees already terminated this tax year: {', '.join(known.index[left][:10])}")
+
+    joiners = rows < 0
+    if joiners.any():
+        rows[joiners] = store.add(employee_ids[joiners], period, _ytd_column(payroll, "Age")[joiners])
+    state = store.read(rows)
+
+    regular = to_cents(_ytd_column(payroll, "Gross Salary") + _ytd_column(payroll, "Allowances")
+                       + _ytd_column(payroll, "Fringe Benefits") - _ytd_column(payroll, "Retirement Deductions"))
+    bonus = to_cents(_ytd_column(payroll, "Bonus"))
+    ytd_regular = state["ytd_regular"].to_numpy() + regular
+    ytd_irregular = state["ytd_irregular"].to_numpy() + bonus
+    periods_worked = period - state["start_period"].to_numpy().astype(np.int64) + 1
+    ages = state["age"].to_numpy()
+
+    annual_equivalent = from_cents(ytd_regular) / periods_worked * PERIODS_PER_YEAR
+    regular_tax = tax_table.liability_array(annual_equivalent, ages)
+    bonus_tax = tax_table.liability_array(annual_equivalent + from_cents(ytd_irregular), ages) - regular_tax
+    tax_to_date = to_cents(regular_tax * periods_worked / PERIODS_PER_YEAR + bonus_tax)
+    paye = np.maximum(tax_to_date - state["ytd_paye"].to_numpy(), 0)
+    ytd_paye = state["ytd_paye"].to_numpy() + paye
+
+    terminated = _ytd_column(payroll, "Terminated").astype(bool)
+    store.write(rows, {
+        "last_period": period,
+        "end_period": np.where(terminated, period, 0),
+        "ytd_regular": ytd_regular,
+        "ytd_irregular": ytd_irregular,
+        "ytd_paye": ytd_paye,
+    })
+    store.flush()
+
+    return pd.DataFrame({
+        "Employee ID": payroll["Employee ID"].to_numpy(),
+        "Period": period,
+        "Periods Worked": periods_worked,
+        "Regular Income": from_cents(regular),
+        "Bonus": from_cents(bonus),
+        "YTD Regular Income": from_cents(ytd_regular),
+        "YTD Bonus": from_cents(ytd_irregular),
+        "Annual Equivalent": annual_equivalent.round(2),
+        "PAYE": from_cents(paye),
+        "YTD PAYE": from_cents(ytd_paye),
+    }, columns=YTD_RESULT_COLUMNS, index=payroll.index)
@@ -1,87 +1,245 @@
+import io
+import time
+
 import streamlit as st
 import pandas as pd
 
-# Function to calculate PAYE
-def calculate_paye(gross_salary, allowances, fringe_benefits, retirement_deductions, medical_credits, tax_rate, rebates):
-    taxable_income = gross_salary + allowances + fringe_benefits - retirement_deductions
-    annual_paye = (taxable_income * tax_rate) - rebates
-    monthly_paye = annual_paye / 12
-    return round(monthly_paye, 2)
-
-# Function to calculate UIF
-def calculate_uif(gross_salary):
-    employee_uif = gross_salary * 0.01
-    employer_uif = gross_salary * 0.01
-    total_uif = employee_uif + employer_uif
-    return round(total_uif, 2), round(employee_uif, 2), round(employer_uif, 2)
-
-# Function to calculate SDL
-def calculate_sdl(gross_salary):
-    sdl = gross_salary * 0.01
-    return round(sdl, 2)
-
-# Function to calculate VAT
-def calculate_vat(output_sales, input_purchases):
-    output_vat = output_sales * 0.15
-    input_vat = input_purchases * (15/115)
-    vat_payable = output_vat - input_vat
-    return round(vat_payable, 2)
-
-# Function for progressive tax rates (based on SARS brackets)
-def calculate_progressive_tax(taxable_income, brackets, rates, rebates):
-    tax_liability = 0
-    for i in range(len(brackets)):
-        if taxable_income > brackets[i]:
-            tax_liability += (min(taxable_income, brackets[i+1]) - brackets[i]) * rates[i]
+from taxcore import (calculate_fringe_benefits, calculate_paye, calculate_progressive_tax, calculate_sdl, calculate_uif,
+                     calculate_vat, what_if_analysis)
+from taxcore.employee_grid import EmployeeGrid, apply_edited_rows, page_count, page_of
+from taxcore.export import EXPORT_FORMATS, available_export_formats, export_download, statement_frame
+from taxcore.fringe import DEFAULT_FRINGE_RULES, column_name
+from taxcore.instrumentation import (disable_instrumentation, enable_instrumentation, instrumentation_enabled,
+                                     instrumentation_json, instrumentation_prometheus, instrumentation_stats,
+                                     record, reset_instrumentation)
+from taxcore.jobs import DONE, FAILED, FINISHED, PROCESS, job_queue, payroll_job, vat201_job
+from taxcore.money import PER_LINE, PER_TOTAL
+from taxcore.payroll import PAYROLL_INPUT_COLUMNS
+from taxcore.payroll_io import DEFAULT_CHUNK_SIZE, iter_payroll_chunks, process_payroll_file, read_fringe_register
+from taxcore.scenarios import scenario_grid, sweep_scenarios
+from taxcore.statements import BALANCE_SHEET, CASH_FLOW_STATEMENT, INCOME_STATEMENT, IncrementalStatement
+from taxcore.tax_tables import available_tax_years, get_tax_table
+from taxcore.vat import stream_vat201
+
+# Function to switch the timing instrumentation on or off when its checkbox is clicked
+def toggle_instrumentation():
+    if st.session_state["diagnostics_enabled"]:
+        enable_instrumentation()
+    else:
+        disable_instrumentation()
+
+# Function to show the switch for the timing instrumentation at the top of the sidebar's Diagnostics
+# panel. The switch is app-wide, so it shows the current state and only changes it when clicked; it is
+# applied before the page runs, so the page's own calculations are measured. Memory high-water marks
+# are left to the CLI's --trace-memory, since tracemalloc's single peak can't be shared between sessions.
+def show_diagnostics_switch(panel):
+    st.session_state["diagnostics_enabled"] = instrumentation_enabled()
+    with panel:
+        st.checkbox("Enable Instrumentation (all sessions)", key="diagnostics_enabled", on_change=toggle_instrumentation)
+
+# Function to show the timings collected so far, with JSON and Prometheus text downloads
+def show_diagnostics_panel(panel):
+    with panel:
+        stats = instrumentation_stats()
+        if not stats:
+            st.caption("No timings recorded yet" if instrumentation_enabled() else "Instrumentation is off")
+            return
+        st.dataframe(pd.DataFrame(stats).set_index("Path"))
+        st.download_button("Download JSON", instrumentation_json(), file_name="taxcore_metrics.json",
+                           mime="application/json", key="diagnostics_json")
+        st.download_button("Download Prometheus Text", instrumentation_prometheus(), file_name="taxcore_metrics.prom",
+                           mime="text/plain", key="diagnostics_prometheus")
+        if st.button("Reset Timings"):
+            reset_instrumentation()
+            st.rerun()
+
+# Seconds between refreshes of a running background job's progress
+JOB_POLL_SECONDS = 1
+
+# Function to tell whether long calculations should be queued as background jobs
+def run_in_background():
+    return st.session_state.get("jobs_background", False)
+
+# Function to copy an uploaded file for a background job, which reads it after this rerun has finished
+def detached_upload(uploaded):
+    upload = io.BytesIO(uploaded.getvalue())
+    upload.name = uploaded.name
+    return upload
+
+# Function to queue a job on the shared job queue and remember it as one of this session's jobs
+def submit_job(name, func, *args, **kwargs):
+    job = job_queue().submit(name, func, *args, **kwargs)
+    st.session_state.setdefault("job_ids", []).append(job.id)
+    return job
+
+# Function to show a running job's progress, partial result and a Cancel button. It runs as a fragment
+# refreshed every JOB_POLL_SECONDS, and reruns the whole page once the job has finished.
+def show_running_job(job, key, show_partial=None):
+    if job.status in FINISHED:
+        st.rerun()
+    st.info(f"{job.name} (job {job.id}) is {job.status}" + (f": {job.message}" if job.message else ""))
+    if job.progress is not None:
+        st.progress(job.progress)
+    if show_partial is not None and job.partial is not None:
+        show_partial(job.partial)
+    if st.button("Cancel", key=f"{key}_cancel"):
+        job.cancel()
+        st.rerun()
+
+# Function to show the background job whose ID is kept under key in the session: its progress while it
+# runs and show_result(result, key) once it is done. Returns the job (None if there isn't one).
+def show_job(key, show_result, show_partial=None):
+    job_id = st.session_state.get(key)
+    if job_id is None:
+        return None
+    try:
+        job = job_queue().get(job_id)
+    except KeyError:
+        st.warning(f"Job {job_id} is no longer available")
+        return None
+    if job.status not in FINISHED:
+        st.fragment(show_running_job, run_every=JOB_POLL_SECONDS)(job, key, show_partial)
+    elif job.status == DONE:
+        show_result(job.result, key)
+    elif job.status == FAILED:
+        st.error(f"{job.name} failed: {job.error}")
+    else:
+        st.warning(f"{job.name} was cancelled")
+    return job
+
+# Function to show a processed payroll file: totals, the first results and the results file (its bytes,
+# or the path of the file a background job wrote)
+def show_payroll_file_results(result, key="payroll_file"):
+    st.success(f"Calculations completed for {result['rows']:,} employees.")
+    st.table(result["totals"].rename("Total").to_frame())
+    if result["preview"] is not None:
+        st.caption("First 100 results")
+        st.dataframe(result["preview"])
+    extension, mime = EXPORT_FORMATS[result["output_format"]]
+    if isinstance(result["file"], bytes):
+        st.download_button("Download Results", result["file"], file_name=f"payroll_results.{extension}", mime=mime,
+                           key=f"{key}_download")
+        return
+    try:
+        with open(result["file"], "rb") as results_file:
+            st.download_button("Download Results", results_file, file_name=f"payroll_results.{extension}",
+                               mime=mime, key=f"{key}_download")
+    except FileNotFoundError:
+        st.warning("The results file is no longer available")
+
+# Function to show the running totals of a payroll file that is still being processed
+def show_payroll_file_totals(partial):
+    st.table(partial["totals"].rename("Running Total").to_frame())
+
+# Function to show a VAT201 return from a transaction ledger
+def show_vat201_results(result, key=None):
+    by_period, by_supplier = result
+    st.success(f"Total VAT Payable: R{by_period['VAT Payable'].sum():,.2f}")
+    st.subheader("VAT201 by Period")
+    st.dataframe(by_period)
+    st.subheader("Totals by Supplier")
+    st.dataframe(by_supplier)
+
+# Function to show an export built by a background job
+def show_export_result(result, key):
+    data, file_name, mime = result
+    st.download_button(f"Download {file_name}", data, file_name=file_name, mime=mime, key=f"{key}_download")
+
+# How a finished job's result is shown when it is looked up by ID, by job name
+JOB_RESULT_VIEWS = {"Payroll": show_payroll_file_results, "VAT201": show_vat201_results, "Export": show_export_result}
+
+# Function to show the switch for background jobs; it is read before the page runs
+def show_jobs_switch(panel):
+    with panel:
+        st.checkbox("Run in Background", key="jobs_background",
+                    help="Queue payroll files, VAT201 ledgers and prepared downloads as background jobs, "
+                         "so the page stays usable while they run")
+
+# Function to list this session's background jobs, and to look any job up by its ID to follow it,
+# cancel it or retrieve its result
+def show_jobs_panel(panel):
+    with panel:
+        jobs = job_queue().jobs(st.session_state.get("job_ids", []))
+        if jobs:
+            st.dataframe(pd.DataFrame([job.summary() for job in jobs]).set_index("Job ID"))
         else:
-            break
-    return round(tax_liability - rebates, 2)
-
-# Function to handle fringe benefits with different tax treatments
-def calculate_fringe_benefits(value, benefit_type):
-    if benefit_type == "Company Car":
-        return value * 0.03  # 3% of the value
-    elif benefit_type == "Low-Interest Loan":
-        return value * 0.05  # 5% of the value
+            st.caption("No background jobs in this session")
+        job_id = st.text_input("Look Up Job ID", key="jobs_lookup").strip()
+        if job_id:
+            found = job_queue().jobs([job_id])
+            if not found:
+                st.warning(f"No job with ID '{job_id}'")
+                return
+            st.session_state["jobs_lookup_id"] = job_id
+            show_job("jobs_lookup_id", JOB_RESULT_VIEWS.get(found[0].name, lambda result, key: st.write(result)))
+
+# Function to recalculate a statement, reusing the subtotals from the previous rerun that the
+# changed inputs don't feed into
+def update_statement(graph, inputs):
+    key = f"statement_graph_{graph.name}"
+    if key not in st.session_state:
+        st.session_state[key] = IncrementalStatement(graph)
+    statement = st.session_state[key]
+    data = statement.update(inputs)
+    st.caption(f"Recalculated {len(statement.last_recomputed)} of {len(graph.order)} subtotals")
+    return data
+
+# Function to read a comma-separated list of numbers typed into a text box
+def parse_values(text):
+    return [float(value) for value in text.split(",") if value.strip()] or [0.0]
+
+# Function to offer sheets as a download in the chosen format. The file is built in memory for
+# this session only, so concurrent users never share or overwrite an export.
+# With a version (which must change whenever the data does), the file is only built when asked for
+# and is then reused until the data changes, so large tables don't rebuild it on every rerun. In
+# background mode it is built by a job in the process pool, as building an XLSX file holds the GIL.
+def show_download(label, sheets, file_stem, key, version=None):
+    file_format = st.radio(f"{label} Format", available_export_formats(),
+                           horizontal=True, key=f"{key}_format")
+    if version is None:
+        data, file_name, mime = export_download(sheets, file_stem, file_format)
     else:
-        return value  # No additional tax
-
-# Function for What-If Analysis
-def what_if_analysis(gross_salary, proposed_increase, tax_rate):
-    new_salary = gross_salary + proposed_increase
-    new_paye = calculate_paye(new_salary, 0, 0, 0, 0, tax_rate/100, 0)
-    return round(new_salary, 2), round(new_paye, 2)
-
-# Function to handle multiple employees
-def process_multiple_employees(employee_data):
-    results = []
-    for employee in employee_data:
-        gross_salary = employee['Gross Salary']
-        allowances = employee['Allowances']
-        fringe_benefits = employee['Fringe Benefits']
-        retirement_deductions = employee['Retirement Deductions']
-        medical_credits = employee['Medical Credits']
-        tax_rate = employee['Tax Rate']
-        rebates = employee['Rebates']
-        
-        paye = calculate_paye(gross_salary, allowances, fringe_benefits, retirement_deductions, medical_credits, tax_rate / 100, rebates)
-        total_uif, employee_uif, employer_uif = calculate_uif(gross_salary)
-        sdl = calculate_sdl(gross_salary)
-        
-        results.append({
-            "Employee": employee['Employee Name'],
-            "Gross Salary": gross_salary,
-            "PAYE": paye,
-            "Total UIF": total_uif,
-            "Employee UIF": employee_uif,
-            "Employer UIF": employer_uif,
-            "SDL": sdl
-        })
-    return pd.DataFrame(results)
-
-# Function to create a DataFrame for exporting
-def create_dataframe(data, columns):
-    return pd.DataFrame([data], columns=columns)
+        cached = st.session_state.get(f"{key}_file")
+        if cached is None or cached[0] != (version, file_format):
+            job = None
+            if st.session_state.get(f"{key}_job_version") == (version, file_format):
+                job = show_job(f"{key}_job", lambda result, job_key: None)
+            if job is not None and job.status == DONE:
+                st.session_state[f"{key}_file"] = cached = ((version, file_format), job.result)
+            elif job is not None and job.status not in FINISHED:
+                return
+            elif not st.button(f"Prepare {label}", key=f"{key}_prepare"):
+                return
+            elif run_in_background():
+                job = submit_job("Export", export_download, sheets, file_stem, file_format, executor=PROCESS)
+                st.session_state[f"{key}_job"] = job.id
+                st.session_state[f"{key}_job_version"] = (version, file_format)
+                st.rerun()
+            else:
+                cached = ((version, file_format), export_download(sheets, file_stem, file_format))
+                st.session_state[f"{key}_file"] = cached
+        data, file_name, mime = cached[1]
+    st.download_button(label, data, file_name=file_name, mime=mime, key=key)
+
+# Function to collect every statement (and the last payroll run, if any) as workbook sheets
+def all_statement_sheets():
+    sheets = {}
+    for graph in (INCOME_STATEMENT, BALANCE_SHEET, CASH_FLOW_STATEMENT):
+        statement = st.session_state.get(f"statement_graph_{graph.name}")
+        sheets[graph.name] = statement_frame(statement.report() if statement else graph.report(graph.evaluate({})))
+    if "payroll_results" in st.session_state:
+        sheets["Payroll"] = st.session_state["payroll_results"]
+    return sheets
+
+# Function to identify what all_statement_sheets() currently holds (each statement's values and the
+# payroll grid's version), so the combined workbook is only rebuilt when one of them changes
+def all_statements_version():
+    statements = []
+    for graph in (INCOME_STATEMENT, BALANCE_SHEET, CASH_FLOW_STATEMENT):
+        statement = st.session_state.get(f"statement_graph_{graph.name}")
+        statements.append(tuple(statement.values.items()) if statement else None)
+    grid = st.session_state.get("employee_grid")
+    return tuple(statements), grid.version if grid is not None and "payroll_results" in st.session_state else None
 
 # Main application
 def main():
@@ -93,39 +251,80 @@ def main():
                              "VAT Calculation", "Progressive Tax Calculation", 
                              "Fringe Benefits Calculation", "What-If Analysis", 
                              "Generate Financial Statements"])
+    diagnostics = st.sidebar.expander("Diagnostics")
+    show_diagnostics_switch(diagnostics)
+    jobs_panel = st.sidebar.expander("Background Jobs")
+    show_jobs_switch(jobs_panel)
+    page_start = time.perf_counter()
 
     if menu == "Multiple Employee Calculation":
         st.header("Multiple Employee Calculation")
 
-        number_of_employees = st.number_input("Number of Employees", min_value=1, value=1, step=1)
-        employee_data = []
-
-        for i in range(int(number_of_employees)):
-            with st.expander(f"Employee {i+1} Details"):
-                employee_name = st.text_input(f"Employee {i+1} Name", value=f"Employee {i+1}")
-                gross_salary = st.number_input(f"Gross Salary (Employee {i+1})", min_value=0.0, value=0.0)
-                allowances = st.number_input(f"Allowances (Employee {i+1})", min_value=0.0, value=0.0)
-                fringe_benefits = st.number_input(f"Fringe Benefits (Employee {i+1})", min_value=0.0, value=0.0)
-                retirement_deductions = st.number_input(f"Retirement Fund Contributions (Employee {i+1})", min_value=0.0, value=0.0)
-                medical_credits = st.number_input(f"Medical Aid Tax Credits (Employee {i+1})", min_value=0.0, value=0.0)
-                tax_rate = st.slider(f"Tax Rate (Employee {i+1}) (%)", min_value=0.0, max_value=45.0, value=26.0)
-                rebates = st.number_input(f"Rebates (Employee {i+1})", min_value=0.0, value=0.0)
-                
-                employee_data.append({
-                    "Employee Name": employee_name,
-                    "Gross Salary": gross_salary,
-                    "Allowances": allowances,
-                    "Fringe Benefits": fringe_benefits,
-                    "Retirement Deductions": retirement_deductions,
-                    "Medical Credits": medical_credits,
-                    "Tax Rate": tax_rate,
-                    "Rebates": rebates
-                })
-
-        if st.button("Calculate for All Employees"):
-            result_df = process_multiple_employees(employee_data)
-            st.dataframe(result_df)
-            st.success("Calculations completed for all employees.")
+        input_method = st.radio("Input Method", ["Enter Manually", "Upload Payroll File"], horizontal=True)
+
+        if input_method == "Upload Payroll File":
+            st.caption("CSV or Excel file with the columns: " + ", ".join(PAYROLL_INPUT_COLUMNS))
+            payroll_file = st.file_uploader("Payroll File", type=["csv", "xlsx"])
+            chunk_size = st.number_input("Employees per Chunk", min_value=1_000, value=DEFAULT_CHUNK_SIZE, step=1_000)
+            output_format = st.radio("Results Format", available_export_formats(), horizontal=True)
+            exact = st.checkbox("Exact cents arithmetic", help="Calculate every payslip line in integer cents "
+                                                               "(rounded half-up) so totals reconcile with bank files")
+            fringe_file = st.file_uploader("Fringe Benefit Register (optional)", type=["csv", "xlsx"],
+                                           help="One row per benefit: Employee Name, Benefit Type, Value and any "
+                                                "rule parameters; each employee's month of benefits is added to "
+                                                "their Fringe Benefits")
+
+            if payroll_file is not None and st.button("Process Payroll File"):
+                fringe = read_fringe_register(fringe_file)[1] if fringe_file is not None else None
+                if run_in_background():
+                    job = submit_job("Payroll", payroll_job, detached_upload(payroll_file), int(chunk_size),
+                                     output_format=output_format, exact=exact, fringe=fringe)
+                    st.session_state["payroll_file_job"] = job.id
+                else:
+                    st.session_state.pop("payroll_file_job", None)
+                    progress = st.empty()
+                    preview = []
+
+                    def show_progress(result, rows):
+                        if not preview:
+                            preview.append(result.head(100))
+                        progress.text(f"Processed {rows:,} employees...")
+
+                    output = io.BytesIO()
+                    rows, totals = process_payroll_file(payroll_file, output, int(chunk_size), on_chunk=show_progress,
+                                                        output_format=output_format, exact=exact, fringe=fringe)
+                    progress.empty()
+                    show_payroll_file_results({"rows": rows, "totals": totals, "preview": preview[0] if preview else None,
+                                               "file": output.getvalue(), "output_format": output_format})
+            show_job("payroll_file_job", show_payroll_file_results, show_payroll_file_totals)
+
+        else:
+            number_of_employees = int(st.number_input("Number of Employees", min_value=1, value=1, step=1))
+            if "employee_grid" not in st.session_state:
+                st.session_state["employee_grid"] = EmployeeGrid(number_of_employees)
+            grid = st.session_state["employee_grid"]
+            grid.resize(number_of_employees)
+
+            # Only one page of employees is sent to the browser on each rerun
+            pages = page_count(len(grid))
+            page = int(st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, step=1))
+            # The editor's widget ID depends on the data it is given, so it gets a base page that stays the
+            # same until the page or the number of employees changes; otherwise every edit would remount it
+            # and lose the next one. Its edited_rows are the edits made since the base was taken.
+            editor_key = f"employee_grid_{len(grid)}_page_{page}"
+            base = st.session_state.get("employee_grid_base")
+            if base is None or base[0] != editor_key:
+                base = st.session_state["employee_grid_base"] = (editor_key, page_of(grid.table, page).copy())
+            st.data_editor(base[1], key=editor_key, use_container_width=True,
+                           column_config={"Tax Rate": st.column_config.NumberColumn(
+                               "Tax Rate", min_value=0.0, max_value=45.0, format="%.1f%%")})
+            grid.update(apply_edited_rows(base[1], st.session_state[editor_key]["edited_rows"]))
+            st.caption(f"Recalculated {grid.last_recalculated:,} of {len(grid):,} employees")
+
+            st.session_state["payroll_results"] = grid.results
+            st.dataframe(page_of(grid.results, page), use_container_width=True)
+            show_download("Download Payroll Results", {"Payroll": grid.results}, "payroll_results",
+                          key="payroll_download", version=grid.version)
 
     elif menu == "PAYE Calculation":
         st.header("PAYE Calculation")
@@ -157,39 +356,140 @@ def main():
 
     elif menu == "VAT Calculation":
         st.header("VAT Calculation")
-        output_sales = st.number_input("Total Sales (excluding exempt items)", min_value=0.0, value=0.0)
-        input_purchases = st.number_input("Total VAT-Inclusive Purchases", min_value=0.0, value=0.0)
-        if st.button("Calculate VAT"):
-            vat_payable = calculate_vat(output_sales, input_purchases)
-            st.success(f"VAT Payable: R{vat_payable}")
+        vat_input = st.radio("Input Method", ["Enter Totals", "Upload Transaction Ledger"], horizontal=True)
+
+        if vat_input == "Upload Transaction Ledger":
+            st.caption("CSV or Parquet ledger with the columns: Date (or Period), Supplier, "
+                       "Type (Sale/Purchase), Category (Standard/Zero/Exempt) and Amount. "
+                       "Sales are VAT-exclusive, purchases VAT-inclusive.")
+            ledger_file = st.file_uploader("Transaction Ledger", type=["csv", "parquet"])
+            vat_rounding = st.radio("VAT Rounding", ["Floating Point", "Exact Cents, Per Line", "Exact Cents, Per Total"],
+                                    horizontal=True)
+            if ledger_file is not None and st.button("Calculate VAT201"):
+                exact = vat_rounding != "Floating Point"
+                rounding_stage = PER_TOTAL if vat_rounding.endswith("Per Total") else PER_LINE
+                if run_in_background():
+                    job = submit_job("VAT201", vat201_job, detached_upload(ledger_file), exact=exact,
+                                     rounding_stage=rounding_stage)
+                    st.session_state["vat201_job"] = job.id
+                else:
+                    st.session_state.pop("vat201_job", None)
+                    progress = st.empty()
+                    result = stream_vat201(
+                        ledger_file, on_chunk=lambda lines: progress.text(f"Processed {lines:,} ledger lines..."),
+                        exact=exact, rounding_stage=rounding_stage)
+                    progress.empty()
+                    show_vat201_results(result)
+            show_job("vat201_job", show_vat201_results)
+
+        else:
+            output_sales = st.number_input("Total Sales (excluding exempt items)", min_value=0.0, value=0.0)
+            input_purchases = st.number_input("Total VAT-Inclusive Purchases", min_value=0.0, value=0.0)
+            if st.button("Calculate VAT"):
+                vat_payable = calculate_vat(output_sales, input_purchases)
+                st.success(f"VAT Payable: R{vat_payable}")
 
     elif menu == "Progressive Tax Calculation":
         st.header("Progressive Tax Calculation")
+        tax_years = available_tax_years()
+        tax_year = st.selectbox("Tax Year", tax_years, index=len(tax_years) - 1,
+                                format_func=lambda year: f"{year - 1}/{year} (ending February {year})")
+        tax_table = get_tax_table(tax_year)
         taxable_income = st.number_input("Taxable Income", min_value=0.0, value=0.0)
-        brackets = [0, 205900, 321600, 445100, 584200, 744800, 1577300]
-        rates = [0.18, 0.26, 0.31, 0.36, 0.39, 0.41, 0.45]
-        rebates = st.number_input("Rebates", min_value=0.0, value=0.0)
+        rebates = st.number_input("Rebates", min_value=0.0, value=tax_table.rebate())
         if st.button("Calculate Tax"):
-            tax_liability = calculate_progressive_tax(taxable_income, brackets, rates, rebates)
+            tax_liability = calculate_progressive_tax(taxable_income, tax_table.brackets, tax_table.rates, rebates)
             st.success(f"Annual Tax Liability: R{tax_liability}")
 
     elif menu == "Fringe Benefits Calculation":
         st.header("Fringe Benefits Calculation")
-        fringe_value = st.number_input("Fringe Benefit Value", min_value=0.0, value=0.0)
-        benefit_type = st.selectbox("Select Benefit Type", ["Company Car", "Low-Interest Loan", "Other"])
-        if st.button("Calculate Fringe Benefit Tax"):
-            tax_value = calculate_fringe_benefits(fringe_value, benefit_type)
-            st.success(f"Taxable Fringe Benefit Value: R{tax_value}")
+        valuation = st.radio("Valuation", ["Single Benefit", "Upload Benefit Register"], horizontal=True)
+
+        if valuation == "Upload Benefit Register":
+            st.caption("CSV or Excel register with one row per benefit: Employee Name, Benefit Type, Value "
+                       "and, where they apply, " + ", ".join(sorted({column_name(name)
+                                                                   for rule in DEFAULT_FRINGE_RULES.rules.values()
+                                                                   for name in rule.defaults})) +
+                       ". Blank parameters take each rule's default; every benefit is valued for the months below.")
+            register_file = st.file_uploader("Fringe Benefit Register", type=["csv", "xlsx"])
+            months = st.number_input("Months Valued", min_value=1, max_value=12, value=1, step=1)
+            if register_file is not None and st.button("Value Register"):
+                register, by_employee = read_fringe_register(register_file, int(months))
+                run = st.session_state.get("fringe_register", (None, None, 0))[2] + 1
+                st.session_state["fringe_register"] = (register, by_employee.reset_index(), run)
+            if "fringe_register" in st.session_state:
+                register, by_employee, run = st.session_state["fringe_register"]
+                st.success(f"Taxable Fringe Benefits: R{by_employee['Taxable Value'].sum():,.2f} "
+                           f"for {len(by_employee):,} employees")
+                st.dataframe(by_employee, use_container_width=True)
+                st.caption("First 100 benefits")
+                st.dataframe(register.head(100), use_container_width=True)
+                show_download("Download Fringe Benefits", {"By Employee": by_employee, "Register": register},
+                              "fringe_benefits", key="fringe_download", version=run)
+
+        else:
+            benefit_type = st.selectbox("Select Benefit Type", DEFAULT_FRINGE_RULES.types)
+            rule = DEFAULT_FRINGE_RULES.rule(benefit_type)
+            fringe_value = st.number_input("Fringe Benefit Value", min_value=0.0, value=0.0)
+            parameters = {name: st.number_input(column_name(name), min_value=0.0, value=float(default))
+                          for name, default in rule.defaults.items()}
+            st.caption(f"Taxable value = {rule.formula}")
+            if st.button("Calculate Fringe Benefit Tax"):
+                tax_value = calculate_fringe_benefits(fringe_value, benefit_type, **parameters)
+                st.success(f"Taxable Fringe Benefit Value: R{round(tax_value, 2)}")
 
     elif menu == "What-If Analysis":
         st.header("What-If Analysis")
-        gross_salary = st.number_input("Current Gross Salary", min_value=0.0, value=0.0)
-        proposed_increase = st.number_input("Proposed Salary Increase", min_value=0.0, value=0.0)
-        tax_rate = st.slider("Tax Rate (%)", min_value=0.0, max_value=45.0, value=26.0)
-        if st.button("Analyze Impact"):
-            new_salary, new_paye = what_if_analysis(gross_salary, proposed_increase, tax_rate)
-            st.success(f"New Gross Salary: R{new_salary}")
-            st.success(f"New Monthly PAYE: R{new_paye}")
+
+        analysis_mode = st.radio("Analysis", ["Single Employee", "Scenario Sweep"], horizontal=True)
+
+        if analysis_mode == "Single Employee":
+            gross_salary = st.number_input("Current Gross Salary", min_value=0.0, value=0.0)
+            proposed_increase = st.number_input("Proposed Salary Increase", min_value=0.0, value=0.0)
+            tax_rate = st.slider("Tax Rate (%)", min_value=0.0, max_value=45.0, value=26.0)
+            if st.button("Analyze Impact"):
+                new_salary, new_paye = what_if_analysis(gross_salary, proposed_increase, tax_rate)
+                st.success(f"New Gross Salary: R{new_salary}")
+                st.success(f"New Monthly PAYE: R{new_paye}")
+
+        else:
+            st.caption("Every combination of the values below is applied to the whole payroll. "
+                       "Separate several values with commas.")
+            payroll_file = st.file_uploader("Payroll File", type=["csv", "xlsx"], key="sweep_payroll_file")
+            increases = st.text_input("Increases (%)", value="0, 3, 5, 7.5")
+            fixed_increases = st.text_input("Fixed Increases (R)", value="0")
+            rebate_changes = st.text_input("Rebate Changes (R)", value="0")
+            tax_basis = st.selectbox("PAYE Basis", ["Employee Tax Rate", *[f"SARS {year} Tables" for year in
+                                                                            reversed(available_tax_years())]])
+            if tax_basis == "Employee Tax Rate":
+                tax_year = None
+                tax_rate_changes = st.text_input("Tax Rate Changes (percentage points)", value="0")
+                bracket_adjustments = "0"
+            else:
+                tax_year = int(tax_basis.split()[1])
+                tax_rate_changes = "0"
+                bracket_adjustments = st.text_input("Bracket Adjustments (%, 0 = full bracket creep)", value="0")
+
+            if payroll_file is not None and st.button("Run Sweep"):
+                try:
+                    grid = scenario_grid(parse_values(increases), parse_values(fixed_increases),
+                                         parse_values(tax_rate_changes), parse_values(rebate_changes),
+                                         parse_values(bracket_adjustments))
+                except ValueError:
+                    st.error("Scenario values must be numbers separated by commas.")
+                    st.stop()
+                payroll = pd.concat(list(iter_payroll_chunks(payroll_file)), ignore_index=True)
+                with st.spinner(f"Evaluating {len(payroll):,} employees x {len(grid):,} scenarios..."):
+                    st.session_state["sweep_results"] = sweep_scenarios(payroll, grid, tax_year)
+
+            if "sweep_results" in st.session_state:
+                sweep_results = st.session_state["sweep_results"]
+                st.dataframe(sweep_results)
+                costliest = sweep_results["Cost to Company Change"].idxmax()
+                st.caption(f"Highest extra cost to company: {costliest} "
+                           f"(R{sweep_results.loc[costliest, 'Cost to Company Change']:,.2f})")
+                show_download("Download Sweep Results", {"Scenarios": sweep_results.reset_index()}, "scenario_sweep",
+                              key="sweep_download")
 
     elif menu == "Generate Financial Statements":
         st.header("Financial Statements Generator")
@@ -198,246 +498,170 @@ def main():
 
         if statement_type == "Income Statement":
             st.subheader("Income Statement")
+            inputs = {}
 
             # Revenue Section
             st.markdown("### Revenue")
-            sales_revenue = st.number_input("Sales Revenue", min_value=0.0, key="sales_revenue")
-            service_revenue = st.number_input("Service Revenue", min_value=0.0, key="service_revenue")
-            rental_income = st.number_input("Rental Income", min_value=0.0, key="rental_income")
-            interest_income = st.number_input("Interest Income", min_value=0.0, key="interest_income_revenue")
-            sales_returns_allowances = st.number_input("Less: Sales Returns and Allowances", min_value=0.0, key="sales_returns_allowances")
-
-            # Calculating Net Sales
-            net_sales = sales_revenue + service_revenue + rental_income + interest_income - sales_returns_allowances
+            inputs["sales_revenue"] = st.number_input("Sales Revenue", min_value=0.0, key="sales_revenue")
+            inputs["service_revenue"] = st.number_input("Service Revenue", min_value=0.0, key="service_revenue")
+            inputs["rental_income"] = st.number_input("Rental Income", min_value=0.0, key="rental_income")
+            inputs["interest_income"] = st.number_input("Interest Income", min_value=0.0, key="interest_income_revenue")
+            inputs["sales_returns_allowances"] = st.number_input("Less: Sales Returns and Allowances", min_value=0.0, key="sales_returns_allowances")
 
             # Cost of Goods Sold (COGS) Section
             st.markdown("### Cost of Goods Sold (COGS)")
-            beginning_inventory = st.number_input("Beginning Inventory", min_value=0.0, key="beginning_inventory")
-            purchases = st.number_input("Plus: Purchases", min_value=0.0, key="purchases")
-            freight_in = st.number_input("Freight-In", min_value=0.0, key="freight_in")
-            import_duties = st.number_input("Import Duties", min_value=0.0, key="import_duties")
-            ending_inventory = st.number_input("Less: Ending Inventory", min_value=0.0, key="ending_inventory")
-
-            # Calculating COGS
-            cogs = beginning_inventory + purchases + freight_in + import_duties - ending_inventory
-
-            # Calculating Gross Profit
-            gross_profit = net_sales - cogs
+            inputs["beginning_inventory"] = st.number_input("Beginning Inventory", min_value=0.0, key="beginning_inventory")
+            inputs["purchases"] = st.number_input("Plus: Purchases", min_value=0.0, key="purchases")
+            inputs["freight_in"] = st.number_input("Freight-In", min_value=0.0, key="freight_in")
+            inputs["import_duties"] = st.number_input("Import Duties", min_value=0.0, key="import_duties")
+            inputs["ending_inventory"] = st.number_input("Less: Ending Inventory", min_value=0.0, key="ending_inventory")
 
             # Operating Expenses Section
             st.markdown("### Operating Expenses")
 
             # Selling Expenses
             st.markdown("#### Selling Expenses")
-            advertising = st.number_input("Advertising", min_value=0.0, key="advertising")
-            sales_salaries = st.number_input("Sales Salaries and Wages", min_value=0.0, key="sales_salaries")
-            store_supplies = st.number_input("Store Supplies", min_value=0.0, key="store_supplies")
-            transport_costs = st.number_input("Transport Costs", min_value=0.0, key="transport_costs")
-            bad_debts_expense = st.number_input("Bad Debts Expense", min_value=0.0, key="bad_debts_expense")
+            inputs["advertising"] = st.number_input("Advertising", min_value=0.0, key="advertising")
+            inputs["sales_salaries"] = st.number_input("Sales Salaries and Wages", min_value=0.0, key="sales_salaries")
+            inputs["store_supplies"] = st.number_input("Store Supplies", min_value=0.0, key="store_supplies")
+            inputs["transport_costs"] = st.number_input("Transport Costs", min_value=0.0, key="transport_costs")
+            inputs["bad_debts_expense"] = st.number_input("Bad Debts Expense", min_value=0.0, key="bad_debts_expense")
 
             # General and Administrative Expenses
             st.markdown("#### General and Administrative Expenses")
-            office_salaries = st.number_input("Office Salaries and Wages", min_value=0.0, key="office_salaries")
-            rent = st.number_input("Rent", min_value=0.0, key="rent")
-            utilities = st.number_input("Utilities", min_value=0.0, key="utilities")
-            depreciation = st.number_input("Depreciation", min_value=0.0, key="depreciation")
-            legal_accounting_fees = st.number_input("Legal and Accounting Fees", min_value=0.0, key="legal_accounting_fees")
-            security_services = st.number_input("Security Services", min_value=0.0, key="security_services")
-            repairs_maintenance = st.number_input("Repairs and Maintenance", min_value=0.0, key="repairs_maintenance")
-            telephone_internet = st.number_input("Telephone and Internet", min_value=0.0, key="telephone_internet")
-            insurance = st.number_input("Insurance", min_value=0.0, key="insurance")
-            rates_taxes = st.number_input("Rates and Taxes", min_value=0.0, key="rates_taxes")
-            employee_benefits = st.number_input("Employee Benefits", min_value=0.0, key="employee_benefits")
-            training_development = st.number_input("Training and Development", min_value=0.0, key="training_development")
-
-            # Calculating Total Operating Expenses
-            total_selling_expenses = advertising + sales_salaries + store_supplies + transport_costs + bad_debts_expense
-            total_general_admin_expenses = (office_salaries + rent + utilities + depreciation + legal_accounting_fees +
-                                            security_services + repairs_maintenance + telephone_internet + insurance +
-                                            rates_taxes + employee_benefits + training_development)
-            total_operating_expenses = total_selling_expenses + total_general_admin_expenses
-
-            # Calculating Operating Income
-            operating_income = gross_profit - total_operating_expenses
+            inputs["office_salaries"] = st.number_input("Office Salaries and Wages", min_value=0.0, key="office_salaries")
+            inputs["rent"] = st.number_input("Rent", min_value=0.0, key="rent")
+            inputs["utilities"] = st.number_input("Utilities", min_value=0.0, key="utilities")
+            inputs["depreciation"] = st.number_input("Depreciation", min_value=0.0, key="depreciation")
+            inputs["legal_accounting_fees"] = st.number_input("Legal and Accounting Fees", min_value=0.0, key="legal_accounting_fees")
+            inputs["security_services"] = st.number_input("Security Services", min_value=0.0, key="security_services")
+            inputs["repairs_maintenance"] = st.number_input("Repairs and Maintenance", min_value=0.0, key="repairs_maintenance")
+            inputs["telephone_internet"] = st.number_input("Telephone and Internet", min_value=0.0, key="telephone_internet")
+            inputs["insurance"] = st.number_input("Insurance", min_value=0.0, key="insurance")
+            inputs["rates_taxes"] = st.number_input("Rates and Taxes", min_value=0.0, key="rates_taxes")
+            inputs["employee_benefits"] = st.number_input("Employee Benefits", min_value=0.0, key="employee_benefits")
+            inputs["training_development"] = st.number_input("Training and Development", min_value=0.0, key="training_development")
 
             # Other Income and Expenses
             st.markdown("### Other Income and Expenses")
-            interest_income_other = st.number_input("Interest Income", min_value=0.0, key="interest_income_other")
-            interest_expense = st.number_input("Interest Expense", min_value=0.0, key="interest_expense")
-
-            # Calculating Net Other Income
-            net_other_income = interest_income_other - interest_expense
-
-            # Calculating Earnings Before Tax (EBT) and Net Income
-            earnings_before_tax = operating_income + net_other_income
-            tax_expense = st.number_input("Income Tax Expense", min_value=0.0, key="tax_expense")
-            net_income = earnings_before_tax - tax_expense
-
-            # Preparing Data for Display and Export
-            income_statement_data = {
-                "Net Sales": net_sales,
-                "COGS": cogs,
-                "Gross Profit": gross_profit,
-                "Total Selling Expenses": total_selling_expenses,
-                "Total General and Administrative Expenses": total_general_admin_expenses,
-                "Total Operating Expenses": total_operating_expenses,
-                "Operating Income": operating_income,
-                "Interest Income": interest_income_other,
-                "Interest Expense": interest_expense,
-                "Net Other Income": net_other_income,
-                "Earnings Before Tax (EBT)": earnings_before_tax,
-                "Income Tax Expense": tax_expense,
-                "Net Income": net_income
-            }
+            inputs["interest_income_other"] = st.number_input("Interest Income", min_value=0.0, key="interest_income_other")
+            inputs["interest_expense"] = st.number_input("Interest Expense", min_value=0.0, key="interest_expense")
+            inputs["tax_expense"] = st.number_input("Income Tax Expense", min_value=0.0, key="tax_expense")
+
+            income_statement_data = update_statement(INCOME_STATEMENT, inputs)
 
             # Displaying the Income Statement Results
             st.subheader("Income Statement Results")
-            st.write(f"Net Sales: {net_sales}")
-            st.write(f"Gross Profit: {gross_profit}")
-            st.write(f"Operating Income: {operating_income}")
-            st.write(f"Earnings Before Tax (EBT): {earnings_before_tax}")
-            st.write(f"Net Income: {net_income}")
+            st.write(f"Net Sales: {income_statement_data['Net Sales']}")
+            st.write(f"Gross Profit: {income_statement_data['Gross Profit']}")
+            st.write(f"Operating Income: {income_statement_data['Operating Income']}")
+            st.write(f"Earnings Before Tax (EBT): {income_statement_data['Earnings Before Tax (EBT)']}")
+            st.write(f"Net Income: {income_statement_data['Net Income']}")
 
-            # Export to Excel
-            if st.button("Export to Excel"):
-                df = create_dataframe(list(income_statement_data.values()), list(income_statement_data.keys()))
-                df.to_excel("Income_Statement_Detailed.xlsx", index=False)
-                st.success("Income Statement exported to Excel successfully!")
+            # Download as Excel, CSV or Parquet
+            show_download("Download Income Statement", {"Income Statement": statement_frame(income_statement_data)},
+                          "Income_Statement_Detailed", key="income_statement_download",
+                          version=tuple(income_statement_data.items()))
 
 
 
         elif statement_type == "Balance Sheet":
             st.subheader("Balance Sheet")
+            inputs = {}
 
             # Assets Section
             st.markdown("### Assets")
 
             # Current Assets
             st.markdown("#### Current Assets")
-            cash_equivalents = st.number_input("Cash and Cash Equivalents", min_value=0.0, key="cash_equivalents")
-            accounts_receivable = st.number_input("Accounts Receivable", min_value=0.0, key="accounts_receivable")
-            inventory = st.number_input("Inventory", min_value=0.0, key="inventory")
-            prepaid_expenses = st.number_input("Prepaid Expenses", min_value=0.0, key="prepaid_expenses")
-            other_receivables = st.number_input("Other Receivables", min_value=0.0, key="other_receivables")
-
-            # Calculating Total Current Assets
-            total_current_assets = (cash_equivalents + accounts_receivable + inventory +
-                                    prepaid_expenses + other_receivables)
+            inputs["cash_equivalents"] = st.number_input("Cash and Cash Equivalents", min_value=0.0, key="cash_equivalents")
+            inputs["accounts_receivable"] = st.number_input("Accounts Receivable", min_value=0.0, key="accounts_receivable")
+            inputs["inventory"] = st.number_input("Inventory", min_value=0.0, key="inventory")
+            inputs["prepaid_expenses"] = st.number_input("Prepaid Expenses", min_value=0.0, key="prepaid_expenses")
+            inputs["other_receivables"] = st.number_input("Other Receivables", min_value=0.0, key="other_receivables")
 
             # Non-Current Assets
             st.markdown("#### Non-Current Assets")
-            ppe = st.number_input("Property, Plant, and Equipment (PPE)", min_value=0.0, key="ppe")
-            intangible_assets = st.number_input("Intangible Assets", min_value=0.0, key="intangible_assets")
-            investments = st.number_input("Investments", min_value=0.0, key="investments")
-            deferred_tax_assets = st.number_input("Deferred Tax Assets", min_value=0.0, key="deferred_tax_assets")
-
-            # Calculating Total Non-Current Assets
-            total_non_current_assets = ppe + intangible_assets + investments + deferred_tax_assets
-
-            # Calculating Total Assets
-            total_assets = total_current_assets + total_non_current_assets
+            inputs["ppe"] = st.number_input("Property, Plant, and Equipment (PPE)", min_value=0.0, key="ppe")
+            inputs["intangible_assets"] = st.number_input("Intangible Assets", min_value=0.0, key="intangible_assets")
+            inputs["investments"] = st.number_input("Investments", min_value=0.0, key="investments")
+            inputs["deferred_tax_assets"] = st.number_input("Deferred Tax Assets", min_value=0.0, key="deferred_tax_assets")
 
             # Liabilities Section
             st.markdown("### Liabilities")
 
             # Current Liabilities
             st.markdown("#### Current Liabilities")
-            accounts_payable = st.number_input("Accounts Payable", min_value=0.0, key="accounts_payable")
-            short_term_borrowings = st.number_input("Short-Term Borrowings", min_value=0.0, key="short_term_borrowings")
-            accrued_expenses = st.number_input("Accrued Expenses", min_value=0.0, key="accrued_expenses")
-            current_portion_long_term_debt = st.number_input("Current Portion of Long-Term Debt", min_value=0.0, key="current_portion_long_term_debt")
-            income_taxes_payable = st.number_input("Income Taxes Payable", min_value=0.0, key="income_taxes_payable")
-            vat_payable = st.number_input("VAT Payable", min_value=0.0, key="vat_payable")
-            other_payables = st.number_input("Other Payables", min_value=0.0, key="other_payables")
-
-            # Calculating Total Current Liabilities
-            total_current_liabilities = (accounts_payable + short_term_borrowings + accrued_expenses +
-                                        current_portion_long_term_debt + income_taxes_payable +
-                                        vat_payable + other_payables)
+            inputs["accounts_payable"] = st.number_input("Accounts Payable", min_value=0.0, key="accounts_payable")
+            inputs["short_term_borrowings"] = st.number_input("Short-Term Borrowings", min_value=0.0, key="short_term_borrowings")
+            inputs["accrued_expenses"] = st.number_input("Accrued Expenses", min_value=0.0, key="accrued_expenses")
+            inputs["current_portion_long_term_debt"] = st.number_input("Current Portion of Long-Term Debt", min_value=0.0, key="current_portion_long_term_debt")
+            inputs["income_taxes_payable"] = st.number_input("Income Taxes Payable", min_value=0.0, key="income_taxes_payable")
+            inputs["vat_payable"] = st.number_input("VAT Payable", min_value=0.0, key="vat_payable")
+            inputs["other_payables"] = st.number_input("Other Payables", min_value=0.0, key="other_payables")
 
             # Non-Current Liabilities
             st.markdown("#### Non-Current Liabilities")
-            long_term_debt = st.number_input("Long-Term Debt", min_value=0.0, key="long_term_debt")
-            deferred_tax_liabilities = st.number_input("Deferred Tax Liabilities", min_value=0.0, key="deferred_tax_liabilities")
-            provisions = st.number_input("Provisions", min_value=0.0, key="provisions")
-            other_non_current_liabilities = st.number_input("Other Non-Current Liabilities", min_value=0.0, key="other_non_current_liabilities")
-
-            # Calculating Total Non-Current Liabilities
-            total_non_current_liabilities = (long_term_debt + deferred_tax_liabilities +
-                                            provisions + other_non_current_liabilities)
-
-            # Calculating Total Liabilities
-            total_liabilities = total_current_liabilities + total_non_current_liabilities
+            inputs["long_term_debt"] = st.number_input("Long-Term Debt", min_value=0.0, key="long_term_debt")
+            inputs["deferred_tax_liabilities"] = st.number_input("Deferred Tax Liabilities", min_value=0.0, key="deferred_tax_liabilities")
+            inputs["provisions"] = st.number_input("Provisions", min_value=0.0, key="provisions")
+            inputs["other_non_current_liabilities"] = st.number_input("Other Non-Current Liabilities", min_value=0.0, key="other_non_current_liabilities")
 
             # Shareholders' Equity Section
             st.markdown("### Shareholders' Equity")
-            share_capital = st.number_input("Share Capital", min_value=0.0, key="share_capital")
-            retained_earnings = st.number_input("Retained Earnings", min_value=0.0, key="retained_earnings")
-            revaluation_surplus = st.number_input("Revaluation Surplus", min_value=0.0, key="revaluation_surplus")
-            other_reserves = st.number_input("Other Reserves", min_value=0.0, key="other_reserves")
-            non_controlling_interest = st.number_input("Non-Controlling Interest", min_value=0.0, key="non_controlling_interest")
-
-            # Calculating Total Shareholders' Equity
-            total_shareholders_equity = (share_capital + retained_earnings + revaluation_surplus +
-                                        other_reserves + non_controlling_interest)
-
-            # Preparing Data for Display and Export
-            balance_sheet_data = {
-                "Total Current Assets": total_current_assets,
-                "Total Non-Current Assets": total_non_current_assets,
-                "Total Assets": total_assets,
-                "Total Current Liabilities": total_current_liabilities,
-                "Total Non-Current Liabilities": total_non_current_liabilities,
-                "Total Liabilities": total_liabilities,
-                "Total Shareholders' Equity": total_shareholders_equity
-            }
+            inputs["share_capital"] = st.number_input("Share Capital", min_value=0.0, key="share_capital")
+            inputs["retained_earnings"] = st.number_input("Retained Earnings", min_value=0.0, key="retained_earnings")
+            inputs["revaluation_surplus"] = st.number_input("Revaluation Surplus", min_value=0.0, key="revaluation_surplus")
+            inputs["other_reserves"] = st.number_input("Other Reserves", min_value=0.0, key="other_reserves")
+            inputs["non_controlling_interest"] = st.number_input("Non-Controlling Interest", min_value=0.0, key="non_controlling_interest")
+
+            balance_sheet_data = update_statement(BALANCE_SHEET, inputs)
 
             # Displaying the Balance Sheet Results
             st.subheader("Balance Sheet Results")
-            st.write(f"Total Assets: {total_assets}")
-            st.write(f"Total Liabilities: {total_liabilities}")
+            st.write(f"Total Assets: {balance_sheet_data['Total Assets']}")
+            st.write(f"Total Liabilities: {balance_sheet_data['Total Liabilities']}")
+            total_shareholders_equity = balance_sheet_data["Total Shareholders' Equity"]
             st.write(f"Shareholders' Equity: {total_shareholders_equity}")
 
-            # Export to Excel
-            if st.button("Export Balance Sheet to Excel"):
-                df = create_dataframe(list(balance_sheet_data.values()), list(balance_sheet_data.keys()))
-                df.to_excel("Balance_Sheet_Detailed.xlsx", index=False)
-                st.success("Balance Sheet exported to Excel successfully!")
+            # Download as Excel, CSV or Parquet
+            show_download("Download Balance Sheet", {"Balance Sheet": statement_frame(balance_sheet_data)},
+                          "Balance_Sheet_Detailed", key="balance_sheet_download",
+                          version=tuple(balance_sheet_data.items()))
 
 
 
         elif statement_type == "Cash Flow Statement":
             st.subheader("Cash Flow Statement")
-            net_income = st.number_input("Net Income", min_value=0.0)
-            non_cash_expenses = st.number_input("Non-Cash Expenses (e.g., Depreciation)", min_value=0.0)
-            changes_in_working_capital = st.number_input("Changes in Working Capital", min_value=0.0)
-            cash_inflows_investing = st.number_input("Cash Inflows from Investing Activities", min_value=0.0)
-            cash_outflows_investing = st.number_input("Cash Outflows for Investing Activities", min_value=0.0)
-            cash_inflows_financing = st.number_input("Cash Inflows from Financing Activities", min_value=0.0)
-            cash_outflows_financing = st.number_input("Cash Outflows for Financing Activities", min_value=0.0)
-
-            net_cash_from_operating = net_income + non_cash_expenses + changes_in_working_capital
-            net_cash_from_investing = cash_inflows_investing - cash_outflows_investing
-            net_cash_from_financing = cash_inflows_financing - cash_outflows_financing
-            net_increase_decrease_cash = net_cash_from_operating + net_cash_from_investing + net_cash_from_financing
-
-            cash_flow_data = {
-                "Net Cash from Operating Activities": net_cash_from_operating,
-                "Net Cash from Investing Activities": net_cash_from_investing,
-                "Net Cash from Financing Activities": net_cash_from_financing,
-                "Net Increase/Decrease in Cash": net_increase_decrease_cash
-            }
+            inputs = {}
+            inputs["net_income"] = st.number_input("Net Income", min_value=0.0, key="net_income")
+            inputs["non_cash_expenses"] = st.number_input("Non-Cash Expenses (e.g., Depreciation)", min_value=0.0, key="non_cash_expenses")
+            inputs["changes_in_working_capital"] = st.number_input("Changes in Working Capital", min_value=0.0, key="changes_in_working_capital")
+            inputs["cash_inflows_investing"] = st.number_input("Cash Inflows from Investing Activities", min_value=0.0, key="cash_inflows_investing")
+            inputs["cash_outflows_investing"] = st.number_input("Cash Outflows for Investing Activities", min_value=0.0, key="cash_outflows_investing")
+            inputs["cash_inflows_financing"] = st.number_input("Cash Inflows from Financing Activities", min_value=0.0, key="cash_inflows_financing")
+            inputs["cash_outflows_financing"] = st.number_input("Cash Outflows for Financing Activities", min_value=0.0, key="cash_outflows_financing")
+
+            cash_flow_data = update_statement(CASH_FLOW_STATEMENT, inputs)
 
             st.subheader("Cash Flow Statement Results")
-            st.write(f"Net Cash from Operating Activities: {net_cash_from_operating}")
-            st.write(f"Net Cash from Investing Activities: {net_cash_from_investing}")
-            st.write(f"Net Cash from Financing Activities: {net_cash_from_financing}")
-            st.write(f"Net Increase/Decrease in Cash: {net_increase_decrease_cash}")
-
-            if st.button("Export Cash Flow Statement to Excel"):
-                df = create_dataframe(list(cash_flow_data.values()), list(cash_flow_data.keys()))
-                df.to_excel("Cash_Flow_Statement.xlsx", index=False)
-                st.success("Cash Flow Statement exported to Excel successfully!")
+            st.write(f"Net Cash from Operating Activities: {cash_flow_data['Net Cash from Operating Activities']}")
+            st.write(f"Net Cash from Investing Activities: {cash_flow_data['Net Cash from Investing Activities']}")
+            st.write(f"Net Cash from Financing Activities: {cash_flow_data['Net Cash from Financing Activities']}")
+            st.write(f"Net Increase/Decrease in Cash: {cash_flow_data['Net Increase/Decrease in Cash']}")
+
+            show_download("Download Cash Flow Statement", {"Cash Flow Statement": statement_frame(cash_flow_data)},
+                          "Cash_Flow_Statement", key="cash_flow_download", version=tuple(cash_flow_data.items()))
+
+        st.markdown("### All Statements")
+        st.caption("Every statement as entered so far, plus the last Multiple Employee payroll run")
+        show_download("Download All Statements", all_statement_sheets(), "Financial_Statements",
+                      key="all_statements_download", version=all_statements_version())
+
+    if instrumentation_enabled():
+        record(f"Page: {menu}", time.perf_counter() - page_start)
+    show_diagnostics_panel(diagnostics)
+    show_jobs_panel(jobs_panel)
 
 if __name__ == "__main__":
     main()